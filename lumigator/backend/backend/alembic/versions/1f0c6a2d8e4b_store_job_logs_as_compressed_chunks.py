@@ -0,0 +1,81 @@
+"""Store job logs as compressed chunks
+
+Revision ID: 1f0c6a2d8e4b
+Revises: 76bbe19c945c
+Create Date: 2025-03-10 10:12:41.503218
+
+"""
+
+import uuid
+import zlib
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "1f0c6a2d8e4b"  # pragma: allowlist secret
+down_revision: str | None = "76bbe19c945c"  # pragma: allowlist secret
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+jobs = sa.table("jobs", sa.column("id", sa.Uuid()), sa.column("logs", sa.Text()))
+job_log_chunks = sa.table(
+    "job-log-chunks",
+    sa.column("id", sa.Uuid()),
+    sa.column("job_id", sa.Uuid()),
+    sa.column("offset", sa.Integer()),
+    sa.column("size", sa.Integer()),
+    sa.column("data", sa.LargeBinary()),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job-log-chunks",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("job_id", sa.Uuid(), nullable=False),
+        sa.Column("offset", sa.Integer(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("job_id", "offset"),
+    )
+
+    # Move the logs stored so far into a single chunk per job.
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(jobs.c.id, jobs.c.logs).where(jobs.c.logs != "")).all()
+    if rows:
+        op.bulk_insert(
+            job_log_chunks,
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "job_id": job_id,
+                    "offset": 0,
+                    "size": len(logs),
+                    "data": zlib.compress(logs.encode()),
+                }
+                for job_id, logs in rows
+            ],
+        )
+    op.drop_column("jobs", "logs")
+
+
+def downgrade() -> None:
+    op.add_column("jobs", sa.Column("logs", sa.Text()))
+
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(job_log_chunks.c.job_id, job_log_chunks.c.data).order_by(
+            job_log_chunks.c.job_id, job_log_chunks.c.offset
+        )
+    ).all()
+    logs: dict[uuid.UUID, str] = {}
+    for job_id, data in rows:
+        logs[job_id] = logs.get(job_id, "") + zlib.decompress(data).decode()
+    for job_id, job_logs in logs.items():
+        connection.execute(sa.update(jobs).where(jobs.c.id == job_id).values(logs=job_logs))
+
+    op.drop_table("job-log-chunks")
@@ -1,25 +1,25 @@
-import os
 from collections.abc import Generator
 from typing import Annotated
 
 from fastapi import BackgroundTasks, Depends
 from lumigator_schemas.redactor import Redactor
-from ray.job_submission import JobSubmissionClient
 from s3fs import S3FileSystem
 from sqlalchemy.orm import Session
 
 from backend.db import session_manager
 from backend.repositories.datasets import DatasetRepository
-from backend.repositories.jobs import JobRepository, JobResultRepository
+from backend.repositories.jobs import JobLogRepository, JobRepository, JobResultRepository
 from backend.repositories.secrets import SecretRepository
 from backend.services.datasets import DatasetService
 from backend.services.experiments import ExperimentService
+from backend.services.job_status import job_status_synchronizer
 from backend.services.jobs import JobService
 from backend.services.secrets import SecretService
 from backend.services.workflows import WorkflowService
 from backend.settings import settings
 from backend.tracking import TrackingClient, TrackingClientManager
 from backend.tracking.mlflow import MLflowClientManager
+from backend.upstream import shared_ray_client, shared_s3_file_system
 
 
 def get_db_session() -> Generator[Session, None, None]:
@@ -31,17 +31,7 @@ DBSessionDep = Annotated[Session, Depends(get_db_session)]
 
 
 def get_s3_filesystem() -> S3FileSystem:
-    aws_access_key_id = os.environ.get("AWS_ACCESS_KEY_ID")
-    aws_secret_access_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
-    aws_default_region = os.environ.get("AWS_DEFAULT_REGION")
-
-    # Pass the session to S3FileSystem
-    return S3FileSystem(
-        key=aws_access_key_id,
-        secret=aws_secret_access_key,
-        endpoint_url=settings.S3_ENDPOINT_URL,
-        client_kwargs={"region_name": aws_default_region},
-    )
+    return shared_s3_file_system.get()
 
 
 S3FileSystemDep = Annotated[S3FileSystem, Depends(get_s3_filesystem)]
@@ -96,8 +86,17 @@ def get_job_service(
 ) -> JobService:
     job_repo = JobRepository(session)
     result_repo = JobResultRepository(session)
-    ray_client = JobSubmissionClient(settings.RAY_DASHBOARD_URL)
-    return JobService(job_repo, result_repo, ray_client, dataset_service, secret_service, background_tasks)
+    log_repo = JobLogRepository(session)
+    return JobService(
+        job_repo,
+        result_repo,
+        log_repo,
+        shared_ray_client.get(),
+        dataset_service,
+        secret_service,
+        background_tasks,
+        status_synchronizer=job_status_synchronizer,
+    )
 
 
 JobServiceDep = Annotated[JobService, Depends(get_job_service)]
@@ -1,4 +1,6 @@
 import json
+import re
+from collections.abc import AsyncGenerator
 from http import HTTPStatus
 from typing import Annotated
 from urllib.parse import urljoin
@@ -6,7 +8,7 @@ from uuid import UUID
 
 import loguru
 import requests
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, Header, HTTPException, Query, status
 from lumigator_schemas.datasets import DatasetResponse
 from lumigator_schemas.extras import ListingResponse
 from lumigator_schemas.jobs import (
@@ -21,9 +23,10 @@ from lumigator_schemas.jobs import (
     JobResultResponse,
     JobSubmissionResponse,
 )
+from pydantic import NonNegativeInt
 from ray.job_submission import JobDetails as RayJobDetails
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import Response, StreamingResponse
 
 from backend.api.deps import DatasetServiceDep, JobServiceDep, RedactorDep
 from backend.api.http_headers import HttpHeaders
@@ -33,6 +36,7 @@ from backend.services.exceptions.job_exceptions import (
     JobUpstreamError,
     JobValidationError,
 )
+from backend.services.jobs import JobService
 from backend.settings import settings
 
 router = APIRouter()
@@ -122,17 +126,14 @@ def list_jobs(
 
     loguru.logger.info(f"Listing jobs, job_types={job_types}")
 
-    jobs = service.list_jobs(skip, limit, job_types)
+    # Get all jobs Ray knows about on a dict, a single snapshot used both to update
+    # the status of the listed jobs and to build their merged view.
+    ray_jobs = {ray_job.submission_id: ray_job for ray_job in _get_all_ray_jobs()}
+
+    jobs = service.list_jobs(skip, limit, job_types, upstream_jobs=ray_jobs)
     if not jobs or jobs.total == 0 or len(jobs.items) == 0:
         return jobs
 
-    # Force a DB update of the job status by querying each one, not ideal for will do for now.
-    for job in jobs.items:
-        _ = service.get_job(job.id)
-
-    # Get all jobs Ray knows about on a dict
-    ray_jobs = {ray_job.submission_id: ray_job for ray_job in _get_all_ray_jobs()}
-
     results = list[Job]()
 
     # Enable redaction
@@ -186,8 +187,54 @@ def get_job(
 
 
 @router.get("/{job_id}/logs")
-def get_job_logs(service: JobServiceDep, job_id: UUID) -> JobLogsResponse:
-    return service.get_job_logs(job_id)
+def get_job_logs(service: JobServiceDep, job_id: UUID, offset: NonNegativeInt = 0) -> JobLogsResponse:
+    """Retrieves the logs of a job, from an offset (in characters).
+
+    Pass the ``next_offset`` of the logs previously returned as ``offset`` to only get the logs written since.
+    """
+    return service.get_job_logs(job_id, offset)
+
+
+@router.get("/{job_id}/logs/stream", response_class=StreamingResponse)
+def stream_job_logs(
+    service: JobServiceDep,
+    job_id: UUID,
+    offset: NonNegativeInt = 0,
+    last_event_id: Annotated[NonNegativeInt | None, Header()] = None,
+) -> StreamingResponse:
+    """Streams the logs of a job as server-sent events, following them until the job ends.
+
+    Each event holds the logs written since the previous one, and has the offset of their end as ID:
+    a client reconnecting with the ``Last-Event-ID`` header (or passing it as ``offset``) only receives
+    the logs written since. The stream ends with an ``end`` event.
+
+    The logs of a running job are served from the ones stored in Lumigator, then followed on Ray, which
+    streams them from their start anyway: they are not downloaded from Ray beforehand.
+    """
+    start = offset if last_event_id is None else last_event_id
+    follow = service.get_job(job_id).status.value not in JobService.TERMINAL_STATUS
+    logs = service.get_stored_job_logs(job_id, start) if follow else service.get_job_logs(job_id, start)
+
+    async def events() -> AsyncGenerator[str, None]:
+        if logs.logs:
+            yield _log_event(logs)
+        if follow:
+            try:
+                async for new_logs in service.tail_job_logs(job_id, logs.next_offset):
+                    yield _log_event(new_logs)
+            except JobUpstreamError as e:
+                loguru.logger.error("Unable to follow the logs of job {}: {}", job_id, e)
+                yield "event: error\ndata: Unable to follow the job logs\n\n"
+        yield "event: end\ndata:\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _log_event(logs: JobLogsResponse) -> str:
+    """Formats logs as a server-sent event, with the offset of their end as ID."""
+    # Clients join the data lines of an event with newlines, CRs (e.g. from progress bars) become newlines.
+    data = "".join(f"data: {line}\n" for line in re.split(r"\r\n|\r|\n", logs.logs))
+    return f"id: {logs.next_offset}\n{data}\n"
 
 
 @router.get("/{job_id}/result")
@@ -0,0 +1,31 @@
+import asyncio
+import contextvars
+import functools
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import ParamSpec, TypeVar
+
+from backend.settings import settings
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# Bounded, so a burst of concurrent workflows queues its blocking calls rather than spawning threads without limit.
+_executor = ThreadPoolExecutor(max_workers=settings.BLOCKING_IO_MAX_WORKERS, thread_name_prefix="blocking-io")
+
+
+async def run_blocking(func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    """Runs a blocking (sync) call from async code, in a bounded thread pool rather than on the event loop.
+
+    Use it for the calls that have no async equivalent (e.g. the MLflow client, s3fs file reads, Ray job submission),
+    so they do not stall every other request served by the event loop.
+
+    :param func: the blocking function to call
+    :param args: the positional arguments of the call
+    :param kwargs: the keyword arguments of the call
+    :return: the result of the call
+    """
+    loop = asyncio.get_running_loop()
+    # Like asyncio.to_thread, propagate the context (e.g. loguru's contextualize) to the thread.
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(ctx.run, func, *args, **kwargs))
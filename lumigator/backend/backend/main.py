@@ -1,6 +1,7 @@
 import os
 import sys
-from collections.abc import Callable
+from collections.abc import AsyncGenerator, Callable
+from contextlib import asynccontextmanager
 from http import HTTPStatus
 from pathlib import Path
 
@@ -19,7 +20,9 @@ from backend.api.routes.jobs import job_exception_mappings
 from backend.api.routes.secrets import secret_exception_mappings
 from backend.api.routes.workflows import workflow_exception_mappings
 from backend.api.tags import TAGS_METADATA
+from backend.ray_submit.dashboard import ray_dashboard_client
 from backend.services.exceptions.base_exceptions import ServiceError
+from backend.services.job_status import job_status_synchronizer
 from backend.settings import settings
 
 LUMIGATOR_APP_TAGS = {
@@ -55,6 +58,18 @@ def _configure_logger():
     )
 
 
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Runs the background services for the lifetime of the app."""
+    if settings.JOB_STATUS_SYNC_ENABLED:
+        job_status_synchronizer.start()
+    try:
+        yield
+    finally:
+        await job_status_synchronizer.stop()
+        await ray_dashboard_client.aclose()
+
+
 def create_error_handler(status_code: HTTPStatus) -> Callable[[Request, ServiceError], Response]:
     """Creates an error handler function for service errors, using the given status code"""
 
@@ -75,7 +90,7 @@ def create_app() -> FastAPI:
 
     _init_db()
 
-    app = FastAPI(**LUMIGATOR_APP_TAGS)
+    app = FastAPI(**LUMIGATOR_APP_TAGS, lifespan=_lifespan)
     logger.info(f"Lumigator backend, version: {settings.VERSION}")
 
     # Get the allowed origins for CORS requests.
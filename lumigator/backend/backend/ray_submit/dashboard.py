@@ -0,0 +1,121 @@
+import asyncio
+from http import HTTPStatus
+from urllib.parse import urljoin
+from uuid import UUID
+
+import httpx
+import loguru
+from lumigator_schemas.jobs import JobLogsResponse
+
+from backend.services.exceptions.job_exceptions import JobNotFoundError, JobUpstreamError
+from backend.settings import settings
+
+
+class RayDashboardClient:
+    """Async client for the jobs API of the Ray dashboard, sharing a pool of connections.
+
+    Used by async code paths in place of ``requests`` and ``JobSubmissionClient``, whose calls
+    block the event loop. The underlying ``httpx.AsyncClient`` is bound to the event loop it was
+    created in, so it is (re)created lazily for the running loop.
+    """
+
+    def __init__(
+        self,
+        jobs_url: str = settings.RAY_JOBS_URL,
+        max_connections: int = settings.RAY_DASHBOARD_MAX_CONNECTIONS,
+        timeout: float = 5,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """Creates a RayDashboardClient.
+
+        :param jobs_url: the URL of the jobs API of the Ray dashboard
+        :param max_connections: the max number of (pooled) connections to the Ray dashboard
+        :param timeout: the timeout of each request, in seconds
+        :param transport: the transport used to send requests, if not the default one (e.g. a mock one in tests)
+        """
+        self._jobs_url = jobs_url
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._timeout = timeout
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout, transport=self._transport)
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        """Closes the pooled connections."""
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
+    async def _request(self, method: str, job_id: UUID | str, path: str = "") -> httpx.Response:
+        try:
+            return await self._get_client().request(method, urljoin(self._jobs_url, f"{job_id}{path}"))
+        except httpx.HTTPError as e:
+            raise JobUpstreamError("ray", f"error requesting {path or 'details'} of job {job_id}") from e
+
+    async def get_job_status(self, job_id: UUID) -> str:
+        """Returns the (lowercase) status of a Ray job.
+
+        :param job_id: the ID of the job
+        :return: the status of the job, e.g. 'running'
+        :raises JobNotFoundError: if Ray does not know the job
+        :raises JobUpstreamError: if there is an error getting the job details from Ray
+        """
+        resp = await self._request("GET", job_id)
+        if resp.status_code == HTTPStatus.NOT_FOUND:
+            raise JobNotFoundError(job_id, "Ray job not found") from None
+        elif resp.status_code != HTTPStatus.OK:
+            raise JobUpstreamError(
+                "ray", f"Unexpected status code getting job status: {resp.status_code}, error: {resp.text or ''}"
+            ) from None
+        try:
+            return resp.json()["status"].lower()
+        except (ValueError, KeyError) as e:
+            raise JobUpstreamError("ray", f"Invalid job details response: {resp.text or ''}") from e
+
+    async def stop_job(self, job_id: UUID) -> None:
+        """Stops a Ray job.
+
+        :param job_id: the ID of the job to stop
+        :raises JobNotFoundError: if Ray does not know the job
+        :raises JobUpstreamError: if there is an unexpected error stopping the job
+        """
+        resp = await self._request("POST", job_id, "/stop")
+        if resp.status_code == HTTPStatus.NOT_FOUND:
+            raise JobNotFoundError(job_id, "Unable to stop Ray job") from None
+        elif resp.status_code != HTTPStatus.OK:
+            raise JobUpstreamError(
+                "ray",
+                f"Unexpected status code when trying to stop job: {resp.status_code}, error: {resp.text or ''}",
+            ) from None
+
+    async def get_job_logs(self, job_id: UUID | str) -> JobLogsResponse:
+        """Returns the logs of a Ray job.
+
+        :param job_id: the ID of the job
+        :return: the logs of the job
+        :raises JobNotFoundError: if Ray does not know the job
+        :raises JobUpstreamError: if there is an error getting the job logs from Ray
+        """
+        resp = await self._request("GET", job_id, "/logs")
+        if resp.status_code == HTTPStatus.NOT_FOUND:
+            loguru.logger.error(f"Upstream job logs not found: {resp.status_code}, error: {resp.text or ''}")
+            raise JobNotFoundError(job_id, "Ray job logs not found") from None
+        elif resp.status_code != HTTPStatus.OK:
+            raise JobUpstreamError(
+                "ray", f"Unexpected status code getting job logs: {resp.status_code}, error: {resp.text or ''}"
+            ) from None
+        try:
+            return JobLogsResponse(**resp.json())
+        except ValueError as e:
+            raise JobUpstreamError("ray", f"JSON decode error from {resp.text or ''}") from e
+
+
+ray_dashboard_client = RayDashboardClient()
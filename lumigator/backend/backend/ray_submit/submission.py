@@ -3,8 +3,12 @@ from dataclasses import dataclass
 from typing import Any
 
 import loguru
+import requests
 from lumigator_schemas.jobs import JobConfig
 from ray.job_submission import JobSubmissionClient
+from requests.adapters import HTTPAdapter
+
+from backend.settings import settings
 
 
 @dataclass(kw_only=True)
@@ -33,6 +37,55 @@ class RayJobEntrypoint(ABC):
         return full_command
 
 
+class PooledJobSubmissionClient(JobSubmissionClient):
+    """JobSubmissionClient sending its requests over a pool of keep-alive connections.
+
+    The base client opens a new connection for every request (``requests.request``), this one
+    reuses the connections of a single ``requests.Session``.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        max_connections: int = settings.RAY_DASHBOARD_MAX_CONNECTIONS,
+        timeout: float = settings.RAY_DASHBOARD_REQUEST_TIMEOUT,
+    ):
+        """Creates a PooledJobSubmissionClient, checking the connection to the Ray dashboard.
+
+        :param address: the URL of the Ray dashboard
+        :param max_connections: the max number of pooled connections to the Ray dashboard
+        :param timeout: the default timeout of each request, in seconds (the base client sets none)
+        """
+        # Set before calling the base constructor, which sends a request to check the version of Ray.
+        self._timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        super().__init__(address)
+
+    def _do_request(
+        self,
+        method: str,
+        endpoint: str,
+        *,
+        data: bytes | None = None,
+        json_data: dict | None = None,
+        **kwargs,
+    ) -> requests.Response:
+        kwargs.setdefault("timeout", self._timeout)
+        return self._session.request(
+            method,
+            self._address + endpoint,
+            cookies=self._cookies,
+            data=data,
+            json=json_data,
+            headers=self._headers,
+            verify=self._verify,
+            **kwargs,
+        )
+
+
 def submit_ray_job(client: JobSubmissionClient, entrypoint: RayJobEntrypoint) -> str:
     loguru.logger.info(f"Submitting {entrypoint.get_command_with_params}...")
     return client.submit_job(
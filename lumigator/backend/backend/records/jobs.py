@@ -1,9 +1,9 @@
 import uuid
 from typing import Any
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.types import Text
+from sqlalchemy.types import LargeBinary
 
 from backend.records.base import BaseRecord
 from backend.records.mixins import DateTimeMixin, JobStatusMixin, NameDescriptionMixin
@@ -13,7 +13,6 @@ class JobRecord(BaseRecord, NameDescriptionMixin, JobStatusMixin, DateTimeMixin)
     __tablename__ = "jobs"
 
     experiment_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("experiments.id"), nullable=True)
-    logs: Mapped[str] = mapped_column(Text)
     job_type: Mapped[str]
 
 
@@ -22,3 +21,21 @@ class JobResultRecord(BaseRecord):
 
     job_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("jobs.id"), unique=True)
     metrics: Mapped[dict[str, Any]]
+
+
+class JobLogChunkRecord(BaseRecord):
+    """A chunk of the logs of a job, the logs being the chunks of the job in offset order.
+
+    Logs are stored append-only: each chunk holds the logs written since the previous one.
+    """
+
+    __tablename__ = "job-log-chunks"
+    # Also indexes the chunks by job
+    __table_args__ = (UniqueConstraint("job_id", "offset"),)
+
+    job_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("jobs.id"))
+    # Position of the chunk in the logs, and its length, in characters
+    offset: Mapped[int]
+    size: Mapped[int]
+    # zlib-compressed UTF-8 text
+    data: Mapped[bytes] = mapped_column(LargeBinary)
@@ -1,8 +1,12 @@
+import zlib
 from uuid import UUID
 
+from lumigator_schemas.jobs import JobStatus
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from backend.records.jobs import JobRecord, JobResultRecord
+from backend.records.jobs import JobLogChunkRecord, JobRecord, JobResultRecord
 from backend.repositories.base import BaseRepository
 
 
@@ -13,6 +17,15 @@ class JobRepository(BaseRepository[JobRecord]):
     def get_by_experiment_id(self, experiment_id: UUID) -> list[JobRecord] | None:
         return self.session.query(JobRecord).where(JobRecord.experiment_id == experiment_id).all()
 
+    def update_statuses(self, statuses: dict[UUID, JobStatus]) -> None:
+        """Updates the status of several jobs in a single transaction (one UPDATE per distinct status)."""
+        for status in set(statuses.values()):
+            job_ids = [job_id for job_id, job_status in statuses.items() if job_status == status]
+            self.session.query(JobRecord).where(JobRecord.id.in_(job_ids)).update(
+                {JobRecord.status: status}, synchronize_session=False
+            )
+        self.session.commit()
+
 
 class JobResultRepository(BaseRepository[JobResultRecord]):
     def __init__(self, session: Session):
@@ -20,3 +33,39 @@ class JobResultRepository(BaseRepository[JobResultRecord]):
 
     def get_by_job_id(self, job_id: UUID) -> JobResultRecord | None:
         return self.session.query(JobResultRecord).where(JobResultRecord.job_id == job_id).first()
+
+
+class JobLogRepository(BaseRepository[JobLogChunkRecord]):
+    def __init__(self, session: Session):
+        super().__init__(JobLogChunkRecord, session)
+
+    def get_size(self, job_id: UUID) -> int:
+        """Returns the length (in characters) of the logs stored for a job."""
+        return (
+            self.session.query(func.coalesce(func.max(JobLogChunkRecord.offset + JobLogChunkRecord.size), 0))
+            .where(JobLogChunkRecord.job_id == job_id)
+            .scalar()
+        )
+
+    def append(self, job_id: UUID, offset: int, logs: str) -> None:
+        """Stores the logs of a job written from an offset (the length of the logs stored so far), compressed.
+
+        Logs appended concurrently from the same offset are only stored once.
+        """
+        try:
+            self.create(job_id=job_id, offset=offset, size=len(logs), data=zlib.compress(logs.encode()))
+        except IntegrityError:
+            self.session.rollback()
+
+    def read(self, job_id: UUID, offset: int = 0) -> str:
+        """Returns the logs stored for a job, from an offset (in characters)."""
+        chunks = (
+            self.session.query(JobLogChunkRecord)
+            .where(JobLogChunkRecord.job_id == job_id, JobLogChunkRecord.offset + JobLogChunkRecord.size > offset)
+            .order_by(JobLogChunkRecord.offset)
+            .all()
+        )
+        if not chunks:
+            return ""
+        logs = "".join(zlib.decompress(chunk.data).decode() for chunk in chunks)
+        return logs[max(offset - chunks[0].offset, 0) :]
@@ -1,10 +1,12 @@
-import csv
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from typing import BinaryIO
 from uuid import UUID
 
-from datasets import load_dataset
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from datasets import Dataset
 from fastapi import UploadFile
 from loguru import logger
 from lumigator_schemas.datasets import DatasetDownloadResponse, DatasetFormat, DatasetResponse
@@ -52,52 +54,67 @@ def validate_file_size(input: BinaryIO, output: BinaryIO, max_size: ByteSize) ->
     return actual_size
 
 
-def validate_dataset_format(filename: str, format: DatasetFormat):
-    """Validates the dataset identified by the filename, based on the format.
+def load_csv_dataset(filename: str) -> Dataset:
+    """Parses the dataset (CSV) file into an in-memory (Arrow backed) HuggingFace dataset.
 
-    :param filename: the filename of the dataset to validate
-    :param format: the dataset format (e.g. 'job')
-    :raises DatasetInvalidError: if there is a problem with the dataset file format
-    :raises DatasetMissingFieldsError: if the dataset is missing any required fields
+    The file is parsed the same way HuggingFace's CSV loader would (with pandas), but only once,
+    so the parsed dataset can be validated, saved in HF format and written back to CSV.
+
+    :param filename: the filename of the dataset to parse
+    :return: the parsed dataset
+    :raises DatasetInvalidError: if the file is not a valid CSV file
+    :raises DatasetMissingFieldsError: if the file is empty
     """
     try:
-        match format:
-            case DatasetFormat.JOB:
-                validate_experiment_dataset(filename)
-            case _:
-                # Should not be reachable
-                raise ValueError(f"Unknown dataset format: {format}")
-    except UnicodeError as e:
+        df = pd.read_csv(filename)
+    except pd.errors.EmptyDataError:
+        raise DatasetMissingFieldsError(REQUIRED_EXPERIMENT_FIELDS) from None
+    except (UnicodeError, pd.errors.ParserError) as e:
         logger.opt(exception=e).info("Error processing dataset upload.")
         raise DatasetInvalidError("not a CSV file") from e
 
+    return Dataset.from_pandas(df, preserve_index=False)
 
-def validate_experiment_dataset(filename: str):
-    """Validates the dataset (CSV) file to ensure all required fields are present.
 
-    :param filename: the filename of the dataset to validate
-    :raises DatasetMissingFieldsError: if the dataset is missing any of the required fields
+def validate_dataset_format(dataset: Dataset, format: DatasetFormat):
+    """Validates the dataset, based on the format.
+
+    :param dataset: the dataset to validate
+    :param format: the dataset format (e.g. 'job')
+    :raises DatasetMissingFieldsError: if the dataset is missing any required fields
     """
-    with Path(filename).open() as f:
-        reader = csv.DictReader(f)
-        fields = set(reader.fieldnames or [])
+    match format:
+        case DatasetFormat.JOB:
+            validate_experiment_dataset(dataset)
+        case _:
+            # Should not be reachable
+            raise ValueError(f"Unknown dataset format: {format}")
 
-        missing_fields = REQUIRED_EXPERIMENT_FIELDS.difference(fields)
-        if missing_fields:
-            raise DatasetMissingFieldsError(missing_fields) from None
 
+def validate_experiment_dataset(dataset: Dataset):
+    """Validates the dataset to ensure all required fields are present.
 
-def dataset_has_gt(filename: str) -> bool:
-    """Returns true if the dataset located at the supplied path (filename) has a ground truth
-    column with all of its rows correctly populated, otherwise false.
+    :param dataset: the dataset to validate
+    :raises DatasetMissingFieldsError: if the dataset is missing any of the required fields
     """
-    dataset = load_dataset("csv", data_files=filename, split="train")
+    missing_fields = REQUIRED_EXPERIMENT_FIELDS.difference(dataset.column_names)
+    if missing_fields:
+        raise DatasetMissingFieldsError(missing_fields) from None
+
 
+def dataset_has_gt(dataset: Dataset) -> bool:
+    """Returns true if the dataset has a ground truth column with all of its rows correctly populated,
+    otherwise false.
+    """
     if GT_FIELD not in dataset.column_names:
         return False
 
     # True only if every value in dataset[GT_FIELD] is not None or empty.
-    return all(value is not None and value.strip() != "" for value in dataset[GT_FIELD])
+    ground_truth = dataset.data.column(GT_FIELD)
+    if ground_truth.null_count > 0:
+        return False
+    trimmed = pc.utf8_trim_whitespace(ground_truth.cast(pa.string()))
+    return not pc.any(pc.equal(trimmed, "")).as_py()
 
 
 class DatasetService:
@@ -122,38 +139,29 @@ class DatasetService:
         """
         return f"{settings.S3_DATASETS_PREFIX}/{dataset_id}/{filename}"
 
-    def _save_dataset_to_s3(self, temp_fname, record):
-        """Converts the specified file to a set of HuggingFace dataset formatted files,
-        along with a newly recreated CSV file. The files are stored in an S3 bucket.
+    def _save_dataset_to_s3(self, dataset: Dataset, record: DatasetRecord):
+        """Stores the dataset in an S3 bucket, as a set of HuggingFace dataset formatted files
+        along with a newly recreated CSV file.
 
-        :param temp_fname: temporary file name to read the dataset from
+        :param dataset: the parsed dataset
         :param record: the dataset record (DatasetRecord)
         :raises DatasetUpstreamError: if there is an exception interacting with S3
         """
-        # Temp file to be used to contain the recreated CSV file.
-        temp = NamedTemporaryFile(delete=False)
-
         try:
-            # Load the CSV file as HF dataset
-            dataset_hf = load_dataset("csv", data_files=temp_fname, split="train")
-
             # Upload to S3
             dataset_key = self._get_s3_key(record.id, record.filename)
             dataset_path = self._get_s3_path(dataset_key)
-            dataset_hf.save_to_disk(dataset_path, storage_options=self.s3_filesystem.storage_options)
+            dataset.save_to_disk(dataset_path, storage_options=self.s3_filesystem.storage_options)
 
-            # Use the converted HF format files to rebuild the CSV and store it as 'dataset.csv'.
-            dataset_hf.to_csv(temp.name, index=False)
-            self.s3_filesystem.put_file(temp.name, f"{dataset_path}/dataset.csv")
+            # Rebuild the CSV from the same in-memory dataset and store it as 'dataset.csv'.
+            with self.s3_filesystem.open(f"{dataset_path}/dataset.csv", "wb") as f:
+                dataset.to_csv(f, index=False)
         except Exception as e:
             # if a record was already created, delete it from the DB
             if record:
                 self.dataset_repo.delete(record.id)
 
             raise DatasetUpstreamError("s3", "error attempting to save dataset to S3") from e
-        finally:
-            # Clean up temp file
-            Path(temp.name).unlink()
 
     def upload_dataset(
         self,
@@ -174,16 +182,18 @@ class DatasetService:
         temp = NamedTemporaryFile(delete=False)
         try:
             # Write to tempfile and validate size
-            # We are writing to a tempfile because we have to re-process it multiple times
             # Using an in-memory buffer would be prone to losing the contents when closed
             with temp as buffer:
                 actual_size = validate_file_size(dataset.file, buffer, settings.MAX_DATASET_SIZE)
 
+            # Parse the file once, everything else works on the parsed dataset
+            dataset_hf = load_csv_dataset(temp.name)
+
             # Validate format
-            validate_dataset_format(temp.name, format)
+            validate_dataset_format(dataset_hf, format)
 
             # Verify whether the dataset contains ground truth
-            has_gt = dataset_has_gt(temp.name)
+            has_gt = dataset_has_gt(dataset_hf)
 
             # Create DB record
             record = self.dataset_repo.create(
@@ -196,8 +206,8 @@ class DatasetService:
                 generated_by=generated_by,
             )
 
-            # convert the dataset to HF format and save it to S3
-            self._save_dataset_to_s3(temp.name, record)
+            # save the dataset in HF format (and as CSV) to S3
+            self._save_dataset_to_s3(dataset_hf, record)
         finally:
             # Cleanup temp file
             Path(temp.name).unlink()
@@ -0,0 +1,208 @@
+import asyncio
+import contextlib
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+from uuid import UUID
+
+import loguru
+from lumigator_schemas.jobs import JobStatus
+from ray.job_submission import JobSubmissionClient
+from sqlalchemy.orm import Session
+
+from backend.db import session_manager
+from backend.records.jobs import JobRecord
+from backend.repositories.jobs import JobRepository
+from backend.settings import settings
+from backend.upstream import shared_ray_client
+
+TERMINAL_STATUS = {JobStatus.FAILED, JobStatus.SUCCEEDED, JobStatus.STOPPED}
+NON_TERMINAL_STATUS = {JobStatus.CREATED, JobStatus.PENDING, JobStatus.RUNNING}
+
+
+@dataclass
+class _TrackedJob:
+    status: JobStatus | None
+    interval: float
+    next_poll: float
+
+
+class JobStatusSynchronizer:
+    """Keeps the status of all non-terminal jobs in sync with Ray, from a single background poll loop.
+
+    Every interval, the non-terminal jobs are read from the database and the ones due for a poll
+    are checked against a single listing of the Ray jobs. Status transitions are written to the
+    database in a single transaction, and in-process waiters (see ``wait_for_job``) are notified
+    when the job they wait on reaches a terminal status.
+
+    A job whose status did not change is polled less and less often (doubling its interval, up to
+    a max), unless someone is waiting on it.
+    """
+
+    def __init__(
+        self,
+        ray_client_factory: Callable[[], JobSubmissionClient],
+        session_factory: Callable[[], contextlib.AbstractContextManager[Session]] = session_manager.session,
+        poll_interval: float = settings.JOB_STATUS_SYNC_INTERVAL,
+        max_poll_interval: float = settings.JOB_STATUS_SYNC_MAX_INTERVAL,
+    ):
+        """Creates a JobStatusSynchronizer.
+
+        :param ray_client_factory: returns the Ray client, on each poll
+        :param session_factory: yields a database session
+        :param poll_interval: the (initial) number of seconds between polls of a job
+        :param max_poll_interval: the max number of seconds between polls of a job
+        """
+        self._ray_client_factory = ray_client_factory
+        self._session_factory = session_factory
+        self._poll_interval = poll_interval
+        self._max_poll_interval = max_poll_interval
+        self._tracked: dict[UUID, _TrackedJob] = {}
+        self._waiters: dict[UUID, asyncio.Future[JobStatus]] = {}
+        self._num_waiters: Counter[UUID] = Counter()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the poll loop is running."""
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Starts the poll loop, in the running event loop."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        loguru.logger.info("Started the job status synchronizer")
+
+    async def stop(self) -> None:
+        """Stops the poll loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        loguru.logger.info("Stopped the job status synchronizer")
+
+    def track(self, job_id: UUID) -> None:
+        """Starts tracking a (newly submitted) job, polling it without waiting for the next interval.
+
+        Can be called from any thread.
+
+        :param job_id: the ID of the job to track
+        """
+        if self.running:
+            self._loop.call_soon_threadsafe(self._track, job_id)
+
+    def _track(self, job_id: UUID) -> None:
+        tracked = self._tracked.get(job_id)
+        if tracked is None:
+            self._tracked[job_id] = _TrackedJob(status=None, interval=self._poll_interval, next_poll=0)
+        else:
+            tracked.interval = self._poll_interval
+            tracked.next_poll = 0
+        self._wakeup.set()
+
+    async def wait_for_job(self, job_id: UUID, timeout: float) -> JobStatus | None:
+        """Waits for a job to reach a terminal status, or until the timeout is reached.
+
+        A job is polled at the base interval while someone waits on it, and all the waiters of a job
+        share the same poll.
+
+        :param job_id: the ID of the job to wait for
+        :param timeout: the max number of seconds to wait for
+        :return: the last known status of the job, None if it is not known yet
+        """
+        self._track(job_id)
+        waiter = self._waiters.get(job_id)
+        if waiter is None:
+            waiter = self._waiters[job_id] = self._loop.create_future()
+
+        self._num_waiters[job_id] += 1
+        try:
+            # Shielded, as the future is shared with the other waiters of the job.
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except TimeoutError:
+            loguru.logger.info(f"Job {job_id} did not complete within the maximum wait time.")
+            tracked = self._tracked.get(job_id)
+            return tracked.status if tracked else None
+        finally:
+            self._num_waiters[job_id] -= 1
+            if self._num_waiters[job_id] == 0:
+                del self._num_waiters[job_id]
+                self._waiters.pop(job_id, None)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                loguru.logger.opt(exception=e).warning("Unable to synchronize job statuses with Ray")
+
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+            self._wakeup.clear()
+
+    async def sync(self) -> None:
+        """Polls Ray once for all the tracked jobs due for a poll, and applies their status transitions."""
+        non_terminal_jobs = await asyncio.to_thread(self._load_non_terminal_jobs)
+        for job_id, status in non_terminal_jobs.items():
+            if job_id not in self._tracked:
+                self._tracked[job_id] = _TrackedJob(status=status, interval=self._poll_interval, next_poll=0)
+        # Stop tracking the jobs that completed (or were deleted) out of this loop, unless they are waited on.
+        for job_id in self._tracked.keys() - non_terminal_jobs.keys() - self._waiters.keys():
+            del self._tracked[job_id]
+
+        now = time.monotonic()
+        due = [job_id for job_id, tracked in self._tracked.items() if tracked.next_poll <= now]
+        if not due:
+            return
+
+        upstream_statuses = await asyncio.to_thread(self._get_upstream_statuses)
+        transitions = {}
+        for job_id in due:
+            tracked = self._tracked[job_id]
+            status = upstream_statuses.get(str(job_id))
+            if status is not None and status != tracked.status:
+                transitions[job_id] = status
+                tracked.status = status
+                tracked.interval = self._poll_interval
+            elif job_id not in self._waiters:
+                tracked.interval = min(tracked.interval * 2, self._max_poll_interval)
+            tracked.next_poll = now + tracked.interval
+
+        if not transitions:
+            return
+
+        loguru.logger.info(f"Updating the status of {len(transitions)} jobs from Ray")
+        await asyncio.to_thread(self._write_statuses, transitions)
+
+        for job_id, status in transitions.items():
+            if status in TERMINAL_STATUS:
+                del self._tracked[job_id]
+                if (waiter := self._waiters.pop(job_id, None)) is not None:
+                    waiter.set_result(status)
+
+    def _load_non_terminal_jobs(self) -> dict[UUID, JobStatus]:
+        with self._session_factory() as session:
+            records = JobRepository(session).list(limit=None, criteria=[JobRecord.status.in_(NON_TERMINAL_STATUS)])
+            return {record.id: record.status for record in records}
+
+    def _get_upstream_statuses(self) -> dict[str, JobStatus]:
+        return {
+            ray_job.submission_id: JobStatus(ray_job.status.lower())
+            for ray_job in self._ray_client_factory().list_jobs()
+            if ray_job.submission_id
+        }
+
+    def _write_statuses(self, statuses: dict[UUID, JobStatus]) -> None:
+        with self._session_factory() as session:
+            JobRepository(session).update_statuses(statuses)
+
+
+job_status_synchronizer = JobStatusSynchronizer(shared_ray_client.get)
@@ -2,6 +2,7 @@ import asyncio
 import csv
 import json
 import re
+from collections.abc import AsyncGenerator
 from http import HTTPStatus
 from io import BytesIO, StringIO
 from pathlib import Path
@@ -16,6 +17,8 @@ import evaluator.definition
 import inference.definition
 
 ############################
+# isort: split
+import aiohttp
 import loguru
 import requests
 from fastapi import BackgroundTasks, UploadFile
@@ -34,14 +37,17 @@ from lumigator_schemas.jobs import (
     JobStatus,
     JobType,
 )
+from ray.job_submission import JobDetails as RayJobDetails
 from ray.job_submission import JobSubmissionClient
 from s3fs import S3FileSystem
 from sqlalchemy.sql.expression import or_
 from starlette.datastructures import Headers
 
+from backend.blocking_io import run_blocking
+from backend.ray_submit.dashboard import ray_dashboard_client
 from backend.ray_submit.submission import RayJobEntrypoint, submit_ray_job
 from backend.records.jobs import JobRecord
-from backend.repositories.jobs import JobRepository, JobResultRepository
+from backend.repositories.jobs import JobLogRepository, JobRepository, JobResultRepository
 from backend.services.datasets import DatasetService
 from backend.services.exceptions.dataset_exceptions import DatasetMissingFieldsError
 from backend.services.exceptions.job_exceptions import (
@@ -51,6 +57,7 @@ from backend.services.exceptions.job_exceptions import (
     JobValidationError,
 )
 from backend.services.exceptions.secret_exceptions import SecretDecryptionError, SecretNotFoundError
+from backend.services.job_status import JobStatusSynchronizer
 from backend.services.secrets import SecretService
 from backend.settings import settings
 
@@ -105,17 +112,26 @@ class JobService:
         self,
         job_repo: JobRepository,
         result_repo: JobResultRepository,
+        log_repo: JobLogRepository,
         ray_client: JobSubmissionClient,
         dataset_service: DatasetService,
         secret_service: SecretService,
         background_tasks: BackgroundTasks,
+        status_synchronizer: JobStatusSynchronizer | None = None,
     ):
         self.job_repo = job_repo
         self.result_repo = result_repo
+        self.log_repo = log_repo
         self.ray_client = ray_client
         self._dataset_service = dataset_service
         self._secret_service = secret_service
         self._background_tasks = background_tasks
+        self._status_synchronizer = status_synchronizer
+
+    @property
+    def _statuses_synchronized(self) -> bool:
+        """Whether job statuses are kept in sync with Ray in the background (see JobStatusSynchronizer)."""
+        return self._status_synchronizer is not None and self._status_synchronizer.running
 
     def _get_job_record_per_type(self, job_type: str) -> list[JobRecord]:
         records = self.job_repo.get_by_job_type(job_type)
@@ -144,7 +160,7 @@ class JobService:
         :returns: True if the job was successfully stopped, False otherwise
         """
         try:
-            self._stop_job(job_id)
+            await ray_dashboard_client.stop_job(job_id)
         except JobNotFoundError:
             # If the job is not found, we consider it stopped
             return True
@@ -157,22 +173,6 @@ class JobService:
 
         return status and status.lower() == JobStatus.STOPPED.value
 
-    def _stop_job(self, job_id: UUID):
-        """Stops an existing job in Ray by ID.
-
-        :param job_id: The ID of the job to stop
-        :raises JobNotFoundError: If the job doesn't exist in Ray
-        :raises JobUpstreamError: If there is an unexpected error with the upstream service while stopping the job
-        """
-        resp = requests.post(urljoin(settings.RAY_JOBS_URL, f"{job_id}/stop"), timeout=5)  # 5 seconds
-        if resp.status_code == HTTPStatus.NOT_FOUND:
-            raise JobNotFoundError(job_id, "Unable to stop Ray job") from None
-        elif resp.status_code != HTTPStatus.OK:
-            raise JobUpstreamError(
-                "ray",
-                f"Unexpected status code when trying to stop job: {resp.status_code}, error: {resp.text or ''}",
-            ) from None
-
     def _update_job_record(self, job_id: UUID, **updates) -> JobRecord:
         """Updates an existing job record in the repository (database) by ID.
 
@@ -309,7 +309,7 @@ class JobService:
             data = f.read()
             return JobResultObject.model_validate_json(data)
 
-    def get_upstream_job_status(self, job_id: UUID) -> str:
+    async def get_upstream_job_status(self, job_id: UUID) -> str:
         """Returns the (lowercase) status of the upstream job.
 
         Example: PENDING, RUNNING, STOPPED, SUCCEEDED, FAILED.
@@ -321,38 +321,92 @@ class JobService:
                                   job status
         """
         try:
-            status_response = self.ray_client.get_job_status(str(job_id))
-            return str(status_response.value.lower())
-        except RuntimeError as e:
+            return await ray_dashboard_client.get_job_status(job_id)
+        except JobNotFoundError as e:
             raise JobUpstreamError("ray", "error getting Ray job status") from e
 
-    def get_job_logs(self, job_id: UUID) -> JobLogsResponse:
-        """Retrieves the logs for a job from the upstream service.
+    def get_job_logs(self, job_id: UUID, offset: int = 0) -> JobLogsResponse:
+        """Retrieves the logs for a job from the upstream service, storing the ones not stored yet.
 
         :param job_id: The ID of the job to retrieve logs for.
-        :return: The logs for the job.
+        :param offset: The offset (in characters) from which to return the logs, e.g. the ``next_offset``
+                of the logs previously returned, to only get the logs written since.
+        :return: The logs for the job from the offset, and the offset of their end.
         :raises JobNotFoundError: If the job cannot be found.
         :raises JobUpstreamError: If there is an error with the upstream service returning the job logs,
                 and there are no logs currently persisted in Lumigator's storage.
         """
-        job = self.job_repo.get(job_id)
-        if not job:
-            raise JobNotFoundError(job_id) from None
-
+        self._get_job_record(job_id)
         try:
             ray_job_logs = self._retrieve_job_logs(job_id)
         except JobUpstreamError as e:
-            # If we have logs stored, just return them to support 'offline' Ray
-            if job.logs:
-                loguru.logger.error("Unable to retrieve job logs from Ray, returning stored DB logs: {}", e)
-                return JobLogsResponse(logs=job.logs)
-            raise
+            return self._get_stored_job_logs(job_id, offset, e)
+
+        return self._store_job_logs(job_id, ray_job_logs, offset)
+
+    async def refresh_job_logs(self, job_id: UUID, offset: int = 0) -> JobLogsResponse:
+        """Like ``get_job_logs``, without blocking the event loop on the upstream service.
+
+        :param job_id: The ID of the job to retrieve logs for.
+        :param offset: The offset (in characters) from which to return the logs.
+        :return: The logs for the job from the offset, and the offset of their end.
+        :raises JobNotFoundError: If the job cannot be found.
+        :raises JobUpstreamError: If there is an error with the upstream service returning the job logs,
+                and there are no logs currently persisted in Lumigator's storage.
+        """
+        self._get_job_record(job_id)
+        try:
+            ray_job_logs = await ray_dashboard_client.get_job_logs(job_id)
+        except (JobNotFoundError, JobUpstreamError) as e:
+            return self._get_stored_job_logs(job_id, offset, JobUpstreamError("ray", "error retrieving job logs", e))
+
+        return self._store_job_logs(job_id, ray_job_logs, offset)
 
-        # Update the database with the latest logs
-        if job.logs != ray_job_logs.logs:
-            self._update_job_record(job_id, logs=ray_job_logs.logs)
+    def get_stored_job_logs(self, job_id: UUID, offset: int = 0) -> JobLogsResponse:
+        """Retrieves the logs of a job stored in Lumigator, without requesting them from the upstream service.
 
-        return ray_job_logs
+        :param job_id: The ID of the job to retrieve logs for.
+        :param offset: The offset (in characters) from which to return the logs.
+        :return: The stored logs for the job from the offset, and the offset of their end.
+        """
+        stored_size = self.log_repo.get_size(job_id)
+        return JobLogsResponse(logs=self.log_repo.read(job_id, offset), next_offset=max(stored_size, offset))
+
+    async def tail_job_logs(self, job_id: UUID, offset: int = 0) -> AsyncGenerator[JobLogsResponse, None]:
+        """Follows the logs of a job on the upstream service as they are written, until the job ends.
+
+        Ray streams the logs of a job from their start, the ones before the offset are skipped.
+
+        :param job_id: The ID of the job to follow the logs of.
+        :param offset: The offset (in characters) from which to return the logs.
+        :return: The logs written, from the offset, each with the offset of their end.
+        :raises JobUpstreamError: If there is an error with the upstream service streaming the job logs.
+        """
+        end = 0
+        try:
+            async for logs in self.ray_client.tail_job_logs(str(job_id)):
+                start, end = end, end + len(logs)
+                if end > offset:
+                    yield JobLogsResponse(logs=logs[max(offset - start, 0) :], next_offset=end)
+        except (aiohttp.ClientError, RuntimeError) as e:
+            raise JobUpstreamError("ray", f"error following the logs of job {job_id}") from e
+
+    def _get_stored_job_logs(self, job_id: UUID, offset: int, error: JobUpstreamError) -> JobLogsResponse:
+        # If we have logs stored, just return them to support 'offline' Ray
+        stored_size = self.log_repo.get_size(job_id)
+        if stored_size:
+            loguru.logger.error("Unable to retrieve job logs from Ray, returning stored DB logs: {}", error)
+            return JobLogsResponse(logs=self.log_repo.read(job_id, offset), next_offset=stored_size)
+        raise error
+
+    def _store_job_logs(self, job_id: UUID, ray_job_logs: JobLogsResponse, offset: int) -> JobLogsResponse:
+        # Ray only appends to the logs of a job, so only the logs written since the last call are stored
+        logs = ray_job_logs.logs or ""
+        stored_size = self.log_repo.get_size(job_id)
+        if len(logs) > stored_size:
+            self.log_repo.append(job_id, stored_size, logs[stored_size:])
+
+        return JobLogsResponse(logs=logs[offset:], next_offset=len(logs))
 
     def _retrieve_job_logs(self, job_id: UUID) -> JobLogsResponse:
         resp = requests.get(urljoin(settings.RAY_JOBS_URL, f"{job_id}/logs"), timeout=5)  # 5 seconds
@@ -380,8 +434,15 @@ class JobService:
                                   job status
         """
         loguru.logger.info(f"Waiting for job {job_id} to complete...")
+        if self._statuses_synchronized:
+            # Share the background poll loop with every other waiter, rather than polling Ray.
+            status = await self._status_synchronizer.wait_for_job(job_id, max_wait_time_sec)
+            job_status = (status or self._get_job_record(job_id).status).value
+            await self.refresh_job_logs(job_id)
+            return job_status
+
         # Get the initial job status
-        job_status = self.get_upstream_job_status(job_id)
+        job_status = await self.get_upstream_job_status(job_id)
 
         # Wait for the job to complete
         elapsed_time = 0
@@ -391,10 +452,10 @@ class JobService:
                 break
             await asyncio.sleep(5)
             elapsed_time += 5
-            job_status = self.get_upstream_job_status(job_id)
+            job_status = await self.get_upstream_job_status(job_id)
 
         # Once the job is finished, retrieve the log and store it in the internal db
-        self.get_job_logs(job_id)
+        await self.refresh_job_logs(job_id)
 
         return job_status
 
@@ -412,7 +473,9 @@ class JobService:
 
         job_status = await self.wait_for_job_complete(job_id, max_wait_time_sec)
         if job_status == JobStatus.SUCCEEDED.value:
-            self._add_dataset_to_db(
+            # Reads the results from S3 and uploads the new dataset, off the event loop.
+            await run_blocking(
+                self._add_dataset_to_db,
                 job_id=job_id,
                 request=request,
                 s3_file_system=self._dataset_service.s3_filesystem,
@@ -499,14 +562,18 @@ class JobService:
 
         metadata = {"job_type": job_type}
 
+        # Jobs using a pooled model server don't run the model themselves, the server reserves the GPUs.
+        uses_model_pool = isinstance(request.job_config, JobInferenceConfig) and request.job_config.model_pool
         entrypoint = RayJobEntrypoint(
             config=ray_config,
             metadata=metadata,
             runtime_env=runtime_env,
-            num_gpus=settings.RAY_WORKER_GPUS,
+            num_gpus=0 if uses_model_pool else settings.RAY_WORKER_GPUS,
         )
         loguru.logger.info(f"Submitting {job_type} Ray job...")
         submit_ray_job(self.ray_client, entrypoint)
+        if self._statuses_synchronized:
+            self._status_synchronizer.track(record.id)
 
         # NOTE: Only inference jobs can store results in a dataset atm. Among them:
         # - prediction jobs are run in a workflow before evaluations => they trigger dataset saving
@@ -536,7 +603,8 @@ class JobService:
         record = self._get_job_record(job_id)
         loguru.logger.info(f"Obtaining info for job {job_id}: {record.name}")
 
-        if record.status.value in self.TERMINAL_STATUS:
+        # The status of non-terminal jobs is kept up to date in the background when synchronized.
+        if record.status.value in self.TERMINAL_STATUS or self._statuses_synchronized:
             return JobResponse.model_validate(record)
 
         # get job status from ray
@@ -549,12 +617,67 @@ class JobService:
 
         return JobResponse.model_validate(record)
 
+    def get_upstream_jobs(self) -> dict[str, RayJobDetails]:
+        """Gets the details of all the jobs Ray knows about, in a single request.
+
+        :return: the Ray job details, by submission ID
+        :raises JobUpstreamError: if there is an exception getting the jobs from Ray
+        """
+        try:
+            ray_jobs = self.ray_client.list_jobs()
+        except Exception as e:
+            raise JobUpstreamError("ray", "error listing jobs") from e
+
+        return {ray_job.submission_id: ray_job for ray_job in ray_jobs if ray_job.submission_id}
+
+    def _reconcile_job_statuses(self, records: list[JobRecord], upstream_jobs: dict[str, RayJobDetails]) -> bool:
+        """Updates the status of non-terminal job records from a snapshot of the Ray jobs, in a single transaction.
+
+        Jobs missing from the snapshot keep their current status.
+
+        :param records: the job records to reconcile
+        :param upstream_jobs: the Ray job details, by submission ID
+        :return: True if any job record was updated
+        """
+        statuses = {}
+        for record in records:
+            if record.status.value in self.TERMINAL_STATUS:
+                continue
+            upstream_job = upstream_jobs.get(str(record.id))
+            if upstream_job is None:
+                continue
+            upstream_status = JobStatus(upstream_job.status.lower())
+            if upstream_status != record.status:
+                statuses[record.id] = upstream_status
+
+        if not statuses:
+            return False
+
+        loguru.logger.info(f"Updating the status of {len(statuses)} jobs from Ray")
+        self.job_repo.update_statuses(statuses)
+        return True
+
     def list_jobs(
         self,
         skip: int = DEFAULT_SKIP,
         limit: int = DEFAULT_LIMIT,
         job_types: list[str] = (),
+        upstream_jobs: dict[str, RayJobDetails] | None = None,
     ) -> ListingResponse[JobResponse]:
+        """Lists jobs from the repository (database), with their status reconciled with Ray.
+
+        The status of every non-terminal job is taken from a single snapshot of the Ray jobs,
+        and all the changed statuses are updated in a single transaction.
+
+        :param skip: the number of jobs to skip
+        :param limit: the maximum number of jobs to list
+        :param job_types: only list jobs of these types, if any
+        :param upstream_jobs: the Ray job details by submission ID (see ``get_upstream_jobs``),
+            fetched only if needed when not supplied
+        :return: the listed jobs
+        :rtype: ListingResponse[JobResponse]
+        :raises JobUpstreamError: if there is an exception getting the jobs from Ray
+        """
         # It would be better if we could just feed an empty dict,
         # but this complicates things at the ORM level,
         # see https://docs.sqlalchemy.org/en/20/core/sqlelement.html#sqlalchemy.sql.expression.or_
@@ -563,10 +686,23 @@ class JobService:
             limit,
             criteria=[or_(*[JobRecord.job_type == job_type for job_type in job_types])],
         )
+
+        if any(record.status.value not in self.TERMINAL_STATUS for record in records):
+            if upstream_jobs is None:
+                upstream_jobs = self.get_upstream_jobs()
+            if self._reconcile_job_statuses(records, upstream_jobs):
+                # The commit expired every record, reload them in one query rather than one per record.
+                job_ids = [record.id for record in records]
+                reloaded = {
+                    record.id: record
+                    for record in self.job_repo.list(limit=len(job_ids), criteria=[JobRecord.id.in_(job_ids)])
+                }
+                records = [reloaded[job_id] for job_id in job_ids]
+
         total = len(records)
         return ListingResponse(
             total=total,
-            items=[self.get_job(record.id) for record in records],
+            items=[JobResponse.model_validate(record) for record in records],
         )
 
     def update_job_status(
@@ -24,6 +24,7 @@ from mlflow.entities import Run
 from pydantic_core._pydantic_core import ValidationError
 from typing_extensions import deprecated
 
+from backend.blocking_io import run_blocking
 from backend.repositories.jobs import JobRepository
 from backend.services.datasets import DatasetService
 from backend.services.exceptions.dataset_exceptions import (
@@ -90,6 +91,11 @@ class WorkflowService:
                 formatted_metrics[metric_name] = round(metric_value, 3)
         return formatted_metrics
 
+    def _read_job_results(self, results_path: str) -> JobResultObject:
+        """Reads the results of a job from S3 (blocking, see ``run_blocking``)."""
+        with self._dataset_service.s3_filesystem.open(results_path, "r") as f:
+            return JobResultObject.model_validate_json(f.read())
+
     async def _handle_workflow_failure(self, workflow_id: str):
         """Handle a workflow failure by updating the workflow status and stopping any running jobs."""
         loguru.logger.error("Workflow failed: {} ... updating status and stopping jobs", workflow_id)
@@ -154,7 +160,7 @@ class WorkflowService:
 
         try:
             # Attempt to submit the inference job to Ray before we track it in Lumigator.
-            inference_job = self._job_service.create_job(job_infer_create)
+            inference_job = await run_blocking(self._job_service.create_job, job_infer_create)
         except (JobTypeUnsupportedError, SecretNotFoundError) as e:
             loguru.logger.error("Workflow pipeline error: Workflow {}. Cannot create inference job: {}", workflow.id, e)
             await self._handle_workflow_failure(workflow.id)
@@ -204,7 +210,8 @@ class WorkflowService:
         try:
             # Inference jobs produce a new dataset
             # Add the dataset to the (local) database
-            inference_dataset_id = self._job_service._add_dataset_to_db(
+            inference_dataset_id = await run_blocking(
+                self._job_service._add_dataset_to_db,
                 job_id=inference_job.id,
                 request=job_infer_create,
                 s3_file_system=self._dataset_service.s3_filesystem,
@@ -232,8 +239,7 @@ class WorkflowService:
             # TODO: Review how JobService._get_s3_uri works and if it can be re-used/made public.
             inference_results_path = self._job_service._get_s3_uri(inference_job.id)
 
-            with self._dataset_service.s3_filesystem.open(inference_results_path, "r") as f:
-                inf_output = JobResultObject.model_validate_json(f.read())
+            inf_output = await run_blocking(self._read_job_results, inference_results_path)
 
             inference_job_output = RunOutputs(
                 parameters={"inference_output_s3_path": inference_results_path},
@@ -278,7 +284,7 @@ class WorkflowService:
 
         try:
             # Attempt to submit the evaluation job before we track it in Lumigator.
-            evaluation_job = self._job_service.create_job(job_eval_create)
+            evaluation_job = await run_blocking(self._job_service.create_job, job_eval_create)
         except (JobTypeUnsupportedError, SecretNotFoundError) as e:
             loguru.logger.error(
                 "Workflow pipeline error: Workflow {}. Cannot create evaluation job: {}", workflow.id, e
@@ -305,7 +311,9 @@ class WorkflowService:
                 raise JobUpstreamError(f"Evaluation job {evaluation_job.id} failed with status '{status}'") from None
 
             # TODO: Handle other error types that can be raised by the method.
-            self._job_service._validate_results(evaluation_job.id, self._dataset_service.s3_filesystem)
+            await run_blocking(
+                self._job_service._validate_results, evaluation_job.id, self._dataset_service.s3_filesystem
+            )
 
             # Mark the job as successful in the tracking client.
             await self._tracking_client.update_workflow_status(eval_run_id, WorkflowStatus.SUCCEEDED)
@@ -326,8 +334,7 @@ class WorkflowService:
             # Get the path to the job results stored in S3.
             evaluation_result_path = self._job_service._get_s3_uri(evaluation_job.id)
 
-            with self._dataset_service.s3_filesystem.open(evaluation_result_path, "r") as f:
-                eval_output = JobResultObject.model_validate_json(f.read())
+            eval_output = await run_blocking(self._read_job_results, evaluation_result_path)
 
             # TODO this generic interface should probably be the output type of the eval job but
             # we'll make that improvement later
@@ -458,7 +465,9 @@ class WorkflowService:
         # sort the jobs by created_at, with the oldest last
         job_list = sorted(job_list, key=lambda x: x.info.start_time)
         all_ray_job_ids = [run.data.params.get("ray_job_id") for run in job_list]
-        logs = [self._job_service.get_job_logs(UUID(ray_job_id)) for ray_job_id in all_ray_job_ids]
+        logs = await asyncio.gather(
+            *(self._job_service.refresh_job_logs(UUID(ray_job_id)) for ray_job_id in all_ray_job_ids)
+        )
         # combine the logs into a single string
         # TODO: This is not a great solution but it matches the current API
         return JobLogsResponse(logs="\n================\n".join([log.logs for log in logs]))
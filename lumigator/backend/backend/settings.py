@@ -46,6 +46,10 @@ class BackendSettings(BaseSettings):
     S3_DATASETS_PREFIX: str = "datasets"
     S3_JOB_RESULTS_PREFIX: str = "jobs/results"
     S3_JOB_RESULTS_FILENAME: str = "{job_name}/{job_id}/results.json"
+    S3_PREDICTION_CACHE_PREFIX: str = "cache/predictions"
+    S3_METRIC_CACHE_PREFIX: str = "cache/metrics"
+    # Max number of pooled connections to S3, shared by all the requests
+    S3_MAX_POOL_CONNECTIONS: int = 20
 
     # Ray
     RAY_HEAD_NODE_HOST: str  # Default is specified in .env file
@@ -56,6 +60,26 @@ class BackendSettings(BaseSettings):
     RAY_WORKER_ENV_VARS: list[str] = []
     RAY_WORKER_GPUS_ENV_VAR: str = "RAY_WORKER_GPUS"
     RAY_WORKER_GPUS_FRACTION_ENV_VAR: str = "RAY_WORKER_GPUS_FRACTION"
+    # Max size of the HuggingFace model cache of Ray workers (e.g. "100GB"), unbounded if unset
+    MODEL_CACHE_MAX_SIZE: ByteSize | None = None
+    # Seconds a pooled model server (see JobInferenceConfig.model_pool) stays up without receiving batches
+    MODEL_POOL_IDLE_TIMEOUT: int = 600
+    # Keep the status of non-terminal jobs in sync with Ray from a single background poll loop (JobStatusSynchronizer)
+    JOB_STATUS_SYNC_ENABLED: bool = True
+    # Seconds between polls of Ray; a job whose status is unchanged (and nobody waits on) is polled less and less
+    # often, up to the max interval
+    JOB_STATUS_SYNC_INTERVAL: float = 5
+    JOB_STATUS_SYNC_MAX_INTERVAL: float = 60
+    # Max number of pooled connections to the Ray dashboard, per client (see RayDashboardClient and
+    # PooledJobSubmissionClient)
+    RAY_DASHBOARD_MAX_CONNECTIONS: int = 20
+    # Timeout (in seconds) of the requests sent to the Ray dashboard by PooledJobSubmissionClient, so a hung
+    # dashboard does not block its callers forever
+    RAY_DASHBOARD_REQUEST_TIMEOUT: float = 60
+    # Min seconds between health checks of the shared upstream clients, which are recreated when found unhealthy
+    UPSTREAM_HEALTH_CHECK_INTERVAL: float = 30
+    # Max number of threads running the blocking calls (MLflow, S3, Ray job submission) made by async code paths
+    BLOCKING_IO_MAX_WORKERS: int = 16
 
     # Sensitive data patterns for redaction
     sensitive_patterns: list[re.Pattern] = [
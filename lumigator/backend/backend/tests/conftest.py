@@ -10,7 +10,7 @@ from collections.abc import Generator
 from datetime import datetime
 from pathlib import Path
 from typing import Any
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from uuid import UUID
 
 import evaluator
@@ -44,7 +44,7 @@ from backend.api.router import API_V1_PREFIX
 from backend.main import create_app
 from backend.records.jobs import JobRecord
 from backend.repositories.datasets import DatasetRepository
-from backend.repositories.jobs import JobRepository, JobResultRepository
+from backend.repositories.jobs import JobLogRepository, JobRepository, JobResultRepository
 from backend.repositories.secrets import SecretRepository
 from backend.services.datasets import DatasetService
 from backend.services.jobs import JobService
@@ -343,9 +343,12 @@ def app():
 
     If the environment variable is not specified, then a 'local.db' will be created in the
     folder where the tests are executed.
+
+    The background job status synchronizer is disabled, tests mock the Ray job status requests they expect.
     """
-    app = create_app()
-    return app
+    with patch.object(settings, "JOB_STATUS_SYNC_ENABLED", False):
+        app = create_app()
+        yield app
 
 
 @pytest.fixture(scope="function")
@@ -438,6 +441,11 @@ def result_repository(db_session):
     return JobResultRepository(session=db_session)
 
 
+@pytest.fixture(scope="function")
+def job_log_repository(db_session):
+    return JobLogRepository(session=db_session)
+
+
 @pytest.fixture(scope="function")
 def dataset_service(db_session, fake_s3fs):
     dataset_repo = DatasetRepository(db_session)
@@ -480,8 +488,18 @@ def job_record(db_session):
 
 
 @pytest.fixture(scope="function")
-def job_service(db_session, job_repository, result_repository, dataset_service, secret_service, background_tasks):
-    return JobService(job_repository, result_repository, None, dataset_service, secret_service, background_tasks)
+def job_service(
+    db_session, job_repository, result_repository, job_log_repository, dataset_service, secret_service, background_tasks
+):
+    return JobService(
+        job_repository,
+        result_repository,
+        job_log_repository,
+        None,
+        dataset_service,
+        secret_service,
+        background_tasks,
+    )
 
 
 @pytest.fixture(scope="function")
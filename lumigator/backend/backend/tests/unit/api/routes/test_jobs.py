@@ -2,13 +2,14 @@ import json
 import re
 import urllib
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from uuid import UUID
 
 import loguru
+import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
-from lumigator_schemas.jobs import JobInferenceConfig, JobInferenceCreate, JobType
+from lumigator_schemas.jobs import JobInferenceConfig, JobInferenceCreate, JobStatus, JobType
 
 from backend.services.exceptions.secret_exceptions import SecretNotFoundError
 from backend.settings import settings
@@ -132,8 +133,55 @@ def test_missing_api_key_in_job_creation(
     )
     infer_payload = infer_model.model_dump(mode="json")
 
-    with patch("backend.api.deps.JobSubmissionClient"):
+    with patch("backend.api.deps.shared_ray_client"):
         with patch.object(job_service, "create_job", side_effect=SecretNotFoundError("test error msg")):
             response = test_client.post("/jobs/inference/", headers=POST_HEADER, json=infer_payload)
             assert response is not None
             assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize(
+    "last_event_id, expected_prefix",
+    [
+        # The stored logs are served first.
+        ({}, "id: 7\ndata: line 1\ndata: \n\n"),
+        # Resuming after the first line.
+        ({"Last-Event-ID": "7"}, ""),
+    ],
+    ids=["from-start", "resuming"],
+)
+def test_stream_job_logs(
+    last_event_id,
+    expected_prefix,
+    test_client: TestClient,
+    job_repository,
+    job_service,
+    request_mock,
+    dependency_overrides_fakes,
+    job_service_dependency_override,
+):
+    created_job = job_repository.create(
+        name="test", description="", job_type=JobType.INFERENCE, status=JobStatus.RUNNING
+    )
+    # Only the first line was stored so far.
+    job_service.log_repo.append(created_job.id, 0, "line 1\n")
+
+    async def tail_job_logs(job_id):
+        for logs in ["line 1\nline 2\n", "progress 50%\rprogress 100%\n"]:
+            yield logs
+
+    job_service.ray_client = MagicMock()
+    job_service.ray_client.get_job_status.return_value = "RUNNING"
+    job_service.ray_client.tail_job_logs = tail_job_logs
+
+    response = test_client.get(f"/jobs/{created_job.id}/logs/stream", headers=last_event_id)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == expected_prefix + (
+        "id: 14\ndata: line 2\ndata: \n\n"
+        "id: 41\ndata: progress 50%\ndata: progress 100%\ndata: \n\n"
+        "event: end\ndata:\n\n"
+    )
+    # The logs of a running job are not downloaded from Ray before following them.
+    assert not request_mock.called
@@ -6,7 +6,7 @@ from lumigator_schemas.jobs import JobStatus, JobType
 from sqlalchemy.exc import IntegrityError
 
 from backend.records.jobs import JobRecord
-from backend.repositories.jobs import JobRepository, JobResultRepository
+from backend.repositories.jobs import JobLogRepository, JobRepository, JobResultRepository
 
 
 @pytest.fixture
@@ -54,3 +54,20 @@ def test_duplicate_results_error(job_repository, result_repository):
     result_repository.create(job_id=job.id, metrics={})
     with pytest.raises(IntegrityError):
         result_repository.create(job_id=job.id, metrics={})
+
+
+def test_append_and_read_job_logs(job_repository, db_session):
+    log_repository = JobLogRepository(db_session)
+    job = job_repository.create(name="test", description="")
+    assert log_repository.get_size(job.id) == 0
+    assert log_repository.read(job.id) == ""
+
+    log_repository.append(job.id, 0, "line 1\n")
+    log_repository.append(job.id, 7, "line 2\n")
+
+    assert log_repository.get_size(job.id) == 14
+    assert log_repository.read(job.id) == "line 1\nline 2\n"
+    assert log_repository.read(job.id, 3) == "e 1\nline 2\n"
+    # Only the chunks ending after the offset are read.
+    assert log_repository.read(job.id, 9) == "ne 2\n"
+    assert log_repository.read(job.id, 14) == ""
@@ -1,11 +1,14 @@
 import asyncio
+import io
 from uuid import UUID
 
 import pytest
+from fastapi import UploadFile
 from lumigator_schemas.datasets import DatasetFormat
 
 from backend.repositories.datasets import DatasetRepository
-from backend.services.datasets import DatasetService, dataset_has_gt
+from backend.services.datasets import DatasetService, dataset_has_gt, load_csv_dataset
+from backend.services.exceptions.dataset_exceptions import DatasetInvalidError, DatasetMissingFieldsError
 
 
 def test_delete_dataset_file_not_found(db_session, fake_s3fs):
@@ -28,6 +31,31 @@ def test_upload_dataset(db_session, fake_s3fs, valid_upload_file):
 
     assert upload_response.id is not None
     assert isinstance(upload_response.id, UUID)
+    assert upload_response.ground_truth
+
+    dataset_path = dataset_service.get_dataset_s3_path(upload_response.id)
+    assert fake_s3fs.cat(f"{dataset_path}/dataset.csv").decode() == "examples,ground_truth\nHello World,Hello\n"
+
+
+@pytest.mark.parametrize(
+    "contents, expected_exception",
+    [
+        (b"", DatasetMissingFieldsError),
+        (b"prompts,ground_truth\nHello World,Hello\n", DatasetMissingFieldsError),
+        (b"examples\n\xff\xfe\n", DatasetInvalidError),
+        (b"examples,ground_truth\nHello,World\nHello,World,again,more\n", DatasetInvalidError),
+    ],
+)
+def test_upload_invalid_dataset(db_session, fake_s3fs, contents, expected_exception):
+    dataset_repo = DatasetRepository(db_session)
+    dataset_service = DatasetService(dataset_repo, fake_s3fs)
+    upload_file = UploadFile(filename="dataset.csv", file=io.BytesIO(contents))
+    num_datasets = dataset_repo.count()
+
+    with pytest.raises(expected_exception):
+        dataset_service.upload_dataset(upload_file, DatasetFormat.JOB)
+
+    assert dataset_repo.count() == num_datasets
 
 
 @pytest.mark.parametrize(
@@ -72,5 +100,5 @@ def test_dataset_has_ground_truth(
     common_resources_sample_data_dir_summarization, dataset_filename, expected_ground_truth
 ):
     filename = str(common_resources_sample_data_dir_summarization / dataset_filename)
-    has_gt = dataset_has_gt(filename)
+    has_gt = dataset_has_gt(load_csv_dataset(filename))
     assert has_gt == expected_ground_truth
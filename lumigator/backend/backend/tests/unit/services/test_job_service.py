@@ -1,16 +1,25 @@
 import json
-from unittest.mock import patch
+import uuid
+from http import HTTPStatus
+from unittest.mock import MagicMock, patch
+from urllib.parse import urljoin
 
 import loguru
 import pytest
 from lumigator_schemas.datasets import DatasetFormat
 from lumigator_schemas.jobs import (
     JobCreate,
+    JobEvalConfig,
     JobInferenceConfig,
+    JobLogsResponse,
+    JobStatus,
     JobType,
 )
 from lumigator_schemas.secrets import SecretUploadRequest
+from ray.job_submission import JobDetails as RayJobDetails
+from ray.job_submission import JobStatus as RayJobStatus
 from ray.job_submission import JobSubmissionClient
+from ray.job_submission import JobType as RayJobType
 
 from backend.ray_submit.submission import RayJobEntrypoint
 from backend.services.exceptions.job_exceptions import JobValidationError
@@ -61,6 +70,21 @@ def test_set_explicit_inference_job_params(job_record, job_service):
         assert job_config.job.max_samples == 10
 
 
+@pytest.mark.parametrize("max_workers", [None, 4])
+def test_eval_job_max_workers(max_workers):
+    job_config = JobEvalConfig() if max_workers is None else JobEvalConfig(max_workers=max_workers)
+    request = JobCreate(
+        name="test_run_evaluation", job_config=job_config, dataset="cced289c-f869-4af1-9195-1d58e32d1cc1"
+    )
+
+    eval_config = job_settings_map[JobType.EVALUATION].generate_config(
+        request, request.dataset, "s3://bucket/path/to/dataset", "s3://lumigator-storage/path/to/results.json"
+    )
+
+    # Metrics are computed one after the other, unless concurrency is requested.
+    assert eval_config.evaluation.max_workers == (max_workers or 1)
+
+
 @pytest.mark.parametrize(
     ["model", "provider", "input_base_url", "returned_base_url"],
     [
@@ -152,3 +176,94 @@ def test_missing_api_key_in_job_creation(
     ):
         with pytest.raises(JobValidationError):
             job_service.create_job(request)
+
+
+@pytest.mark.parametrize("model_pool", [False, True])
+def test_model_pool_reserves_gpus_for_model_server(
+    job_service, dataset_service, valid_upload_file, dependency_overrides_fakes, model_pool
+):
+    test_dataset = dataset_service.upload_dataset(valid_upload_file, DatasetFormat.JOB)
+    request = JobCreate(
+        name="test_run_hugging_face",
+        description="Test run for Huggingface model",
+        job_config=JobInferenceConfig(
+            job_type=JobType.INFERENCE, model=TEST_SEQ2SEQ_MODEL, provider="hf", model_pool=model_pool
+        ),
+        dataset=str(test_dataset.id),
+    )
+    with (
+        patch("backend.services.jobs.submit_ray_job") as submit_ray_job,
+        patch.object(type(settings), "RAY_WORKER_GPUS", 1.0),
+    ):
+        job_service.create_job(request)
+
+    entrypoint = submit_ray_job.call_args[0][1]
+    job_config = json.loads(entrypoint.config.args["--config"])["job"]
+    if model_pool:
+        assert job_config["model_pool"] == {"idle_timeout": settings.MODEL_POOL_IDLE_TIMEOUT, "num_gpus": 1.0}
+        assert entrypoint.num_gpus == 0
+    else:
+        assert job_config["model_pool"] is None
+        assert entrypoint.num_gpus == 1.0
+
+
+def test_list_jobs_reconciles_statuses_from_a_single_ray_snapshot(job_service, job_repository):
+    running = job_repository.create(name="running", job_type=JobType.INFERENCE, status=JobStatus.RUNNING)
+    pending = job_repository.create(name="pending", job_type=JobType.INFERENCE, status=JobStatus.PENDING)
+    failed = job_repository.create(name="failed", job_type=JobType.INFERENCE, status=JobStatus.FAILED)
+    unknown = job_repository.create(name="unknown", job_type=JobType.INFERENCE, status=JobStatus.CREATED)
+    upstream_statuses = {running: RayJobStatus.SUCCEEDED, pending: RayJobStatus.PENDING, failed: RayJobStatus.RUNNING}
+    job_service.ray_client = MagicMock(spec=JobSubmissionClient)
+    job_service.ray_client.list_jobs.return_value = [
+        RayJobDetails(type=RayJobType.SUBMISSION, entrypoint="", submission_id=str(record.id), status=status)
+        for record, status in upstream_statuses.items()
+    ]
+
+    with patch.object(job_repository, "update_statuses", wraps=job_repository.update_statuses) as update_statuses:
+        jobs = job_service.list_jobs()
+
+    assert {job.name: job.status for job in jobs.items} == {
+        "running": JobStatus.SUCCEEDED,
+        "pending": JobStatus.PENDING,
+        "failed": JobStatus.FAILED,
+        "unknown": JobStatus.CREATED,
+    }
+    assert [job.id for job in jobs.items] == [running.id, pending.id, failed.id, unknown.id]
+    job_service.ray_client.list_jobs.assert_called_once()
+    job_service.ray_client.get_job_status.assert_not_called()
+    update_statuses.assert_called_once_with({running.id: JobStatus.SUCCEEDED})
+    assert job_repository.get(running.id).status == JobStatus.SUCCEEDED
+
+
+def test_get_job_logs_stores_and_returns_new_logs_only(job_service, job_repository, job_log_repository, request_mock):
+    job = job_repository.create(name="test", description="")
+    logs_url = urljoin(settings.RAY_JOBS_URL, f"{job.id}/logs")
+
+    request_mock.get(logs_url, text=json.dumps({"logs": "line 1\n"}))
+    logs = job_service.get_job_logs(job.id)
+    assert logs == JobLogsResponse(logs="line 1\n", next_offset=7)
+
+    request_mock.get(logs_url, text=json.dumps({"logs": "line 1\nline 2\n"}))
+    logs = job_service.get_job_logs(job.id, logs.next_offset)
+    assert logs == JobLogsResponse(logs="line 2\n", next_offset=14)
+
+    # The logs are stored append-only, in one chunk per new logs.
+    assert job_log_repository.count() == 2
+    assert job_log_repository.read(job.id) == "line 1\nline 2\n"
+
+    # The stored logs are returned when Ray is not available.
+    request_mock.get(logs_url, status_code=HTTPStatus.SERVICE_UNAVAILABLE)
+    assert job_service.get_job_logs(job.id, 7) == JobLogsResponse(logs="line 2\n", next_offset=14)
+
+
+async def test_tail_job_logs_skips_logs_before_offset(job_service):
+    async def tail_job_logs(job_id):
+        for logs in ["line 1\n", "line 2\n", "line 3\n"]:
+            yield logs
+
+    job_service.ray_client = MagicMock(spec=JobSubmissionClient)
+    job_service.ray_client.tail_job_logs = tail_job_logs
+
+    logs = [logs async for logs in job_service.tail_job_logs(uuid.uuid4(), offset=10)]
+
+    assert logs == [JobLogsResponse(logs="e 2\n", next_offset=14), JobLogsResponse(logs="line 3\n", next_offset=21)]
@@ -0,0 +1,84 @@
+import asyncio
+import contextlib
+from unittest.mock import MagicMock
+
+import pytest
+from lumigator_schemas.jobs import JobStatus, JobType
+from ray.job_submission import JobDetails as RayJobDetails
+from ray.job_submission import JobStatus as RayJobStatus
+from ray.job_submission import JobSubmissionClient
+from ray.job_submission import JobType as RayJobType
+
+from backend.services.job_status import JobStatusSynchronizer
+
+
+def ray_jobs(statuses):
+    return [
+        RayJobDetails(type=RayJobType.SUBMISSION, entrypoint="", submission_id=str(record.id), status=status)
+        for record, status in statuses.items()
+    ]
+
+
+@pytest.fixture
+def ray_client():
+    return MagicMock(spec=JobSubmissionClient)
+
+
+@pytest.fixture
+def synchronizer(db_session, ray_client):
+    @contextlib.contextmanager
+    def session_factory():
+        yield db_session
+
+    return JobStatusSynchronizer(lambda: ray_client, session_factory, poll_interval=0.01, max_poll_interval=0.04)
+
+
+async def test_sync_polls_ray_once_and_backs_off_unchanged_jobs(synchronizer, ray_client, job_repository):
+    running = job_repository.create(name="running", job_type=JobType.INFERENCE, status=JobStatus.RUNNING)
+    finishing = job_repository.create(name="finishing", job_type=JobType.INFERENCE, status=JobStatus.RUNNING)
+    ray_client.list_jobs.return_value = ray_jobs({running: RayJobStatus.RUNNING, finishing: RayJobStatus.SUCCEEDED})
+
+    await synchronizer.sync()
+    # The unchanged job is not due for a poll yet.
+    await synchronizer.sync()
+
+    ray_client.list_jobs.assert_called_once()
+    ray_client.get_job_status.assert_not_called()
+    assert job_repository.get(finishing.id).status == JobStatus.SUCCEEDED
+    assert job_repository.get(running.id).status == JobStatus.RUNNING
+
+    await asyncio.sleep(0.02)
+    await synchronizer.sync()
+
+    assert ray_client.list_jobs.call_count == 2
+
+
+async def test_waiters_share_the_poll_loop(synchronizer, ray_client, job_repository):
+    job = job_repository.create(name="job", job_type=JobType.INFERENCE, status=JobStatus.RUNNING)
+    ray_client.list_jobs.side_effect = [ray_jobs({job: RayJobStatus.RUNNING})] * 3 + [
+        ray_jobs({job: RayJobStatus.FAILED})
+    ] * 10
+
+    synchronizer.start()
+    try:
+        statuses = await asyncio.gather(*(synchronizer.wait_for_job(job.id, timeout=5) for _ in range(5)))
+    finally:
+        await synchronizer.stop()
+
+    assert statuses == [JobStatus.FAILED] * 5
+    assert ray_client.list_jobs.call_count < 10
+    assert job_repository.get(job.id).status == JobStatus.FAILED
+
+
+async def test_wait_for_job_times_out_with_last_known_status(synchronizer, ray_client, job_repository):
+    job = job_repository.create(name="job", job_type=JobType.INFERENCE, status=JobStatus.PENDING)
+    ray_client.list_jobs.return_value = ray_jobs({job: RayJobStatus.RUNNING})
+
+    synchronizer.start()
+    try:
+        status = await synchronizer.wait_for_job(job.id, timeout=0.1)
+    finally:
+        await synchronizer.stop()
+
+    assert status == JobStatus.RUNNING
+    assert job_repository.get(job.id).status == JobStatus.RUNNING
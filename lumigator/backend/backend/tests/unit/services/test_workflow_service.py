@@ -1,15 +1,21 @@
 import asyncio
+import io
+import itertools
+import threading
+import time
 import unittest
 from unittest.mock import AsyncMock, MagicMock
-from uuid import UUID
+from uuid import UUID, uuid4
 
+from fastapi import BackgroundTasks
+from lumigator_schemas.jobs import JobStatus
 from lumigator_schemas.tasks import (
     SummarizationTaskDefinition,
     TaskType,
     TextGenerationTaskDefinition,
     TranslationTaskDefinition,
 )
-from lumigator_schemas.workflows import WorkflowCreateRequest
+from lumigator_schemas.workflows import WorkflowCreateRequest, WorkflowStatus
 
 from backend.services.exceptions.workflow_exceptions import WorkflowValidationError
 from backend.services.workflows import WorkflowService
@@ -91,3 +97,98 @@ def test_custom_system_prompt_overrides_default():
     # Verify that the custom system prompt was used instead of the default
     assert workflow_request.system_prompt == custom_prompt
     assert workflow_request.system_prompt != default_system_prompt
+
+
+async def test_concurrent_workflows_do_not_stall_the_event_loop(fake_mlflow_tracking_client):
+    """Test that concurrent workflows waiting on slow Ray, S3 and MLflow calls leave the event loop responsive."""
+    blocking_time = 0.1
+    num_workflows = 8
+    total_blocking_time = 0.0
+    lock = threading.Lock()
+
+    def slow(make_result=lambda: None):
+        def call(*args, **kwargs):
+            nonlocal total_blocking_time
+            time.sleep(blocking_time)
+            with lock:
+                total_blocking_time += blocking_time
+            return make_result()
+
+        return call
+
+    # MLflow
+    experiment = MagicMock(
+        experiment_id="exp-1",
+        lifecycle_stage="active",
+        creation_time=123456789,
+        last_update_time=123456789,
+        tags={
+            "task_definition": SummarizationTaskDefinition().model_dump_json(),
+            "dataset": str(uuid4()),
+            "max_samples": "10",
+        },
+    )
+    experiment.name = "experiment"
+    run_ids = (f"run-{i}" for i in itertools.count())
+    mlflow_client = MagicMock()
+    mlflow_client.get_experiment.side_effect = slow(lambda: experiment)
+    mlflow_client.search_runs.side_effect = slow(list)
+    mlflow_client.create_run.side_effect = slow(lambda: MagicMock(info=MagicMock(run_id=next(run_ids))))
+    for method in ("set_tag", "update_run", "log_param", "log_metric"):
+        getattr(mlflow_client, method).side_effect = slow()
+    fake_mlflow_tracking_client._client = mlflow_client
+    # Compiling the results of a workflow is covered by the MLflow tracking client tests.
+    fake_mlflow_tracking_client.get_workflow = AsyncMock(return_value=None)
+
+    # Ray
+    async def wait_for_job_complete(job_id, max_wait_time_sec):
+        await asyncio.sleep(blocking_time)
+        return JobStatus.SUCCEEDED
+
+    job_service = MagicMock()
+    job_service.create_job.side_effect = slow(lambda: MagicMock(id=uuid4()))
+    job_service.wait_for_job_complete.side_effect = wait_for_job_complete
+    job_service._add_dataset_to_db.side_effect = slow(uuid4)
+    job_service._validate_results.side_effect = slow()
+    job_service._get_s3_uri.side_effect = lambda job_id: f"s3://bucket/jobs/results/{job_id}/results.json"
+
+    # S3
+    dataset_service = MagicMock()
+    dataset_service.get_dataset.return_value = MagicMock(filename="dataset.csv", generated=False)
+    dataset_service.s3_filesystem.open.side_effect = slow(lambda: io.StringIO('{"metrics": {"rouge1_mean": 0.5}}'))
+
+    workflow_service = WorkflowService(
+        MagicMock(), job_service, dataset_service, BackgroundTasks(), MagicMock(), fake_mlflow_tracking_client
+    )
+    request = WorkflowCreateRequest(
+        name="workflow", experiment_id="exp-1", model=TEST_SEQ2SEQ_MODEL, provider="hf", metrics=["rouge"]
+    )
+    workflows = [MagicMock(id=f"workflow-{i}") for i in range(num_workflows)]
+
+    max_lag = 0.0
+    done = False
+
+    async def heartbeat():
+        nonlocal max_lag
+        while not done:
+            start = time.monotonic()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.monotonic() - start - 0.01)
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    start = time.monotonic()
+    try:
+        await asyncio.gather(
+            *(workflow_service._run_inference_eval_pipeline(workflow, request) for workflow in workflows)
+        )
+    finally:
+        done = True
+        await heartbeat_task
+    elapsed = time.monotonic() - start
+
+    for workflow in workflows:
+        mlflow_client.set_tag.assert_any_call(workflow.id, "status", WorkflowStatus.SUCCEEDED.value)
+    assert job_service.create_job.call_count == 2 * num_workflows
+    # The blocking calls of the different workflows overlap, and never hold up the event loop.
+    assert elapsed < total_blocking_time / 2
+    assert max_lag < blocking_time / 2
@@ -0,0 +1,132 @@
+from uuid import uuid4
+
+import httpx
+import pytest
+from lumigator_schemas.jobs import JobLogsResponse
+
+from backend.ray_submit.dashboard import RayDashboardClient
+from backend.services.exceptions.job_exceptions import JobNotFoundError, JobUpstreamError
+
+JOBS_URL = "http://ray:8265/api/jobs/"
+
+
+def _dashboard_client(handler) -> tuple[RayDashboardClient, list[httpx.Request]]:
+    """Creates a client whose requests are recorded and answered by the given handler."""
+    requests = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return handler(request)
+
+    return RayDashboardClient(jobs_url=JOBS_URL, transport=httpx.MockTransport(record)), requests
+
+
+async def test_get_job_status():
+    job_id = uuid4()
+    client, requests = _dashboard_client(lambda request: httpx.Response(200, json={"status": "RUNNING"}))
+
+    assert await client.get_job_status(job_id) == "running"
+    assert requests[0].method == "GET"
+    assert str(requests[0].url) == f"{JOBS_URL}{job_id}"
+    await client.aclose()
+
+
+async def test_stop_job():
+    job_id = uuid4()
+    client, requests = _dashboard_client(lambda request: httpx.Response(200, json={"stopped": True}))
+
+    await client.stop_job(job_id)
+    assert requests[0].method == "POST"
+    assert str(requests[0].url) == f"{JOBS_URL}{job_id}/stop"
+    await client.aclose()
+
+
+async def test_get_job_logs():
+    job_id = uuid4()
+    client, requests = _dashboard_client(lambda request: httpx.Response(200, json={"logs": "line 1\nline 2\n"}))
+
+    assert await client.get_job_logs(job_id) == JobLogsResponse(logs="line 1\nline 2\n")
+    assert requests[0].method == "GET"
+    assert str(requests[0].url) == f"{JOBS_URL}{job_id}/logs"
+    await client.aclose()
+
+
+async def test_connections_are_reused():
+    client, requests = _dashboard_client(lambda request: httpx.Response(200, json={"status": "SUCCEEDED"}))
+
+    await client.get_job_status(uuid4())
+    pooled_client = client._get_client()
+    await client.get_job_status(uuid4())
+
+    assert client._get_client() is pooled_client
+    assert len(requests) == 2
+    await client.aclose()
+
+
+@pytest.mark.parametrize(
+    "call",
+    [
+        lambda client, job_id: client.get_job_status(job_id),
+        lambda client, job_id: client.stop_job(job_id),
+        lambda client, job_id: client.get_job_logs(job_id),
+    ],
+    ids=["status", "stop", "logs"],
+)
+async def test_unknown_job(call):
+    client, _ = _dashboard_client(lambda request: httpx.Response(404, text="Job not found"))
+
+    with pytest.raises(JobNotFoundError):
+        await call(client, uuid4())
+    await client.aclose()
+
+
+@pytest.mark.parametrize(
+    "call",
+    [
+        lambda client, job_id: client.get_job_status(job_id),
+        lambda client, job_id: client.stop_job(job_id),
+        lambda client, job_id: client.get_job_logs(job_id),
+    ],
+    ids=["status", "stop", "logs"],
+)
+@pytest.mark.parametrize(
+    "handler",
+    [
+        lambda request: httpx.Response(500, text="Internal Server Error"),
+        lambda request: httpx.Response(503, text="Service Unavailable"),
+    ],
+    ids=["500", "503"],
+)
+async def test_unexpected_status_code(call, handler):
+    client, _ = _dashboard_client(handler)
+
+    with pytest.raises(JobUpstreamError, match="Unexpected status code"):
+        await call(client, uuid4())
+    await client.aclose()
+
+
+async def test_connection_error():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("Connection refused", request=request)
+
+    client, _ = _dashboard_client(handler)
+
+    with pytest.raises(JobUpstreamError):
+        await client.get_job_status(uuid4())
+    await client.aclose()
+
+
+@pytest.mark.parametrize(
+    "call",
+    [
+        lambda client, job_id: client.get_job_status(job_id),
+        lambda client, job_id: client.get_job_logs(job_id),
+    ],
+    ids=["status", "logs"],
+)
+async def test_invalid_response(call):
+    client, _ = _dashboard_client(lambda request: httpx.Response(200, text="not json"))
+
+    with pytest.raises(JobUpstreamError):
+        await call(client, uuid4())
+    await client.aclose()
@@ -0,0 +1,111 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from fastapi import status
+
+from backend.ray_submit.submission import PooledJobSubmissionClient
+from backend.settings import settings
+from backend.upstream import SharedClient
+
+
+def test_shared_client_is_created_once():
+    factory = MagicMock()
+    shared_client = SharedClient("test", factory)
+
+    assert shared_client.get() is shared_client.get()
+    factory.assert_called_once()
+
+    shared_client.reset()
+    shared_client.get()
+    assert factory.call_count == 2
+
+
+def test_shared_client_retries_failed_creation():
+    client = MagicMock()
+    factory = MagicMock(side_effect=[requests.ConnectionError(), client])
+    shared_client = SharedClient("test", factory)
+
+    with pytest.raises(requests.ConnectionError):
+        shared_client.get()
+
+    assert shared_client.get() is client
+
+
+def test_shared_client_reconnects_when_unhealthy():
+    unhealthy, healthy = MagicMock(), MagicMock()
+    unhealthy.check.side_effect = requests.ConnectionError()
+    factory = MagicMock(side_effect=[healthy, unhealthy, healthy])
+    shared_client = SharedClient("test", factory, health_check=lambda client: client.check(), health_check_interval=0)
+
+    assert shared_client.get() is healthy
+    assert shared_client.get() is healthy
+    # The health check only runs on a client that was used before.
+    shared_client.reset()
+    assert shared_client.get() is unhealthy
+    assert shared_client.get() is healthy
+    assert factory.call_count == 3
+
+
+def test_shared_client_checks_health_at_most_once_per_interval():
+    client = MagicMock()
+    shared_client = SharedClient("test", lambda: client, health_check=lambda c: c.check(), health_check_interval=60)
+
+    for _ in range(5):
+        shared_client.get()
+
+    client.check.assert_not_called()
+
+
+def test_slow_health_check_does_not_block_other_users():
+    """While a health check hangs, the other users of the shared client keep getting it."""
+    client = MagicMock()
+    checking, unblock = threading.Event(), threading.Event()
+
+    def health_check(c):
+        # Only the first check hangs.
+        if not checking.is_set():
+            checking.set()
+            unblock.wait(timeout=5)
+
+    shared_client = SharedClient("test", lambda: client, health_check=health_check, health_check_interval=0)
+    shared_client.get()
+
+    checker = threading.Thread(target=shared_client.get)
+    checker.start()
+    try:
+        assert checking.wait(timeout=5)
+        assert shared_client.get() is client
+        assert checker.is_alive()
+    finally:
+        unblock.set()
+        checker.join()
+
+
+def test_pooled_job_submission_client_reuses_its_session(request_mock, json_ray_version):
+    request_mock.get(
+        url=settings.RAY_VERSION_URL,
+        status_code=status.HTTP_200_OK,
+        text=json_ray_version.read_text(),
+    )
+
+    client = PooledJobSubmissionClient(settings.RAY_DASHBOARD_URL, max_connections=4)
+    assert client.get_version() == "4"
+
+    # The connection and version checks of the constructor, then get_version.
+    assert request_mock.call_count == 3
+    assert client._session.get_adapter(settings.RAY_DASHBOARD_URL)._pool_maxsize == 4
+
+
+def test_pooled_job_submission_client_sets_a_default_timeout(request_mock, json_ray_version):
+    request_mock.get(
+        url=settings.RAY_VERSION_URL,
+        status_code=status.HTTP_200_OK,
+        text=json_ray_version.read_text(),
+    )
+
+    client = PooledJobSubmissionClient(settings.RAY_DASHBOARD_URL, timeout=7)
+    client.get_version()
+
+    assert all(request.timeout == 7 for request in request_mock.request_history)
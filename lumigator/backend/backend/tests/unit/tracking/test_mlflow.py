@@ -1,3 +1,5 @@
+import asyncio
+import time
 import uuid
 from http import HTTPStatus
 from unittest.mock import AsyncMock, MagicMock
@@ -371,3 +373,41 @@ def test_compile_metrics_conflict(fake_mlflow_tracking_client):
         "Duplicate metric 'accuracy' found in job 'd34dbeef-1000-0000-0000-000000000002'. "
         "Stored value: 0.95, this value: 0.75"
     )
+
+
+async def test_blocking_calls_do_not_stall_the_event_loop(fake_mlflow_tracking_client, sample_mlflow_run):
+    """Test that concurrent workflows waiting on a slow MLflow server leave the event loop responsive."""
+    blocking_time = 0.2
+
+    def slow_get_run(run_id):
+        time.sleep(blocking_time)
+        return sample_mlflow_run
+
+    fake_mlflow_tracking_client._client = MagicMock()
+    fake_mlflow_tracking_client._client.set_tag.side_effect = lambda *args, **kwargs: time.sleep(blocking_time)
+    fake_mlflow_tracking_client._client.get_run.side_effect = slow_get_run
+
+    async def run_workflow():
+        await fake_mlflow_tracking_client.update_workflow_status("workflow", WorkflowStatus.RUNNING)
+        return await fake_mlflow_tracking_client.get_job("d34dbeef-1000-0000-0000-000000000000")
+
+    max_lag = 0.0
+    done = False
+
+    async def heartbeat():
+        nonlocal max_lag
+        while not done:
+            start = time.monotonic()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.monotonic() - start - 0.01)
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        results = await asyncio.gather(*(run_workflow() for _ in range(8)))
+    finally:
+        done = True
+        await heartbeat_task
+
+    assert len(results) == 8
+    assert fake_mlflow_tracking_client._client.get_run.call_count == 8
+    assert max_lag < blocking_time / 2
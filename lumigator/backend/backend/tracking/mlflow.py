@@ -1,15 +1,13 @@
 import asyncio
 import contextlib
+import functools
 import http
 import json
 from collections.abc import Generator
 from datetime import datetime
-from http import HTTPStatus
-from urllib.parse import urljoin
 from uuid import UUID
 
 import loguru
-import requests
 from lumigator_schemas.experiments import GetExperimentResponse
 from lumigator_schemas.jobs import JobLogsResponse, JobResultObject, JobResults
 from lumigator_schemas.tasks import TaskDefinition
@@ -24,8 +22,9 @@ from mlflow.utils.mlflow_tags import MLFLOW_PARENT_RUN_ID
 from pydantic import BaseModel, TypeAdapter
 from s3fs import S3FileSystem
 
+from backend.blocking_io import run_blocking
+from backend.ray_submit.dashboard import ray_dashboard_client
 from backend.services.exceptions.experiment_exceptions import ExperimentConflictError
-from backend.services.exceptions.job_exceptions import JobNotFoundError, JobUpstreamError
 from backend.services.exceptions.tracking_exceptions import RunNotFoundError, TrackingClientUpstreamError
 from backend.settings import settings
 from backend.tracking.schemas import RunOutputs
@@ -50,8 +49,8 @@ class MLflowTrackingClient(TrackingClient):
     # The filename for results compiled from all jobs in a workflow.
     _WORKFLOW_OUTPUT_FILENAME = "compiled.json"
 
-    def __init__(self, tracking_uri: str, s3_file_system: S3FileSystem):
-        self._client = MlflowClient(tracking_uri=tracking_uri)
+    def __init__(self, tracking_uri: str, s3_file_system: S3FileSystem, client: MlflowClient | None = None):
+        self._client = client or MlflowClient(tracking_uri=tracking_uri)
         self._s3_file_system = s3_file_system
 
     async def create_experiment(
@@ -87,7 +86,7 @@ class MLflowTrackingClient(TrackingClient):
 
         # Try to create the experiment and handle any conflicts
         try:
-            experiment_id = self._create_experiment(experiment_name, tags)
+            experiment_id = await run_blocking(self._create_experiment, experiment_name, tags)
         except ExperimentConflictError:
             # TODO Let the user decide in the case of failures.
             # Also, use a uuid as name and an arbitrary tag as descriptive name
@@ -99,10 +98,10 @@ class MLflowTrackingClient(TrackingClient):
             )
             experiment_name = f"{experiment_name}_{timestamp_suffix}"
             # One last attempt, this time we allow all exceptions to bubble up.
-            experiment_id = self._create_experiment(experiment_name, tags)
+            experiment_id = await run_blocking(self._create_experiment, experiment_name, tags)
 
         # get the experiment so you can populate the response
-        experiment = self._client.get_experiment(experiment_id)
+        experiment = await run_blocking(self._client.get_experiment, experiment_id)
         return await self._format_experiment(experiment)
 
     async def delete_experiment(self, experiment_id: str) -> None:
@@ -110,12 +109,12 @@ class MLflowTrackingClient(TrackingClient):
         we will use the functions of this class instead, so that we make sure we correctly
         clean up all the artifacts/runs/etc. associated with the experiment.
         """
-        workflow_ids = self._find_workflows(experiment_id)
+        workflow_ids = await run_blocking(self._find_workflows, experiment_id)
         # delete all the workflows
         await asyncio.gather(*(self.delete_workflow(workflow_id) for workflow_id in workflow_ids))
 
         # delete the experiment
-        self._client.delete_experiment(experiment_id)
+        await run_blocking(self._client.delete_experiment, experiment_id)
 
     def _compile_metrics(self, job_ids: list) -> dict[str, float]:
         """Aggregate metrics from job runs, ensuring no duplicate keys.
@@ -169,7 +168,7 @@ class MLflowTrackingClient(TrackingClient):
     async def get_experiment(self, experiment_id: str) -> GetExperimentResponse | None:
         """Get an experiment and all its workflows."""
         try:
-            experiment = self._client.get_experiment(experiment_id)
+            experiment = await run_blocking(self._client.get_experiment, experiment_id)
         except MlflowException as e:
             if e.get_http_status_code() == http.HTTPStatus.NOT_FOUND:
                 return None
@@ -182,7 +181,7 @@ class MLflowTrackingClient(TrackingClient):
 
     async def _format_experiment(self, experiment: MlflowExperiment) -> GetExperimentResponse:
         # now get all the workflows associated with that experiment
-        workflow_ids = self._find_workflows(experiment.experiment_id)
+        workflow_ids = await run_blocking(self._find_workflows, experiment.experiment_id)
         workflows = [
             workflow
             for workflow in await asyncio.gather(*(self.get_workflow(workflow_id) for workflow_id in workflow_ids))
@@ -212,8 +211,8 @@ class MLflowTrackingClient(TrackingClient):
         experiments = []
         skipped = 0
         while True:
-            response = self._client.search_experiments(
-                page_token=page_token, filter_string='tags.lumigator_version != ""'
+            response = await run_blocking(
+                self._client.search_experiments, page_token=page_token, filter_string='tags.lumigator_version != ""'
             )
             if skipped < skip:
                 skipped += len(response)
@@ -242,7 +241,8 @@ class MLflowTrackingClient(TrackingClient):
     ) -> WorkflowResponse:
         """Create a new workflow."""
         # make sure its status is CREATED
-        workflow = self._client.create_run(
+        workflow = await run_blocking(
+            self._client.create_run,
             experiment_id=experiment_id,
             tags={
                 "mlflow.runName": name,
@@ -272,14 +272,14 @@ class MLflowTrackingClient(TrackingClient):
                     it or building a response.
         """
         try:
-            workflow = self._fetch_workflow_run(workflow_id)
+            workflow = await run_blocking(self._fetch_workflow_run, workflow_id)
         except MlflowException as e:
             raise TrackingClientUpstreamError("mlflow", "Error fetching workflow") from e
 
         if not workflow:
             return None
 
-        jobs = self._get_job_ids(workflow_id, workflow.info.experiment_id)
+        jobs = await run_blocking(self._get_job_ids, workflow_id, workflow.info.experiment_id)
 
         try:
             workflow_details = await self._build_workflow_response(workflow, jobs)
@@ -295,10 +295,10 @@ class MLflowTrackingClient(TrackingClient):
 
         # Sanity check, don't recompile if the artifact already exists.
         workflow_s3_uri = self._get_s3_uri(workflow_id)
-        if not self._s3_file_system.exists(workflow_s3_uri):
-            results = self._generate_compiled_results(workflow_details.jobs)
+        if not await run_blocking(self._s3_file_system.exists, workflow_s3_uri):
+            results = await run_blocking(self._generate_compiled_results, workflow_details.jobs)
             # Upload the compiled results to S3.
-            self._upload_to_s3(workflow_s3_uri, results)
+            await run_blocking(self._upload_to_s3, workflow_s3_uri, results)
 
         # Update the download URL in the response as compiled results are available.
         workflow_details.artifacts_download_url = await self._generate_presigned_url(workflow_id)
@@ -314,48 +314,23 @@ class MLflowTrackingClient(TrackingClient):
         """
         try:
             # Update our tag, but also the run status of the 'run' in MLflow.
-            self._client.set_tag(workflow_id, "status", status.value)
+            await run_blocking(self._client.set_tag, workflow_id, "status", status.value)
             # See: https://mlflow.org/docs/latest/api_reference/rest-api.html#mlflowupdaterun
             # See: https://github.com/mlflow/mlflow/blob/4a4716324a2e736eaad73ff9dcc76ff478a29ea9/mlflow/tracking/client.py#L2181
-            self._client.update_run(workflow_id, status=RunStatus.to_string(self._WORKFLOW_TO_MLFLOW_STATUS[status]))
+            mlflow_status = RunStatus.to_string(self._WORKFLOW_TO_MLFLOW_STATUS[status])
+            await run_blocking(self._client.update_run, workflow_id, status=mlflow_status)
         except MlflowException as e:
             raise TrackingClientUpstreamError(
                 "mlflow", f"Error updating workflow: {workflow_id} status: {status.value}"
             ) from e
 
-    def _get_ray_job_logs(self, ray_job_id: str):
-        """Get the logs for a Ray job."""
-        resp = requests.get(urljoin(settings.RAY_JOBS_URL, f"{ray_job_id}/logs"), timeout=5)  # 5 sec
-
-        if resp.status_code == HTTPStatus.NOT_FOUND:
-            loguru.logger.error(f"Upstream job logs not found: {resp.status_code}, error: {resp.text or ''}")
-            raise JobNotFoundError(UUID(ray_job_id), "Ray job logs not found") from None
-        elif resp.status_code != HTTPStatus.OK:
-            loguru.logger.error(
-                f"Unexpected status code getting job logs: {resp.status_code}, \
-                    error: {resp.text or ''}"
-            )
-            raise JobUpstreamError(ray_job_id, "Non OK status code retrieving Ray job information") from None
-
-        try:
-            metadata = json.loads(resp.text)
-            return JobLogsResponse(**metadata)
-        except json.JSONDecodeError as e:
-            loguru.logger.error(f"JSON decode error: {e}")
-            loguru.logger.error(f"Response text: {resp.text}")
-            raise JobUpstreamError(ray_job_id, "JSON decode error in Ray response") from e
-
     async def get_workflow_logs(self, workflow_id: str) -> JobLogsResponse:
-        workflow_run = self._client.get_run(workflow_id)
         # get the jobs associated with the workflow
-        all_jobs = self._client.search_runs(
-            experiment_ids=[workflow_run.info.experiment_id],
-            filter_string=f"tags.{MLFLOW_PARENT_RUN_ID} = '{workflow_id}'",
-        )
+        all_jobs = await self.list_jobs(workflow_id)
         # sort the jobs by created_at, with the oldest last
         all_jobs = sorted(all_jobs, key=lambda x: x.info.start_time)
         all_ray_job_ids = [run.data.params.get("ray_job_id") for run in all_jobs]
-        logs = [self._get_ray_job_logs(ray_job_id) for ray_job_id in all_ray_job_ids]
+        logs = await asyncio.gather(*(ray_dashboard_client.get_job_logs(ray_job_id) for ray_job_id in all_ray_job_ids))
         # combine the logs into a single string
         # TODO: This is not a great solution but it matches the current API
         return JobLogsResponse(logs="\n================\n".join([log.logs for log in logs]))
@@ -363,9 +338,10 @@ class MLflowTrackingClient(TrackingClient):
     async def delete_workflow(self, workflow_id: str) -> WorkflowResponse:
         """Delete a workflow."""
         # first, get the workflow
-        workflow = self._client.get_run(workflow_id)
+        workflow = await run_blocking(self._client.get_run, workflow_id)
         # get all the jobs associated with the workflow
-        all_jobs = self._client.search_runs(
+        all_jobs = await run_blocking(
+            self._client.search_runs,
             experiment_ids=[workflow.info.experiment_id],
             filter_string=f"tags.{MLFLOW_PARENT_RUN_ID} = '{workflow_id}'",
         )
@@ -374,7 +350,7 @@ class MLflowTrackingClient(TrackingClient):
         await asyncio.gather(*(self.delete_job(job_id) for job_id in all_job_ids))
 
         # delete the workflow
-        self._client.delete_run(workflow_id)
+        await run_blocking(self._client.delete_run, workflow_id)
         # TODO: delete the compiled results from S3, and any saved artifacts
         return WorkflowResponse(
             id=workflow_id,
@@ -393,16 +369,20 @@ class MLflowTrackingClient(TrackingClient):
 
     async def create_job(self, experiment_id: str, workflow_id: str, name: str, job_id: str) -> str:
         """Link a started job to an experiment and a workflow."""
-        run = self._client.create_run(
+        run = await run_blocking(
+            self._client.create_run,
             experiment_id=experiment_id,
             tags={MLFLOW_PARENT_RUN_ID: workflow_id, "mlflow.runName": name},
         )
         # log the ray_job_id as a param, we'll use this to get the logs later
-        self._client.log_param(run.info.run_id, "ray_job_id", job_id)
+        await run_blocking(self._client.log_param, run.info.run_id, "ray_job_id", job_id)
         return run.info.run_id
 
     async def update_job(self, job_id: str, data: RunOutputs):
         """Update the metrics and parameters of a job."""
+        await run_blocking(self._log_outputs, job_id, data)
+
+    def _log_outputs(self, job_id: str, data: RunOutputs):
         for metric, value in data.metrics.items():
             self._client.log_metric(job_id, metric, value)
         for parameter, value in data.parameters.items():
@@ -417,7 +397,7 @@ class MLflowTrackingClient(TrackingClient):
         :return: The results of the job.
         :raises RunNotFoundError: If the job is not found.
         """
-        run = self._client.get_run(job_id)
+        run = await run_blocking(self._client.get_run, job_id)
         if run.info.lifecycle_stage == "deleted":
             raise RunNotFoundError(job_id, "deleted")
         return JobResults(
@@ -430,13 +410,14 @@ class MLflowTrackingClient(TrackingClient):
 
     async def delete_job(self, job_id: str):
         """Delete a job."""
-        self._client.delete_run(job_id)
+        await run_blocking(self._client.delete_run, job_id)
 
     async def list_jobs(self, workflow_id: str):
         """List all jobs in a workflow."""
-        workflow_run = self._client.get_run(workflow_id)
+        workflow_run = await run_blocking(self._client.get_run, workflow_id)
         # get the jobs associated with the workflow
-        all_jobs = self._client.search_runs(
+        all_jobs = await run_blocking(
+            self._client.search_runs,
             experiment_ids=[workflow_run.info.experiment_id],
             filter_string=f"tags.{MLFLOW_PARENT_RUN_ID} = '{workflow_id}'",
         )
@@ -505,8 +486,8 @@ class MLflowTrackingClient(TrackingClient):
             status=WorkflowStatus(workflow.data.tags.get("status")),
             created_at=datetime.fromtimestamp(workflow.info.start_time / 1000),
             jobs=await asyncio.gather(*(self.get_job(job_id) for job_id in job_ids)),
-            metrics=self._compile_metrics(job_ids),
-            parameters=self._compile_parameters(job_ids),
+            metrics=await run_blocking(self._compile_metrics, job_ids),
+            parameters=await run_blocking(self._compile_parameters, job_ids),
         )
 
     def _generate_compiled_results(self, jobs: list[JobResults]) -> JobResultObject:
@@ -591,6 +572,16 @@ class MLflowTrackingClient(TrackingClient):
             raise TrackingClientUpstreamError(name) from e
 
 
+@functools.cache
+def _get_mlflow_client(tracking_uri: str) -> MlflowClient:
+    """Returns the MlflowClient shared by all the requests to a tracking server.
+
+    MLflow itself sends the requests of all its clients over a single pool of connections (sized by the
+    ``MLFLOW_HTTP_POOL_MAXSIZE`` env var) and retries the failed ones, so the client needs no reconnects.
+    """
+    return MlflowClient(tracking_uri=tracking_uri)
+
+
 class MLflowClientManager:
     """Connection manager for MLflow client."""
 
@@ -604,5 +595,6 @@ class MLflowClientManager:
         tracking_client = MLflowTrackingClient(
             tracking_uri=self._tracking_uri,
             s3_file_system=self._s3_file_system,
+            client=_get_mlflow_client(self._tracking_uri),
         )
         yield tracking_client
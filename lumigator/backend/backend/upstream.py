@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+import loguru
+from s3fs import S3FileSystem
+
+from backend.ray_submit.submission import PooledJobSubmissionClient
+from backend.settings import settings
+
+T = TypeVar("T")
+
+
+class SharedClient(Generic[T]):
+    """A client of an upstream service, created on first use and shared for the lifetime of the app.
+
+    A client that could not be created is not kept, so the next use tries again. If given a health check,
+    the client is checked on use, at most once per interval, and recreated when the check fails.
+
+    Health checks and client creation (both possibly slow network calls) happen outside the lock, which only
+    guards swapping the client: a slow or hung upstream service does not hold up the other users of the client.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], T],
+        health_check: Callable[[T], object] | None = None,
+        health_check_interval: float = settings.UPSTREAM_HEALTH_CHECK_INTERVAL,
+    ):
+        """Creates a SharedClient.
+
+        :param name: the name of the upstream service, used in logs
+        :param factory: creates the client
+        :param health_check: raises if the (existing) client is not healthy anymore
+        :param health_check_interval: the min number of seconds between health checks
+        """
+        self._name = name
+        self._factory = factory
+        self._health_check = health_check
+        self._health_check_interval = health_check_interval
+        self._client: T | None = None
+        self._next_health_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """Returns the shared client, creating it (again) if needed.
+
+        Can be called from any thread.
+
+        :return: the client
+        :raises Exception: if the client cannot be created
+        """
+        with self._lock:
+            client = self._client
+            now = time.monotonic()
+            check_health = client is not None and self._health_check is not None and now >= self._next_health_check
+            if check_health:
+                # Only one caller checks the client, the others keep using it meanwhile.
+                self._next_health_check = now + self._health_check_interval
+
+        if check_health:
+            try:
+                self._health_check(client)
+            except Exception as e:
+                loguru.logger.opt(exception=e).warning(f"{self._name} client is unhealthy, reconnecting")
+                with self._lock:
+                    if self._client is client:
+                        self._client = None
+                client = None
+
+        if client is not None:
+            return client
+
+        new_client = self._factory()
+        with self._lock:
+            # Another caller may have connected a client in the meantime: share a single one.
+            if self._client is None:
+                self._client = new_client
+                self._next_health_check = time.monotonic() + self._health_check_interval
+                loguru.logger.info(f"Connected the shared {self._name} client")
+            return self._client
+
+    def reset(self) -> None:
+        """Drops the shared client, so the next use creates a new one."""
+        with self._lock:
+            self._client = None
+
+
+def _create_s3_filesystem() -> S3FileSystem:
+    return S3FileSystem(
+        key=os.environ.get("AWS_ACCESS_KEY_ID"),
+        secret=os.environ.get("AWS_SECRET_ACCESS_KEY"),
+        endpoint_url=settings.S3_ENDPOINT_URL,
+        client_kwargs={"region_name": os.environ.get("AWS_DEFAULT_REGION")},
+        config_kwargs={"max_pool_connections": settings.S3_MAX_POOL_CONNECTIONS},
+    )
+
+
+# botocore recycles dropped connections by itself, so S3 needs no health check.
+shared_s3_file_system = SharedClient("S3", _create_s3_filesystem)
+shared_ray_client = SharedClient(
+    "Ray",
+    lambda: PooledJobSubmissionClient(settings.RAY_DASHBOARD_URL),
+    health_check=lambda client: client.get_version(),
+)
@@ -4,6 +4,7 @@ from evaluator.schemas import DatasetConfig, EvalJobConfig, EvaluationConfig
 from lumigator_schemas.jobs import JobCreate, JobType
 
 from backend.services.job_interface import JobDefinition
+from backend.settings import settings
 
 
 class JobDefinitionEvaluation(JobDefinition):
@@ -18,6 +19,19 @@ class JobDefinitionEvaluation(JobDefinition):
                 return_input_data=True,
                 return_predictions=True,
                 storage_path=storage_path,
+                max_workers=request.job_config.max_workers,
+                g_eval_max_concurrency=request.job_config.g_eval_max_concurrency,
+                g_eval_requests_per_minute=request.job_config.g_eval_requests_per_minute,
+                bertscore=request.job_config.bertscore,
+                comet=request.job_config.comet,
+                token_length_tokenizer=request.job_config.token_length_tokenizer,
+                num_shards=request.job_config.num_shards,
+                shard_num_cpus=request.job_config.shard_num_cpus,
+                shard_num_gpus=request.job_config.shard_num_gpus,
+                metric_cache=request.job_config.metric_cache,
+                metric_cache_uri=f"s3://{settings.S3_BUCKET}/{settings.S3_METRIC_CACHE_PREFIX}"
+                if request.job_config.metric_cache
+                else None,
             ),
         )
         return job_config
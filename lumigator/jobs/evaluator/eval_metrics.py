@@ -1,19 +1,208 @@
+import asyncio
 import functools
 import json
+import multiprocessing
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from enum import Enum
 from pathlib import Path
 
 import evaluate
+import nltk
 import numpy as np
+import torch
 from deepeval.metrics import GEval
 from deepeval.test_case import LLMTestCase, LLMTestCaseParams
 from loguru import logger
+from nltk.translate.meteor_score import single_meteor_score
+from sacrebleu.metrics import BLEU
+from transformers import AutoTokenizer
+from utils import AsyncTokenBucket, available_memory
 
-from schemas import EvalJobMetrics
+from schemas import BertScoreConfig, CometConfig, EvalJobMetrics, EvaluationConfig
 
 G_EVAL_PROMPTS = "g_eval_prompts.json"
+DEEPEVAL_CONFIG_FILENAME = ".deepeval"
 MEASURE_RETRIES = 3
 
+# Default batch sizes of bert_score and COMET, also the max batch sizes tuned to the available memory on CPU
+BERTSCORE_BATCH_SIZE = 64
+COMET_BATCH_SIZE = 16
+# Rough peak memory used by each example of a batch when scoring on CPU, and the share of memory batches can use
+MODEL_METRIC_MEMORY_PER_EXAMPLE = 64 * 2**20
+MODEL_METRIC_MEMORY_FRACTION = 0.5
+
+# torch's number of threads is process-wide: metrics changing it are computed one at a time
+_torch_threads_lock = threading.Lock()
+
+# Prefix of the tokenizer names counting tokens with tiktoken (e.g. "tiktoken:o200k_base") instead of HuggingFace
+TIKTOKEN_PREFIX = "tiktoken:"
+
+# NLTK resources used by METEOR (the same ones the `evaluate` meteor metric downloads)
+METEOR_NLTK_RESOURCES = {"wordnet": "corpora/wordnet", "punkt": "tokenizers/punkt", "omw-1.4": "corpora/omw-1.4"}
+
+
+@functools.cache
+def load_metric(path: str, config_name: str | None = None) -> evaluate.EvaluationModule:
+    """Loads an `evaluate` metric once per process.
+
+    Loading a metric builds a new module every time, and modules cache the models they use
+    (e.g. the BERTScore scorer, COMET model) themselves: reusing the module reuses the models.
+
+    Args:
+        path: the name of the metric (e.g. "rouge")
+        config_name: the configuration of the metric (e.g. the COMET model), if any
+
+    Returns:
+        The loaded metric
+    """
+    logger.info(f"Loading metric {path}" + (f" ({config_name})" if config_name else ""))
+    return evaluate.load(path, config_name)
+
+
+def metric_device(device: str | None) -> str:
+    """Returns the device a model-based metric runs on: the configured one, or a GPU if available."""
+    if device is not None:
+        return device
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def metric_batch_size(batch_size: int | None, device: str, default: int) -> int:
+    """Returns the batch size of a model-based metric.
+
+    Unless configured, the batch size on CPU is tuned down from the library default to fit in
+    the available memory (on GPU, the library default already fits).
+
+    Args:
+        batch_size: the configured batch size, if any
+        device: the device the model runs on
+        default: the library default batch size
+
+    Returns:
+        The batch size
+    """
+    if batch_size is not None:
+        return batch_size
+    if device != "cpu" or (memory := available_memory()) is None:
+        return default
+
+    tuned = int(max(1, min(default, memory * MODEL_METRIC_MEMORY_FRACTION // MODEL_METRIC_MEMORY_PER_EXAMPLE)))
+    if tuned < default:
+        logger.info(f"Using batch size {tuned} to fit in the {memory} bytes of memory available")
+    return tuned
+
+
+@contextmanager
+def torch_threads(num_threads: int | None):
+    """Sets the number of threads used by torch while computing a metric, if configured."""
+    if num_threads is None:
+        yield
+        return
+
+    with _torch_threads_lock:
+        previous = torch.get_num_threads()
+        torch.set_num_threads(num_threads)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(previous)
+
+
+@functools.cache
+def load_token_counter(tokenizer: str) -> Callable[[list[str]], list[int]]:
+    """Loads a function counting the tokens of a batch of texts, once per process.
+
+    Both HuggingFace fast tokenizers and tiktoken tokenize the whole batch in native code, using
+    multiple threads.
+
+    Args:
+        tokenizer: the name (or path) of a HuggingFace tokenizer (e.g. "meta-llama/Llama-3.1-8B-Instruct"),
+            or "tiktoken:" followed by the name of a tiktoken encoding or OpenAI model (e.g. "tiktoken:gpt-4o")
+
+    Returns:
+        The function returning the number of tokens of each text
+    """
+    logger.info(f"Loading tokenizer {tokenizer}")
+    if tokenizer.startswith(TIKTOKEN_PREFIX):
+        import tiktoken
+
+        name = tokenizer.removeprefix(TIKTOKEN_PREFIX)
+        try:
+            encoding = tiktoken.get_encoding(name)
+        except ValueError:
+            encoding = tiktoken.encoding_for_model(name)
+        return lambda texts: [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+    hf_tokenizer = AutoTokenizer.from_pretrained(tokenizer, use_fast=True)
+    return lambda texts: hf_tokenizer(texts, add_special_tokens=False, return_attention_mask=False, return_length=True)[
+        "length"
+    ]
+
+
+@functools.cache
+def ensure_nltk_resources() -> None:
+    """Download the NLTK resources used by METEOR, unless already available."""
+    for resource, path in METEOR_NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(resource, quiet=True)
+
+
+def _is_mean(key: str) -> bool:
+    return key.endswith("_mean") or key == "mean_score"
+
+
+def _mean(values: list) -> float:
+    # G-Eval results hold a score and the judge's reason
+    return float(np.mean([value["score"] if isinstance(value, dict) else value for value in values]))
+
+
+def split_metric_result(result: dict) -> list[dict]:
+    """Splits the result of a metric into the result of each sample.
+
+    Every sample gets its own (single-item) per-sample lists, means (i.e. its own scores) and the
+    values shared by all samples (e.g. the BERTScore hashcode).
+
+    Args:
+        result: the result of a metric (e.g. as returned by `_rouge`)
+
+    Returns:
+        The result of each sample, in order
+    """
+    lists = {key: value for key, value in result.items() if isinstance(value, list)}
+    shared = {key: value for key, value in result.items() if key not in lists}
+    num_samples = len(next(iter(lists.values()), []))
+    return [
+        merge_metric_results([{**shared, **{key: [value[i]] for key, value in lists.items()}}])
+        for i in range(num_samples)
+    ]
+
+
+def merge_metric_results(results: list[dict]) -> dict:
+    """Merges the results of a metric on consecutive parts of a dataset into its result on the whole dataset.
+
+    Per-sample lists are concatenated in order and means are recomputed from them, other values
+    (e.g. the BERTScore hashcode) are the same for every part.
+
+    Args:
+        results: the results of the metric on each part of the dataset, in order
+
+    Returns:
+        The result of the metric on the whole dataset
+    """
+    merged = {
+        key: [item for result in results for item in result[key]] if isinstance(value, list) else value
+        for key, value in results[0].items()
+    }
+    for key in merged:
+        if _is_mean(key):
+            merged[key] = _mean(merged["scores" if key == "mean_score" else key.removesuffix("_mean")])
+    return merged
+
 
 class EvaluationFields(Enum):
     """Defines the fields a given metric might require as inputs."""
@@ -23,20 +212,110 @@ class EvaluationFields(Enum):
     EXAMPLE = "example"
 
 
+class MetricExecutor(Enum):
+    """Defines where a metric runs when metrics are computed concurrently."""
+
+    # CPU-bound pure Python metrics hold the GIL, so they run in separate processes
+    PROCESS = "process"
+    # Model-bound (torch releases the GIL) and network-bound (LLM judge) metrics run in threads
+    THREAD = "thread"
+
+
+def _compute_metric(metric: str, args: tuple) -> dict:
+    """Computes a single metric in a worker process (bound methods of the caller can't be sent there)."""
+    return EvaluationMetrics([metric])._supported_metrics[metric]["method"](*args)
+
+
+def prepare_judge_model(config: EvaluationConfig) -> None:
+    """Sets up the LLM judge used by G-Eval metrics, in the current process.
+
+    Needed wherever G-Eval metrics are computed: in the job itself, and in every Ray task scoring a shard
+    (which only gets the job's environment variables, and may run on another node).
+    """
+    if config.llm_as_judge is not None:
+        # first check if an API key was provided: if not, assume the user is going to use ollama
+        # (deepeval uses "ollama" as LOCAL_MODEL_API_KEY to choose whether to use ollama or not)
+        local_model_api_key = os.environ.get("api_key", "ollama")
+
+        # create a .deepeval config file if a local model is specified
+        deepeval_config = {
+            "LOCAL_MODEL_NAME": config.llm_as_judge.model_name,
+            "LOCAL_MODEL_BASE_URL": config.llm_as_judge.model_base_url,
+            "USE_LOCAL_MODEL": "YES",
+            "USE_AZURE_OPENAI": "NO",
+            "LOCAL_MODEL_API_KEY": local_model_api_key,
+        }
+        with Path(DEEPEVAL_CONFIG_FILENAME).open("w") as f:
+            json.dump(deepeval_config, f, indent=4)
+    else:
+        # otherwise, deepeval will use its default (OpenAI Client), so set up auth first
+        # (note that we don't care if `api_key` is not set if we don't run a geval metric)
+        os.environ["OPENAI_API_KEY"] = os.environ.get("api_key", "")
+
+        # then make sure we'll start without a .deepeval config file
+        Path(DEEPEVAL_CONFIG_FILENAME).unlink(missing_ok=True)
+
+
 class EvaluationMetrics:
-    def __init__(self, metrics):
+    def __init__(
+        self,
+        metrics,
+        max_workers: int = 1,
+        g_eval_max_concurrency: int = 1,
+        g_eval_requests_per_minute: int | None = None,
+        bertscore_config: BertScoreConfig | None = None,
+        comet_config: CometConfig | None = None,
+        token_length_tokenizer: str | None = None,
+    ):
+        """Sets up the evaluation of the given metrics.
+
+        Args:
+            metrics: the names of the metrics to compute (unsupported ones are ignored)
+            max_workers: the max number of metrics computed concurrently (1 computes them sequentially)
+            g_eval_max_concurrency: the max number of G-Eval judge requests in flight (1 sends them one at a time)
+            g_eval_requests_per_minute: the max number of G-Eval judge requests sent per minute, if limited
+            bertscore_config: the model, batch size, device and threads used by BERTScore
+            comet_config: the model, batch size, device and threads used by COMET
+            token_length_tokenizer: the tokenizer counting tokens for `token_length` (see `load_token_counter`),
+                if None the number of tokens is estimated from the number of words
+        """
+        self._max_workers = max_workers
+        self._bertscore_config = bertscore_config or BertScoreConfig()
+        self._comet_config = comet_config or CometConfig()
+        self._token_length_tokenizer = token_length_tokenizer
+        self._g_eval_max_concurrency = g_eval_max_concurrency
+        self._g_eval_requests_per_minute = g_eval_requests_per_minute
         # for each of the supported metrics, we provide a dictionary specifying
         # which method implements it and which fields it requires (only the original
         # LLM input and the reference / ground truth are specified, as predictions
-        # are always passed for evaluation).
+        # are always passed for evaluation), and where it runs when computing metrics concurrently.
         self._supported_metrics = {
-            "rouge": {"method": self._rouge, "requires": [EvaluationFields.GROUND_TRUTH]},
-            "meteor": {"method": self._meteor, "requires": [EvaluationFields.GROUND_TRUTH]},
-            "bertscore": {"method": self._bertscore, "requires": [EvaluationFields.GROUND_TRUTH]},
-            "bleu": {"method": self._bleu, "requires": [EvaluationFields.GROUND_TRUTH]},
+            "rouge": {
+                "method": self._rouge,
+                "requires": [EvaluationFields.GROUND_TRUTH],
+                "executor": MetricExecutor.PROCESS,
+                "warm_up": functools.partial(load_metric, "rouge"),
+            },
+            "meteor": {
+                "method": self._meteor,
+                "requires": [EvaluationFields.GROUND_TRUTH],
+                "executor": MetricExecutor.PROCESS,
+                "warm_up": ensure_nltk_resources,
+            },
+            "bertscore": {
+                "method": self._bertscore,
+                "requires": [EvaluationFields.GROUND_TRUTH],
+                "warm_up": self._warm_up_bertscore,
+            },
+            "bleu": {
+                "method": self._bleu,
+                "requires": [EvaluationFields.GROUND_TRUTH],
+                "executor": MetricExecutor.PROCESS,
+            },
             "comet": {
                 "method": self._comet,
                 "requires": [EvaluationFields.GROUND_TRUTH, EvaluationFields.EXAMPLE],
+                "warm_up": self._warm_up_comet,
             },
             # the available tasks in g_eval are the ones we have defined
             # criteria / evaluation steps for inside `g_eval_prompts.json`
@@ -55,6 +334,7 @@ class EvaluationMetrics:
             "token_length": {
                 "method": self._token_length,
                 "requires": [EvaluationFields.GROUND_TRUTH],
+                "warm_up": self._warm_up_token_length,
             },
         }
 
@@ -71,9 +351,35 @@ class EvaluationMetrics:
         if len(self._unsupported_metrics) > 0:
             logger.warning(f"Unsupported metrics: {self._unsupported_metrics}")
 
+    def warm_up(self) -> None:
+        """Loads the chosen metrics and their models ahead of time (once per process).
+
+        Computing the metrics afterwards only pays for the computation itself. Worker processes
+        computing metrics concurrently are spawned, so they load the metrics they compute themselves.
+        """
+        for metric in sorted(self._chosen_metrics):
+            if (warm_up := self._supported_metrics[metric].get("warm_up")) is not None:
+                logger.info(f"Warming up {metric}")
+                warm_up()
+
+    def _warm_up_bertscore(self) -> None:
+        # the scorer (and its model, on its device) is only built on the first computation, and then cached
+        load_metric("bertscore").compute(predictions=["warm up"], references=["warm up"], **self._bertscore_kwargs())
+
+    def _warm_up_comet(self) -> None:
+        load_metric("comet", self._comet_config.model)
+
+    def _warm_up_token_length(self) -> None:
+        if self._token_length_tokenizer is not None:
+            load_token_counter(self._token_length_tokenizer)
+
+    def _bertscore_kwargs(self) -> dict:
+        config = self._bertscore_config
+        return {"lang": config.lang, "model_type": config.model_type, "device": metric_device(config.device)}
+
     def _rouge(self, pred: list, ref: list):
         logger.info("Running ROUGE evaluation")
-        ev = evaluate.load("rouge")
+        ev = load_metric("rouge")
 
         # compute with use_aggregator = False to get individual scores
         evals = ev.compute(predictions=pred, references=ref, use_aggregator=False)
@@ -85,15 +391,18 @@ class EvaluationMetrics:
         return evals
 
     def _meteor(self, pred: list, ref: list):
-        logger.info("Running METEOR evaluation")
-        ev = evaluate.load("meteor")
+        """Computes sample-wise METEOR scores.
 
-        # initialize dictionary with metric name
-        evals = {"meteor": []}
+        Same computation (NLTK tokenization and scoring, default parameters) as the `evaluate`
+        meteor metric, which only returns the mean score: calling it once per sample paid its
+        overhead (feature validation, Arrow writes) for every row.
+        """
+        logger.info("Running METEOR evaluation")
+        ensure_nltk_resources()
 
-        # run sample-wise evals (as default implementation only returns mean value)
-        for p, r in zip(pred, ref):
-            evals["meteor"].append(ev.compute(predictions=[p], references=[r])["meteor"])
+        evals = {
+            "meteor": [single_meteor_score(nltk.word_tokenize(r), nltk.word_tokenize(p)) for p, r in zip(pred, ref)]
+        }
 
         # calculate mean
         evals["meteor_mean"] = np.mean(evals["meteor"])
@@ -101,18 +410,18 @@ class EvaluationMetrics:
         return evals
 
     def _bleu(self, pred, ref):
-        logger.info("Running BLEU evaluation")
-        ev = evaluate.load("bleu")
+        """Computes sample-wise BLEU scores.
 
-        # initialize dictionary with metric name
-        evals = {"bleu": []}
+        Matches the `evaluate` bleu metric computed on each sample: 13a tokenization, up to
+        4-grams, no smoothing, score between 0 and 1. The scorer is built once for all the samples.
+        """
+        logger.info("Running BLEU evaluation")
+        bleu = BLEU(tokenize="13a", smooth_method="none")
 
-        # run sample-wise evals
-        for p, r in zip(pred, ref):
-            # assumption that there is only one reference per prediction
-            # TODO: check how to support multiple references
-            result = ev.compute(predictions=[p], references=[[r]])
-            evals["bleu"].append(result["bleu"])
+        # assumption that there is only one reference per prediction
+        # TODO: check how to support multiple references
+        # A single-sample corpus score is the sentence score, without sacrebleu's per-call `effective_order` warning.
+        evals = {"bleu": [bleu.corpus_score([p], [[r]]).score / 100 for p, r in zip(pred, ref, strict=True)]}
 
         # calculate mean
         evals["bleu_mean"] = np.mean(evals["bleu"])
@@ -131,10 +440,13 @@ class EvaluationMetrics:
         results = bertscore.compute(predictions=predictions)
         """
         logger.info("Running BERTScore evaluation")
-        ev = evaluate.load("bertscore")
+        ev = load_metric("bertscore")
+        kwargs = self._bertscore_kwargs()
+        batch_size = metric_batch_size(self._bertscore_config.batch_size, kwargs["device"], BERTSCORE_BATCH_SIZE)
 
         # calculate evals (the default is not to aggregate them)
-        evals = ev.compute(predictions=pred, references=ref, lang="en")
+        with torch_threads(self._bertscore_config.num_threads):
+            evals = ev.compute(predictions=pred, references=ref, batch_size=batch_size, **kwargs)
 
         # calculate mean for each of the submetrics (precision, recall, f1)
         for k in ["precision", "recall", "f1"]:
@@ -148,16 +460,28 @@ class EvaluationMetrics:
         for machine translation evaluation.
         It aims to predict human judgment of translation quality.
         It requires both the original input and the reference / ground truth, as well as the model's prediction.
+
+        The metric's COMET model is called directly, as `compute` does, since `compute` does not
+        expose its batch size nor the device it runs on.
         """
         logger.info("Running COMET evaluation")
-        ev = evaluate.load("comet", "eamt22-cometinho-da")
+        config = self._comet_config
+        ev = load_metric("comet", config.model)
+        device = metric_device(config.device)
+        batch_size = metric_batch_size(config.batch_size, device, COMET_BATCH_SIZE)
+
+        # COMET runs on a single device: either the CPU, or the (first) GPU or the given one (e.g. "cuda:1")
+        device_kwargs = {"gpus": 0} if device == "cpu" else {"gpus": 1, "accelerator": device.split(":")[0]}
+        if ":" in device:
+            device_kwargs["devices"] = [int(device.split(":")[1])]
+
+        samples = [{"src": s, "mt": p, "ref": r} for s, p, r in zip(examples, pred, ref, strict=True)]
+        with torch_threads(config.num_threads):
+            output = ev.scorer.predict(samples, batch_size=batch_size, progress_bar=False, **device_kwargs)
 
-        # output is a dictionary with scores and mean score
         # scores is a list of floats, one per example
         # mean_score is a float representing the average of the scores
-        evals = ev.compute(predictions=pred, references=ref, sources=examples)
-
-        return evals
+        return {"scores": output.scores, "mean_score": output.system_score}
 
     def _g_eval_measure_with_retry(self, metric, test_case, max_retries=MEASURE_RETRIES):
         """Calls metric.measure with retry logic and returns the score and reason.
@@ -184,6 +508,65 @@ class EvaluationMetrics:
 
         raise ValueError("All retry attempts failed")
 
+    async def _a_g_eval_measure_with_retry(
+        self,
+        metric,
+        test_case,
+        semaphore: asyncio.Semaphore,
+        rate_limiter: AsyncTokenBucket | None,
+        max_retries=MEASURE_RETRIES,
+    ):
+        """Async version of `_g_eval_measure_with_retry`, limiting the requests in flight and per minute.
+
+        Args:
+            metric: The metric object with a_measure method and score/reason properties
+            test_case: The test case to measure
+            semaphore: Limits the number of measurements in flight
+            rate_limiter: Limits the number of measurements started per minute, if any
+            max_retries: Maximum number of retry attempts
+
+        Returns:
+            dict: Dictionary with score and reason
+
+        Raises:
+            ValueError: If all retry attempts fail
+        """
+        for attempt in range(1, max_retries + 1):
+            async with semaphore:
+                if rate_limiter is not None:
+                    await rate_limiter.acquire()
+                try:
+                    score = await metric.a_measure(test_case, _show_indicator=False)
+                    # The metric is shared by concurrent measurements: its reason is only
+                    # consistent with the returned score until the next await.
+                    return {"score": score, "reason": metric.reason}
+                except ValueError as e:
+                    logger.warning(f"Attempt {attempt}/{max_retries} failed: {str(e)}")
+                    if attempt == max_retries:
+                        raise e
+
+        raise ValueError("All retry attempts failed")
+
+    async def _a_g_eval_measure_all(self, metrics: list, test_cases: list) -> list[list[dict]]:
+        """Measures every test case with every metric, concurrently.
+
+        Returns:
+            list: For each metric, the score and reason for each test case
+        """
+        if not test_cases:
+            return [[] for _ in metrics]
+
+        semaphore = asyncio.Semaphore(self._g_eval_max_concurrency)
+        rate_limiter = AsyncTokenBucket(self._g_eval_requests_per_minute) if self._g_eval_requests_per_minute else None
+        results = await asyncio.gather(
+            *(
+                self._a_g_eval_measure_with_retry(metric, test_case, semaphore, rate_limiter)
+                for metric in metrics
+                for test_case in test_cases
+            )
+        )
+        return [results[i : i + len(test_cases)] for i in range(0, len(results), len(test_cases))]
+
     def _g_eval(self, examples: list, pred: list, ref: list, task: str, use_ref: bool = True) -> dict:
         """Runs the deepeval implementation of the G-Eval LLM-as-judge evaluation.
 
@@ -220,32 +603,17 @@ class EvaluationMetrics:
         if use_ref:
             eval_params.append(LLMTestCaseParams.EXPECTED_OUTPUT)
 
-        evals = {}
         try:
-            for metric_name in prompt_templates[task]:
-                metric = GEval(
+            metrics = {
+                metric_name: GEval(
                     name=metric_name,
                     # NOTE: deepeval allows you to provide either criteria or evaluation_steps, and not both.
                     #       In this first iteration we pick evaluation_steps
                     evaluation_steps=prompt_templates[task][metric_name]["evaluation_steps"],
                     evaluation_params=eval_params,
                 )
-
-                evals_for_metric = []
-                # iterate on all samples
-                for p, r, e in zip(pred, ref, examples):
-                    test_case = LLMTestCase(input=e, expected_output=r, actual_output=p)
-
-                    try:
-                        result = self._g_eval_measure_with_retry(metric, test_case, max_retries=MEASURE_RETRIES)
-                        evals_for_metric.append(result)
-                    except ValueError as e:
-                        # Handle the failure case
-                        logger.error(f"G-Eval measurement failed after {MEASURE_RETRIES} attempts: {e}")
-                        raise e
-
-                evals[metric_name] = evals_for_metric
-                evals[f"{metric_name}_mean"] = np.mean([x["score"] for x in evals_for_metric])
+                for metric_name in prompt_templates[task]
+            }
         except KeyError as e:
             logger.error(
                 f"You provided a wrong key ({e}) to access task-specific prompts. "
@@ -253,16 +621,53 @@ class EvaluationMetrics:
             )
             raise e
 
+        test_cases = [LLMTestCase(input=e, expected_output=r, actual_output=p) for p, r, e in zip(pred, ref, examples)]
+        try:
+            if self._g_eval_max_concurrency > 1 or self._g_eval_requests_per_minute:
+                # every (metric, sample) pair is an independent judge request: send them concurrently
+                logger.info(
+                    f"Running G-Eval with up to {self._g_eval_max_concurrency} concurrent requests"
+                    f" and {self._g_eval_requests_per_minute or 'unlimited'} requests per minute"
+                )
+                all_evals = asyncio.run(self._a_g_eval_measure_all(list(metrics.values()), test_cases))
+            else:
+                # iterate on all metrics and samples
+                all_evals = [
+                    [
+                        self._g_eval_measure_with_retry(metric, test_case, max_retries=MEASURE_RETRIES)
+                        for test_case in test_cases
+                    ]
+                    for metric in metrics.values()
+                ]
+        except ValueError as e:
+            # Handle the failure case
+            logger.error(f"G-Eval measurement failed after {MEASURE_RETRIES} attempts: {e}")
+            raise e
+
+        evals = {}
+        for metric_name, evals_for_metric in zip(metrics, all_evals, strict=True):
+            evals[metric_name] = evals_for_metric
+            evals[f"{metric_name}_mean"] = np.mean([x["score"] for x in evals_for_metric])
+
         return evals
 
     def _token_length(self, pred: list, ref: list):
-        """Computes the token length of the reference text."""
+        """Computes the token length of the reference text and of the predictions.
+
+        Tokens are counted with the configured tokenizer, tokenizing each column in a single batch,
+        or estimated from the number of words if there is none.
+        """
         logger.info("Computing token length")
-        # Rough estimate of token length
-        # https://www.restack.io/p/tokenization-answer-token-size-word-count-cat-ai
-        ref_lengths = [int(len(r.split()) / 0.75) for r in ref]
+        if self._token_length_tokenizer is not None:
+            count_tokens = load_token_counter(self._token_length_tokenizer)
+            ref_lengths = count_tokens(ref)
+            pred_lengths = count_tokens(pred)
+        else:
+            # Rough estimate of token length
+            # https://www.restack.io/p/tokenization-answer-token-size-word-count-cat-ai
+            ref_lengths = [int(len(r.split()) / 0.75) for r in ref]
+            pred_lengths = [int(len(p.split()) / 0.75) for p in pred]
         avg_ref_length = np.mean(ref_lengths)
-        pred_lengths = [int(len(p.split()) / 0.75) for p in pred]
         avg_pred_length = np.mean(pred_lengths)
         return {
             "ref_token_length": ref_lengths,
@@ -271,13 +676,46 @@ class EvaluationMetrics:
             "pred_token_length_mean": avg_pred_length,
         }
 
-    def run_all(self, examples: list, pred: list, ref: list) -> EvalJobMetrics:
-        results = {}
+    def _metric_args(self, metric: str, examples: list, pred: list, ref: list) -> tuple:
+        if EvaluationFields.EXAMPLE in self._supported_metrics[metric]["requires"]:
+            return examples, pred, ref
+        return pred, ref
 
-        for metric in self._chosen_metrics:
-            if EvaluationFields.EXAMPLE in self._supported_metrics[metric]["requires"]:
-                results[metric] = self._supported_metrics[metric]["method"](examples, pred, ref)
-            else:
-                results[metric] = self._supported_metrics[metric]["method"](pred, ref)
+    def _executor(self, metric: str) -> MetricExecutor:
+        return self._supported_metrics[metric].get("executor", MetricExecutor.THREAD)
+
+    def run_all(self, examples: list, pred: list, ref: list) -> EvalJobMetrics:
+        if self._max_workers <= 1 or len(self._chosen_metrics) <= 1:
+            results = {
+                metric: self._supported_metrics[metric]["method"](*self._metric_args(metric, examples, pred, ref))
+                for metric in self._chosen_metrics
+            }
+            return EvalJobMetrics(**results)
+
+        logger.info(f"Computing metrics concurrently, with up to {self._max_workers} workers")
+        process_metrics = [m for m in self._chosen_metrics if self._executor(m) == MetricExecutor.PROCESS]
+        thread_metrics = [m for m in self._chosen_metrics if self._executor(m) == MetricExecutor.THREAD]
+        # Both pools share the max_workers budget, keeping at least one worker for each of them if needed.
+        process_workers = min(len(process_metrics), self._max_workers - (1 if thread_metrics else 0))
+        thread_workers = min(len(thread_metrics), self._max_workers - process_workers)
+        futures = {}
+        with ExitStack() as stack:
+            if process_metrics:
+                # Worker processes are spawned rather than forked: by now torch, tokenizers and the metrics
+                # computed in threads may have started threads of their own (possibly holding locks),
+                # and forking a multi-threaded process is unsafe.
+                processes = stack.enter_context(
+                    ProcessPoolExecutor(process_workers, mp_context=multiprocessing.get_context("spawn"))
+                )
+                for metric in process_metrics:
+                    args = self._metric_args(metric, examples, pred, ref)
+                    futures[metric] = processes.submit(_compute_metric, metric, args)
+            if thread_metrics:
+                threads = stack.enter_context(ThreadPoolExecutor(thread_workers))
+                for metric in thread_metrics:
+                    args = self._metric_args(metric, examples, pred, ref)
+                    futures[metric] = threads.submit(self._supported_metrics[metric]["method"], *args)
+
+            results = {metric: future.result() for metric, future in futures.items()}
 
         return EvalJobMetrics(**results)
@@ -1,20 +1,29 @@
 import argparse
-import json
+import functools
 import os
 import re
 from pathlib import Path
 from uuid import UUID
 
+import pyarrow as pa
+import pyarrow.compute as pc
 import s3fs
 from datasets import load_from_disk
-from datasets.features.features import Value
-from eval_metrics import EvaluationMetrics
+from eval_metrics import EvaluationMetrics, prepare_judge_model
 from loguru import logger
+from metric_cache import METRIC_CACHE_FILENAME, MetricCache, run_cached_eval_metrics
+from sharding import run_sharded_eval_metrics
 from utils import timer
 
-from schemas import EvalJobArtifacts, EvalJobConfig, EvalJobMetrics, JobOutput
-
-DEEPEVAL_CONFIG_FILENAME = ".deepeval"
+from schemas import (
+    BertScoreConfig,
+    CometConfig,
+    EvalJobArtifacts,
+    EvalJobConfig,
+    EvalJobMetrics,
+    EvaluationConfig,
+    JobOutput,
+)
 
 SAFE_JOB_NAME_REGEX = re.compile(r"[^\w\-_.]")
 
@@ -65,7 +74,18 @@ def save_outputs(job_id: UUID, job_name: str, storage_path: str, eval_results: J
 
 
 @timer
-def run_eval_metrics(examples: list, predictions: list, ground_truth: list, evaluation_metrics: list) -> EvalJobMetrics:
+def run_eval_metrics(
+    examples: list,
+    predictions: list,
+    ground_truth: list,
+    evaluation_metrics: list,
+    max_workers: int = 1,
+    g_eval_max_concurrency: int = 1,
+    g_eval_requests_per_minute: int | None = None,
+    bertscore_config: BertScoreConfig | None = None,
+    comet_config: CometConfig | None = None,
+    token_length_tokenizer: str | None = None,
+) -> EvalJobMetrics:
     """Run all the specified evaluation metrics on the input samples.
 
     Parameters:
@@ -78,64 +98,152 @@ def run_eval_metrics(examples: list, predictions: list, ground_truth: list, eval
         - evaluation_metrics: a list of metrics we want to calculate (their names
                               are defined in `eval_metrics.py` and should be exposed
                               in the jobs API too, i.e. `lumigator_schemas/jobs.py`)
+        - max_workers: the max number of metrics computed concurrently
+        - g_eval_max_concurrency: the max number of G-Eval judge requests in flight
+        - g_eval_requests_per_minute: the max number of G-Eval judge requests sent per minute, if limited
+        - bertscore_config: the model, batch size, device and threads used by BERTScore
+        - comet_config: the model, batch size, device and threads used by COMET
+        - token_length_tokenizer: the tokenizer counting tokens for token_length, if any
     """
-    em = EvaluationMetrics(evaluation_metrics)
+    em = EvaluationMetrics(
+        evaluation_metrics,
+        max_workers=max_workers,
+        g_eval_max_concurrency=g_eval_max_concurrency,
+        g_eval_requests_per_minute=g_eval_requests_per_minute,
+        bertscore_config=bertscore_config,
+        comet_config=comet_config,
+        token_length_tokenizer=token_length_tokenizer,
+    )
     evaluation_results = em.run_all(examples, predictions, ground_truth)
     return EvalJobMetrics.model_validate(evaluation_results)
 
 
-def run_eval(config: EvalJobConfig, job_id: UUID) -> str | None:
-    max_samples = config.evaluation.max_samples
+def compute_metrics(
+    config: EvaluationConfig, metrics: list[str], examples: list, predictions: list, ground_truth: list
+) -> EvalJobMetrics:
+    """Compute the given metrics, on shards of the samples in parallel Ray tasks if configured."""
+    if config.num_shards > 1:
+        metric_results, _ = run_sharded_eval_metrics(
+            examples, predictions, ground_truth, config.model_copy(update={"metrics": metrics})
+        )
+    else:
+        metric_results, _ = run_eval_metrics(
+            examples=examples,
+            predictions=predictions,
+            ground_truth=ground_truth,
+            evaluation_metrics=metrics,
+            max_workers=config.max_workers,
+            g_eval_max_concurrency=config.g_eval_max_concurrency,
+            g_eval_requests_per_minute=config.g_eval_requests_per_minute,
+            bertscore_config=config.bertscore,
+            comet_config=config.comet,
+            token_length_tokenizer=config.token_length_tokenizer,
+        )
+    return metric_results
 
-    # Load dataset given its URI
-    dataset = load_from_disk(config.dataset.path)
-    # Cast non-string fields into strings. If it cannot be done, then
-    # the dataset is most probably broken.
-    # All-empty fields are interpreted by the loader as 'float64' by default,
-    # which causes issues when an empty 'predictions'
-    for fname in dataset.features:
-        feature = dataset.features[fname]
-        if not (isinstance(feature, Value) and feature.dtype == "string"):
-            logger.warning(
-                f"Found column '{fname}' with non-string type '{feature}', "
-                "converting type to string and None values to ''"
-            )
-            dataset = dataset.cast_column(fname, Value("string"))
 
+@timer
+def evaluate(
+    config: EvaluationConfig,
+    examples: list,
+    predictions: list,
+    ground_truth: list,
+    metric_cache: MetricCache | None = None,
+) -> EvalJobMetrics:
+    """Compute the evaluation metrics, only scoring the samples missing from the metric cache if any."""
+    compute = functools.partial(compute_metrics, config)
+    if metric_cache is None:
+        return compute(config.metrics, examples, predictions, ground_truth)
+    return run_cached_eval_metrics(compute, metric_cache, config, examples, predictions, ground_truth)
+
+
+def local_metric_cache_path() -> Path:
+    """Returns the path of the metric cache, shared by all the jobs running on the node."""
+    return Path(Path.home() / ".lumigator" / "cache" / METRIC_CACHE_FILENAME)
+
+
+def load_eval_columns(config: EvalJobConfig) -> dict[str, list[str]]:
+    """Load the examples, predictions and ground truth of the first `max_samples` rows of the dataset.
+
+    Rows are sliced from the dataset's Arrow table (without copying it) before any transformation,
+    and only the evaluated columns are converted, with Arrow compute functions on whole columns:
+    non-string columns are cast into strings (all-empty fields are interpreted by the loader as
+    'float64' by default, which causes issues with empty predictions) and None values replaced with ''.
+
+    Args:
+        config: the evaluation job configuration
+
+    Returns:
+        The evaluated columns, as lists of strings, by column name
+    """
     logger.info(f"Retrieving {config.dataset.path} for evaluation")
-
-    def replace_none_with_empty(row):
-        if row[config.predictions_field] is None:
-            row[config.predictions_field] = ""
-        return row
-
-    dataset = dataset.map(replace_none_with_empty)
-
-    # Check for required fields
-    # If any of the G-Eval metrics are in config.evaluation.metrics,
-    # then we should require the "examples" field to be present too.
-    # Otherwise, "predictions" and "ground_truth" are enough
+    dataset = load_from_disk(config.dataset.path)
 
     # Limit dataset length if max_samples is specified
+    max_samples = config.evaluation.max_samples
     if max_samples < 1 or max_samples > len(dataset):
         logger.info(f"max_samples ({max_samples}) resized to dataset size ({len(dataset)})")
         max_samples = len(dataset)
-    dataset = dataset.select(range(max_samples))
+    table = dataset.with_format("arrow")[:max_samples]
+
+    columns = {}
+    for name in ["examples", config.predictions_field, "ground_truth"]:
+        column = table.column(name)
+        if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+            # If the column cannot be cast, then the dataset is most probably broken.
+            logger.warning(
+                f"Found column '{name}' with non-string type '{column.type}', "
+                "converting type to string and None values to ''"
+            )
+            column = column.cast(pa.string())
+        columns[name] = pc.fill_null(column, "").to_pylist()
+    return columns
+
+
+def run_eval(config: EvalJobConfig, job_id: UUID) -> str | None:
+    columns = load_eval_columns(config)
+    examples = columns["examples"]
+    predictions = columns[config.predictions_field]
+    ground_truth = columns["ground_truth"]
+
+    # Load metrics and their models up front, so the evaluation time only measures the computation
+    # (unless they are computed by the Ray tasks scoring shards, or possibly not at all when caching)
+    if config.evaluation.warm_up and config.evaluation.num_shards == 1 and not config.evaluation.metric_cache:
+        EvaluationMetrics(
+            config.evaluation.metrics,
+            bertscore_config=config.evaluation.bertscore,
+            comet_config=config.evaluation.comet,
+            token_length_tokenizer=config.evaluation.token_length_tokenizer,
+        ).warm_up()
+
+    # Samples already scored by a previous job with the same metric settings are served from the
+    # metric cache (if enabled), only the other samples are scored.
+    metric_cache = None
+    if config.evaluation.metric_cache:
+        metric_cache = MetricCache(local_metric_cache_path(), config.evaluation.metric_cache_uri)
+        metric_cache.pull()
 
     metric_results: EvalJobMetrics
     evaluation_time: float
-    metric_results, evaluation_time = run_eval_metrics(
-        examples=dataset["examples"],
-        predictions=dataset[config.predictions_field],
-        ground_truth=dataset["ground_truth"],
-        evaluation_metrics=config.evaluation.metrics,
-    )
+    try:
+        metric_results, evaluation_time = evaluate(
+            config.evaluation,
+            examples=examples,
+            predictions=predictions,
+            ground_truth=ground_truth,
+            metric_cache=metric_cache,
+        )
+    finally:
+        # Share whatever was scored, even if the job failed.
+        if metric_cache is not None:
+            metric_cache.push()
+            metric_cache.close()
 
     # add input data to results dict
     if config.evaluation.return_input_data:
         artifacts = EvalJobArtifacts(
-            predictions=dataset[config.predictions_field],
-            ground_truth=dataset["ground_truth"],
+            predictions=predictions,
+            ground_truth=ground_truth,
             evaluation_time=evaluation_time,
         )
     else:
@@ -149,31 +257,6 @@ def run_eval(config: EvalJobConfig, job_id: UUID) -> str | None:
     return output_path
 
 
-def prepare_judge_model(config: EvalJobConfig) -> None:
-    if config.evaluation.llm_as_judge is not None:
-        # first check if an API key was provided: if not, assume the user is going to use ollama
-        # (deepeval uses "ollama" as LOCAL_MODEL_API_KEY to choose whether to use ollama or not)
-        local_model_api_key = os.environ.get("api_key", "ollama")
-
-        # create a .deepeval config file if a local model is specified
-        deepeval_config = {
-            "LOCAL_MODEL_NAME": config.evaluation.llm_as_judge.model_name,
-            "LOCAL_MODEL_BASE_URL": config.evaluation.llm_as_judge.model_base_url,
-            "USE_LOCAL_MODEL": "YES",
-            "USE_AZURE_OPENAI": "NO",
-            "LOCAL_MODEL_API_KEY": local_model_api_key,
-        }
-        with Path(DEEPEVAL_CONFIG_FILENAME).open("w") as f:
-            json.dump(deepeval_config, f, indent=4)
-    else:
-        # otherwise, deepeval will use its default (OpenAI Client), so set up auth first
-        # (note that we don't care if `api_key` is not set if we don't run a geval metric)
-        os.environ["OPENAI_API_KEY"] = os.environ.get("api_key", "")
-
-        # then make sure we'll start without a .deepeval config file
-        Path(DEEPEVAL_CONFIG_FILENAME).unlink(missing_ok=True)
-
-
 def sanitize_job_name(job_name: str) -> str:
     """Sanitize a job name to be S3-safe."""
     return re.sub(SAFE_JOB_NAME_REGEX, JOB_NAME_REPLACEMENT_CHAR, job_name)
@@ -191,7 +274,7 @@ if __name__ == "__main__":
     else:
         # depending on the configuration provided, set up
         config = EvalJobConfig.model_validate_json(args.config)
-        prepare_judge_model(config)
+        prepare_judge_model(config.evaluation)
 
         job_id: UUID = UUID(os.environ.get("MZAI_JOB_ID"))
         run_eval(config, job_id)
@@ -0,0 +1,233 @@
+"""Content-addressed cache of per-sample metric results, shared across evaluation jobs.
+
+Workflows are frequently re-run after changing a single model or prompt, so most of the
+(example, prediction, reference) samples they evaluate were already scored by a previous job.
+All the metrics are computed sample-wise, so the result of each sample is cached under a hash of
+the sample and of everything that determines its score (the metric, its model, the G-Eval judge
+and prompts): cached samples are served from the cache and only the others are scored, the means
+being recomputed over all the samples.
+
+Like the inference job's prediction cache, the cache is a local SQLite database which can
+optionally be shared with other jobs through S3: the remote copy is merged into the local one
+when the job starts, and the local one (including the new results) is merged back and uploaded
+when the job ends.
+"""
+
+import hashlib
+import json
+import sqlite3
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+
+import s3fs
+from eval_metrics import G_EVAL_PROMPTS, merge_metric_results, split_metric_result
+from loguru import logger
+
+from schemas import EvalJobMetrics, EvaluationConfig
+
+METRIC_CACHE_FILENAME = "metrics.sqlite"
+
+METRIC_CACHE_VERSION = 1
+"""Version of the cached results, to be increased whenever the computation of a metric changes."""
+
+SQLITE_MAX_VARIABLES = 500
+"""Max number of keys looked up in a single query, below SQLite's limit on query parameters."""
+
+
+def metric_cache_namespace(metric: str, config: EvaluationConfig) -> str:
+    """Compute a hash of everything in the evaluation configuration that determines the results of a metric.
+
+    Args:
+        metric: the name of the metric
+        config: the evaluation configuration
+
+    Returns:
+        The hex digest identifying the metric and its settings
+    """
+    payload = {"metric": metric, "version": METRIC_CACHE_VERSION}
+    if metric == "bertscore":
+        payload["bertscore"] = config.bertscore.model_dump(include={"model_type", "lang"})
+    elif metric == "comet":
+        payload["comet"] = config.comet.model
+    elif metric == "token_length":
+        payload["tokenizer"] = config.token_length_tokenizer
+    elif metric.startswith("g_eval"):
+        payload["judge"] = config.llm_as_judge.model_dump() if config.llm_as_judge else None
+        payload["prompts"] = Path(G_EVAL_PROMPTS).read_text()
+    serialized = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def metric_cache_key(namespace: str, example: str, prediction: str, reference: str) -> str:
+    """Compute the cache key of a single sample.
+
+    Args:
+        namespace: the namespace of the metric, see `metric_cache_namespace`
+        example: the input of the evaluated model
+        prediction: the prediction of the evaluated model
+        reference: the reference (ground truth) the prediction is evaluated against
+
+    Returns:
+        The hex digest identifying the result of the metric for the sample
+    """
+    serialized = json.dumps([namespace, example, prediction, reference], ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+class MetricCache:
+    """Stores per-sample metric results in a local SQLite database, optionally shared through S3."""
+
+    def __init__(self, path: Path, remote_uri: str | None = None):
+        """Open (or create) the metric cache.
+
+        Args:
+            path: the path of the local SQLite database
+            remote_uri: the S3 URI of the prefix the cache is shared under, if any
+        """
+        self.path = path
+        self.remote_path = f"{remote_uri.rstrip('/')}/{METRIC_CACHE_FILENAME}" if remote_uri else None
+        self._s3 = s3fs.S3FileSystem() if self.remote_path else None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Several jobs running on the same node may share the local cache.
+        self._db = sqlite3.connect(self.path, timeout=60)
+        self._db.execute("CREATE TABLE IF NOT EXISTS metrics (key TEXT PRIMARY KEY, result TEXT NOT NULL)")
+        self._db.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, dict]:
+        """Look up the cached results for the given keys.
+
+        Args:
+            keys: the keys to look up
+
+        Returns:
+            The cached results, by key. Keys not in the cache are left out.
+        """
+        results = {}
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            chunk = keys[start : start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._db.execute(f"SELECT key, result FROM metrics WHERE key IN ({placeholders})", chunk)
+            results.update((key, json.loads(result)) for key, result in rows)
+        return results
+
+    def put_many(self, results: dict[str, dict]) -> None:
+        """Store the given results.
+
+        Args:
+            results: the results to store, by key
+        """
+        self._db.executemany(
+            "INSERT OR REPLACE INTO metrics (key, result) VALUES (?, ?)",
+            ((key, json.dumps(result)) for key, result in results.items()),
+        )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        """The number of results stored in the (local) cache."""
+        return self._db.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+
+    def pull(self) -> None:
+        """Merge the remote copy of the cache (if any) into the local one.
+
+        Failing to download the remote copy is not an error: results will just not be served from it.
+        """
+        if self.remote_path is None:
+            return
+
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                remote_copy = Path(tmp_dir) / METRIC_CACHE_FILENAME
+                if not self._s3.exists(self.remote_path):
+                    return
+                logger.info(f"Downloading metric cache from {self.remote_path}")
+                self._s3.get_file(self.remote_path, remote_copy)
+                self._merge(remote_copy)
+        except (OSError, sqlite3.DatabaseError) as e:
+            logger.warning(f"Unable to download the metric cache from {self.remote_path}: {e}")
+
+    def push(self) -> None:
+        """Merge the latest remote copy of the cache into the local one, then upload it.
+
+        Failing to upload the cache is not an error: new results will just not be shared.
+        """
+        if self.remote_path is None:
+            return
+
+        self.pull()
+        logger.info(f"Uploading metric cache to {self.remote_path}")
+        try:
+            self._s3.put_file(self.path, self.remote_path)
+        except OSError as e:
+            logger.warning(f"Unable to upload the metric cache to {self.remote_path}: {e}")
+
+    def _merge(self, other_path: Path) -> None:
+        self._db.execute("ATTACH DATABASE ? AS other", (str(other_path),))
+        try:
+            self._db.execute("INSERT OR IGNORE INTO metrics (key, result) SELECT key, result FROM other.metrics")
+            self._db.commit()
+        finally:
+            self._db.execute("DETACH DATABASE other")
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def run_cached_eval_metrics(
+    compute: Callable[[list[str], list, list, list], EvalJobMetrics],
+    cache: MetricCache,
+    config: EvaluationConfig,
+    examples: list,
+    predictions: list,
+    ground_truth: list,
+) -> EvalJobMetrics:
+    """Run the evaluation metrics, only scoring the samples whose results are not in the cache.
+
+    The samples missing from the cache for any metric are scored in a single run, computing
+    every metric missing some of them (so metrics are still computed concurrently, or sharded).
+
+    Args:
+        compute: computes the given metrics on the given examples, predictions and ground truth
+        cache: the metric cache
+        config: the evaluation configuration
+        examples: the samples that were the input to the model we are evaluating
+        predictions: the texts generated by the model we are evaluating
+        ground_truth: the reference texts we evaluate the model predictions against
+
+    Returns:
+        The metrics of all the samples
+    """
+    if not predictions:
+        return compute(config.metrics, examples, predictions, ground_truth)
+
+    cached_metrics = {}
+    for metric in EvalJobMetrics.model_fields.keys() & set(config.metrics):
+        namespace = metric_cache_namespace(metric, config)
+        keys = [metric_cache_key(namespace, e, p, r) for e, p, r in zip(examples, predictions, ground_truth)]
+        cached_metrics[metric] = (keys, cache.get_many(keys))
+        logger.info(f"Metric cache hit rate for {metric}: {len(cached_metrics[metric][1]) / len(keys):.2%}")
+
+    missing = sorted({i for keys, cached in cached_metrics.values() for i, key in enumerate(keys) if key not in cached})
+    missing_metrics = [m for m, (keys, cached) in cached_metrics.items() if len(cached) < len(keys)]
+    computed = EvalJobMetrics()
+    if missing_metrics:
+        logger.info(f"Scoring {len(missing)} samples missing from the metric cache for {missing_metrics}")
+        computed = compute(
+            missing_metrics,
+            [examples[i] for i in missing],
+            [predictions[i] for i in missing],
+            [ground_truth[i] for i in missing],
+        )
+
+    results = {}
+    for metric, (keys, cached) in cached_metrics.items():
+        if metric in missing_metrics:
+            if (result := getattr(computed, metric)) is None:
+                continue
+            new_results = dict(zip((keys[i] for i in missing), split_metric_result(result.model_dump()), strict=True))
+            cache.put_many(new_results)
+            cached = {**cached, **new_results}
+        results[metric] = merge_metric_results([cached[key] for key in keys])
+
+    return EvalJobMetrics.model_validate(results)
@@ -3,8 +3,8 @@ This file must only depend on pydantic and not on any other external library.
 This is because the backend and this job will be running in different environments.
 """
 
-from lumigator_schemas.jobs import DeepEvalLocalModelConfig
-from pydantic import BaseModel, ConfigDict, Field
+from lumigator_schemas.jobs import BertScoreConfig, CometConfig, DeepEvalLocalModelConfig
+from pydantic import BaseModel, ConfigDict, Field, NonNegativeFloat, PositiveFloat, PositiveInt
 
 
 class DatasetConfig(BaseModel):
@@ -19,6 +19,27 @@ class EvaluationConfig(BaseModel):
     return_input_data: bool = False
     return_predictions: bool = False
     storage_path: str
+    # Max number of metrics computed concurrently (1 computes them one after the other)
+    max_workers: PositiveInt = 1
+    # Load the metrics (and their models) before the timed evaluation
+    warm_up: bool = True
+    # Max number of G-Eval judge requests in flight (1 sends them one at a time), and sent per minute if limited
+    g_eval_max_concurrency: PositiveInt = 8
+    g_eval_requests_per_minute: PositiveInt | None = None
+    # Model, batch size, device and threads used by the model-based metrics
+    bertscore: BertScoreConfig = Field(default_factory=BertScoreConfig)
+    comet: CometConfig = Field(default_factory=CometConfig)
+    # Tokenizer counting tokens for token_length: a HuggingFace tokenizer name, or "tiktoken:" followed by
+    # a tiktoken encoding or OpenAI model name (e.g. "tiktoken:gpt-4o"). If unset, tokens are estimated from words
+    token_length_tokenizer: str | None = None
+    # Number of shards of the dataset scored in parallel Ray tasks (1 scores it in the job itself),
+    # and the resources reserved by the task scoring each shard
+    num_shards: PositiveInt = 1
+    shard_num_cpus: PositiveFloat = 1
+    shard_num_gpus: NonNegativeFloat = 0
+    # Serve samples already scored by previous jobs from the metric cache, shared through S3 if a URI is set
+    metric_cache: bool = False
+    metric_cache_uri: str | None = None
     model_config = ConfigDict(extra="forbid")
 
 
@@ -0,0 +1,109 @@
+"""Sharded evaluation: scoring shards of the dataset in parallel Ray tasks.
+
+With ``EvaluationConfig.num_shards`` above 1, the dataset is split into contiguous shards, each
+scored by its own Ray task (so model-based metrics scale out to every worker of the cluster),
+and the per-sample results of the shards are concatenated back in dataset order, their means
+recomputed over the whole dataset.
+
+``ray`` is provided by the Ray runtime the job runs in, so it is only imported when sharding.
+"""
+
+from eval_metrics import EvaluationMetrics, merge_metric_results, prepare_judge_model
+from loguru import logger
+from utils import timer
+
+from schemas import EvalJobMetrics, EvaluationConfig
+
+
+def shard_ranges(num_rows: int, num_shards: int) -> list[range]:
+    """Split the rows of a dataset into contiguous shards of (almost) the same size.
+
+    Args:
+        num_rows: the number of rows in the dataset
+        num_shards: the max number of shards (there are never more shards than rows)
+
+    Returns:
+        The range of rows of each shard, in dataset order
+    """
+    num_shards = max(1, min(num_shards, num_rows))
+    bounds = [num_rows * i // num_shards for i in range(num_shards + 1)]
+    return [range(start, end) for start, end in zip(bounds, bounds[1:], strict=False)]
+
+
+def merge_metrics(shard_metrics: list[EvalJobMetrics]) -> EvalJobMetrics:
+    """Merge the metrics computed on each shard into the metrics of the whole dataset.
+
+    See ``merge_metric_results``.
+
+    Args:
+        shard_metrics: the metrics of each shard, in dataset order
+
+    Returns:
+        The metrics of the whole dataset
+    """
+    merged = {}
+    for metric in EvalJobMetrics.model_fields:
+        results = [r.model_dump() for shard in shard_metrics if (r := getattr(shard, metric)) is not None]
+        if results:
+            merged[metric] = merge_metric_results(results)
+
+    return EvalJobMetrics.model_validate(merged)
+
+
+def evaluate_shard(config: EvaluationConfig, examples: list, predictions: list, ground_truth: list) -> EvalJobMetrics:
+    """Compute the metrics of a single shard, in a Ray task."""
+    logger.info(f"Evaluating a shard of {len(predictions)} samples")
+    # The judge set up by the job is not shared with its Ray tasks, which may run on other nodes.
+    prepare_judge_model(config)
+    # Shards already run in parallel Ray tasks, so the metrics of a shard are computed one after the other.
+    em = EvaluationMetrics(
+        config.metrics,
+        max_workers=1,
+        g_eval_max_concurrency=config.g_eval_max_concurrency,
+        g_eval_requests_per_minute=config.g_eval_requests_per_minute,
+        bertscore_config=config.bertscore,
+        comet_config=config.comet,
+        token_length_tokenizer=config.token_length_tokenizer,
+    )
+    return em.run_all(examples, predictions, ground_truth)
+
+
+@timer
+def run_sharded_eval_metrics(
+    examples: list, predictions: list, ground_truth: list, config: EvaluationConfig
+) -> EvalJobMetrics:
+    """Run the evaluation metrics on shards of the input samples, in parallel Ray tasks.
+
+    The G-Eval requests per minute limit applies to the whole job, so it is split between the shards.
+
+    Args:
+        examples: the samples that were the input to the model we are evaluating
+        predictions: the texts generated by the model we are evaluating
+        ground_truth: the reference texts we evaluate the model predictions against
+        config: the evaluation configuration, with ``num_shards`` set
+
+    Returns:
+        The metrics of the whole dataset
+    """
+    import ray
+
+    shards = shard_ranges(len(predictions), config.num_shards)
+    if config.g_eval_requests_per_minute is not None:
+        config = config.model_copy(
+            update={"g_eval_requests_per_minute": max(1, config.g_eval_requests_per_minute // len(shards))}
+        )
+    logger.info(f"Evaluating {len(predictions)} samples in {len(shards)} shards")
+
+    remote_evaluate_shard = ray.remote(evaluate_shard).options(
+        num_cpus=config.shard_num_cpus, num_gpus=config.shard_num_gpus
+    )
+    shard_refs = [
+        remote_evaluate_shard.remote(
+            config,
+            examples[shard.start : shard.stop],
+            predictions[shard.start : shard.stop],
+            ground_truth[shard.start : shard.stop],
+        )
+        for shard in shards
+    ]
+    return merge_metrics(ray.get(shard_refs))
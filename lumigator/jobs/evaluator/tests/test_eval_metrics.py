@@ -1,16 +1,23 @@
+import asyncio
 import json
+import logging
 import shutil
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 from uuid import UUID
 
 import numpy as np
 import pytest
-from datasets import load_dataset
-from eval_metrics import EvaluationMetrics
-from evaluator import run_eval
+import tiktoken
+from datasets import Dataset, load_dataset
+from eval_metrics import EvaluationMetrics, load_metric, load_token_counter, metric_batch_size
+from evaluator import load_eval_columns, run_eval
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import WhitespaceSplit
+from transformers import PreTrainedTokenizerFast
 
-from schemas import DatasetConfig, EvalJobConfig, EvaluationConfig
+from schemas import BertScoreConfig, CometConfig, DatasetConfig, EvalJobConfig, EvaluationConfig
 
 
 @pytest.fixture
@@ -69,6 +76,50 @@ def test_token_length_empty_strings(evaluation_metrics):
     assert result["pred_token_length_mean"] == result["pred_token_length"][1] / 2
 
 
+@pytest.fixture
+def clear_token_counters():
+    load_token_counter.cache_clear()
+    yield
+    load_token_counter.cache_clear()
+
+
+@pytest.fixture
+def whitespace_tokenizer_path(tmp_path) -> Path:
+    """A fast tokenizer with a token per word, saved locally so it is loaded without the Hub."""
+    tokenizer = Tokenizer(WordLevel({"[UNK]": 0, "This": 1, "is": 2}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = WhitespaceSplit()
+    PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="[UNK]").save_pretrained(tmp_path)
+    return tmp_path
+
+
+def test_token_length_with_hf_tokenizer(clear_token_counters, whitespace_tokenizer_path, sample_data):
+    _, predictions, references = sample_data
+    em = EvaluationMetrics(["token_length"], token_length_tokenizer=str(whitespace_tokenizer_path))
+
+    result = em._token_length(predictions + [""], references + [""])
+
+    assert result["ref_token_length"] == [len(r.split()) for r in references] + [0]
+    assert result["pred_token_length"] == [len(p.split()) for p in predictions] + [0]
+    assert result["pred_token_length_mean"] == np.mean(result["pred_token_length"])
+
+
+def test_token_length_with_tiktoken(clear_token_counters, sample_data):
+    _, predictions, references = sample_data
+    # A token per byte, as tiktoken encodings are downloaded on first use
+    byte_encoding = tiktoken.Encoding(
+        name="bytes", pat_str=r"\S+|\s+", mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={}
+    )
+    em = EvaluationMetrics(["token_length"], token_length_tokenizer="tiktoken:bytes")
+
+    with patch("tiktoken.get_encoding", return_value=byte_encoding) as get_encoding:
+        result = em._token_length(predictions, references)
+        em._token_length(predictions, references)
+
+    get_encoding.assert_called_once_with("bytes")
+    assert result["ref_token_length"] == [len(r.encode()) for r in references]
+    assert result["pred_token_length"] == [len(p.encode()) for p in predictions]
+
+
 def test_empty_fields_cast_as_float64():
     test_path_csv = Path("../../sample_data/summarization/predictions_gibberish.csv")
     test_path = test_path_csv.with_suffix("")
@@ -84,6 +135,31 @@ def test_empty_fields_cast_as_float64():
     shutil.rmtree(test_path)
 
 
+@pytest.mark.parametrize("max_samples, num_rows", [(0, 3), (2, 2), (10, 3)])
+def test_load_eval_columns(tmp_path, max_samples, num_rows):
+    Dataset.from_dict(
+        {
+            "examples": ["e1", "e2", "e3"],
+            "predictions": [None, None, None],
+            "ground_truth": [1.5, None, 3.0],
+            "other": [{"nested": 1}, {"nested": 2}, {"nested": 3}],
+        }
+    ).save_to_disk(tmp_path / "dataset")
+    config = EvalJobConfig(
+        name="test",
+        dataset=DatasetConfig(path=str(tmp_path / "dataset")),
+        evaluation=EvaluationConfig(max_samples=max_samples, storage_path=str(tmp_path)),
+    )
+
+    columns = load_eval_columns(config)
+
+    assert columns == {
+        "examples": ["e1", "e2", "e3"][:num_rows],
+        "predictions": ["", "", ""][:num_rows],
+        "ground_truth": ["1.5", "", "3"][:num_rows],
+    }
+
+
 @patch("eval_metrics.EvaluationMetrics._g_eval_measure_with_retry")
 @patch("eval_metrics.GEval")
 def test_geval_metrics_dict(mock_geval, mock_g_eval_measure_with_retry):
@@ -122,3 +198,226 @@ def test_geval_metrics_dict(mock_geval, mock_g_eval_measure_with_retry):
     # check that all g_eval metrics are present in the output dictionary
     for metric_name in g_eval_metrics:
         assert metric_name in results.model_dump()
+
+
+def test_bleu_sample_wise_scores(caplog):
+    """BLEU is computed per sample (4-grams, no smoothing, brevity penalty)."""
+    em = EvaluationMetrics(["bleu"])
+    pred = ["the cat sat on the red mat", "the cat sat on the mat", "the cat", ""]
+    ref = ["the cat sat on the mat", "the cat sat on the mat", "the cat sat on the mat", "the cat sat on the mat"]
+
+    with caplog.at_level(logging.WARNING, logger="sacrebleu"):
+        result = em._bleu(pred, ref)
+
+    # sacrebleu does not log a warning for every sample.
+    assert not caplog.records
+
+    # 6/7 unigrams, 4/6 bigrams, 3/5 trigrams and 2/4 4-grams match, the prediction is longer than the reference.
+    expected = [(6 / 7 * 4 / 6 * 3 / 5 * 2 / 4) ** 0.25, 1.0, 0.0, 0.0]
+    assert result["bleu"] == pytest.approx(expected)
+    assert result["bleu_mean"] == pytest.approx(np.mean(expected))
+
+
+@patch("eval_metrics.ensure_nltk_resources")
+@patch("eval_metrics.single_meteor_score")
+def test_meteor_sample_wise_scores(mock_single_meteor_score, mock_ensure_nltk_resources):
+    """METEOR is computed per sample on the tokenized reference and prediction."""
+    mock_single_meteor_score.side_effect = lambda reference, hypothesis: len(hypothesis) / len(reference)
+    em = EvaluationMetrics(["meteor"])
+
+    with patch("eval_metrics.nltk.word_tokenize", side_effect=str.split):
+        result = em._meteor(["a b", "a b c d"], ["a b c d", "a b c d"])
+
+    mock_ensure_nltk_resources.assert_called_once()
+    assert result == {"meteor": [0.5, 1.0], "meteor_mean": 0.75}
+
+
+def test_run_all_concurrently_matches_sequential_run(sample_data):
+    """Metrics computed concurrently (in worker processes and threads) give the same results."""
+    examples, predictions, references = sample_data
+    metrics = ["bleu", "token_length"]
+
+    sequential = EvaluationMetrics(metrics).run_all(examples, predictions, references)
+    concurrent = EvaluationMetrics(metrics, max_workers=2).run_all(examples, predictions, references)
+
+    assert concurrent == sequential
+    assert concurrent.bleu is not None and concurrent.token_length is not None
+
+
+@pytest.mark.parametrize(
+    "metrics, max_workers, expected_pools",
+    [
+        (["rouge", "meteor", "bleu", "bertscore", "comet"], 2, {"process": 1, "thread": 1}),
+        (["rouge", "meteor", "bleu", "bertscore", "comet"], 4, {"process": 3, "thread": 1}),
+        (["rouge", "bertscore", "comet", "token_length"], 3, {"process": 1, "thread": 2}),
+        (["rouge", "meteor", "bleu"], 2, {"process": 2}),
+    ],
+)
+def test_run_all_shares_max_workers_between_pools(metrics, max_workers, expected_pools):
+    """The process and thread pools never run more than max_workers metrics at once, between them."""
+    pools = {}
+
+    def fake_executor(kind):
+        def create(workers, **kwargs):
+            pools[kind] = workers
+            executor = Mock()
+            executor.__enter__ = Mock(return_value=executor)
+            executor.__exit__ = Mock(return_value=None)
+            executor.submit.return_value.result.return_value = None
+            return executor
+
+        return create
+
+    with (
+        patch("eval_metrics.ProcessPoolExecutor", side_effect=fake_executor("process")),
+        patch("eval_metrics.ThreadPoolExecutor", side_effect=fake_executor("thread")),
+    ):
+        EvaluationMetrics(metrics, max_workers=max_workers).run_all([], ["p"], ["r"])
+
+    assert pools == expected_pools
+
+
+class FakeJudgeMetric:
+    """Async G-Eval metric scoring predictions by length, failing the first attempt on "flaky" ones."""
+
+    def __init__(self, name: str, requests: dict, **kwargs):
+        self.name = name
+        self.requests = requests
+        self.failed = set()
+
+    async def a_measure(self, test_case, _show_indicator: bool = True) -> float:
+        self.requests["in_flight"] += 1
+        self.requests["max_in_flight"] = max(self.requests["max_in_flight"], self.requests["in_flight"])
+        try:
+            await asyncio.sleep(0.01)
+            if test_case.actual_output.startswith("flaky") and test_case.actual_output not in self.failed:
+                self.failed.add(test_case.actual_output)
+                raise ValueError("Evaluation LLM outputted an invalid JSON")
+            self.reason = f"{self.name}: {test_case.actual_output}"
+            self.score = len(test_case.actual_output) / 10
+            return self.score
+        finally:
+            self.requests["in_flight"] -= 1
+
+
+def test_g_eval_concurrent_requests():
+    """Judge requests for all metrics and samples are sent concurrently, up to the concurrency cap."""
+    judge_metrics = []
+    requests = {"in_flight": 0, "max_in_flight": 0}
+
+    def create_metric(**kwargs):
+        judge_metrics.append(FakeJudgeMetric(requests=requests, **kwargs))
+        return judge_metrics[-1]
+
+    em = EvaluationMetrics(["g_eval_summarization"], g_eval_max_concurrency=3)
+    pred = ["a", "flaky bb", "ccc", "dddd", "e"]
+
+    with patch("eval_metrics.GEval", side_effect=create_metric):
+        results = em._g_eval(examples=["x"] * len(pred), pred=pred, ref=["y"] * len(pred), task="summarization")
+
+    for metric in judge_metrics:
+        assert [r["score"] for r in results[metric.name]] == [len(p) / 10 for p in pred]
+        assert [r["reason"] for r in results[metric.name]] == [f"{metric.name}: {p}" for p in pred]
+        assert results[f"{metric.name}_mean"] == pytest.approx(np.mean([len(p) / 10 for p in pred]))
+        # the flaky sample was retried
+        assert metric.failed == {"flaky bb"}
+    assert len(judge_metrics) == 4
+    assert requests["max_in_flight"] == 3
+
+
+@pytest.fixture
+def mock_evaluate_load():
+    load_metric.cache_clear()
+    with patch("eval_metrics.evaluate.load") as mock:
+        yield mock
+    load_metric.cache_clear()
+
+
+def test_metrics_are_loaded_once_per_process(mock_evaluate_load, sample_data):
+    _, predictions, references = sample_data
+    mock_evaluate_load.return_value.compute.return_value = {
+        k: [0.5, 0.5] for k in ["rouge1", "rouge2", "rougeL", "rougeLsum"]
+    }
+
+    EvaluationMetrics(["rouge"]).run_all([], predictions, references)
+    EvaluationMetrics(["rouge"]).run_all([], predictions, references)
+
+    mock_evaluate_load.assert_called_once_with("rouge", None)
+    assert mock_evaluate_load.return_value.compute.call_count == 2
+
+
+@patch("eval_metrics.ensure_nltk_resources")
+def test_warm_up_loads_chosen_metrics(mock_ensure_nltk_resources, mock_evaluate_load):
+    em = EvaluationMetrics(["bertscore", "comet", "meteor", "bleu"])
+
+    em.warm_up()
+
+    assert sorted(call.args for call in mock_evaluate_load.call_args_list) == [
+        ("bertscore", None),
+        ("comet", "eamt22-cometinho-da"),
+    ]
+    # BERTScore only builds its scorer (and loads its model) on the first computation
+    mock_evaluate_load.return_value.compute.assert_called_once()
+    mock_ensure_nltk_resources.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "batch_size, device, memory, expected",
+    [
+        (8, "cpu", 2**40, 8),
+        (None, "cuda", 2**20, 64),
+        (None, "cpu", None, 64),
+        (None, "cpu", 2**40, 64),
+        (None, "cpu", 1024 * 2**20, 8),
+        (None, "cpu", 0, 1),
+    ],
+)
+def test_metric_batch_size_fits_available_memory_on_cpu(batch_size, device, memory, expected):
+    with patch("eval_metrics.available_memory", return_value=memory):
+        assert metric_batch_size(batch_size, device, default=64) == expected
+
+
+def test_bertscore_config(mock_evaluate_load, sample_data):
+    _, predictions, references = sample_data
+    mock_evaluate_load.return_value.compute.return_value = {
+        **{k: [0.5, 0.5] for k in ["precision", "recall", "f1"]},
+        "hashcode": "distilbert-base-uncased_L5_no-idf_version=0.3.12(hug_trans=4.48.0)",
+    }
+    config = BertScoreConfig(model_type="distilbert-base-uncased", batch_size=4, device="cpu", num_threads=2)
+
+    EvaluationMetrics(["bertscore"], bertscore_config=config).run_all([], predictions, references)
+
+    mock_evaluate_load.return_value.compute.assert_called_once_with(
+        predictions=predictions,
+        references=references,
+        lang="en",
+        model_type="distilbert-base-uncased",
+        device="cpu",
+        batch_size=4,
+    )
+
+
+@pytest.mark.parametrize(
+    "device, device_kwargs",
+    [
+        ("cpu", {"gpus": 0}),
+        ("cuda", {"gpus": 1, "accelerator": "cuda"}),
+        ("cuda:1", {"gpus": 1, "accelerator": "cuda", "devices": [1]}),
+    ],
+)
+def test_comet_config(mock_evaluate_load, device, device_kwargs):
+    scorer = mock_evaluate_load.return_value.scorer
+    scorer.predict.return_value = Mock(scores=[0.2, 0.4], system_score=0.3)
+    config = CometConfig(model="Unbabel/wmt22-comet-da", batch_size=2, device=device)
+
+    results = EvaluationMetrics(["comet"], comet_config=config).run_all(["s1", "s2"], ["p1", "p2"], ["r1", "r2"])
+
+    assert results.comet.scores == [0.2, 0.4]
+    assert results.comet.mean_score == 0.3
+    mock_evaluate_load.assert_called_once_with("comet", "Unbabel/wmt22-comet-da")
+    scorer.predict.assert_called_once_with(
+        [{"src": "s1", "mt": "p1", "ref": "r1"}, {"src": "s2", "mt": "p2", "ref": "r2"}],
+        batch_size=2,
+        progress_bar=False,
+        **device_kwargs,
+    )
@@ -0,0 +1,116 @@
+from unittest.mock import patch
+
+import fsspec
+import pytest
+from eval_metrics import EvaluationMetrics
+from metric_cache import (
+    METRIC_CACHE_FILENAME,
+    MetricCache,
+    metric_cache_key,
+    metric_cache_namespace,
+    run_cached_eval_metrics,
+)
+
+from schemas import EvaluationConfig
+
+REMOTE_URI = "s3://bucket/cache/metrics"
+
+EXAMPLES = ["e1", "e2", "e3", "e4"]
+PREDICTIONS = ["the cat sat on the mat", "a dog", "hello world", "one two three four"]
+GROUND_TRUTH = ["the cat is on the mat", "a big dog", "hello there world", "one two three"]
+
+
+class SpyCompute:
+    """Computes metrics like the evaluator does, recording the samples it scores."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, metrics, examples, predictions, ground_truth):
+        self.calls.append((sorted(metrics), predictions))
+        return EvaluationMetrics(metrics).run_all(examples, predictions, ground_truth)
+
+
+@pytest.fixture
+def memory_fs():
+    fs = fsspec.filesystem("memory")
+    fs.store.clear()
+    with patch("metric_cache.s3fs.S3FileSystem", return_value=fs):
+        yield fs
+    fs.store.clear()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetricCache(tmp_path / "cache" / METRIC_CACHE_FILENAME)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def config() -> EvaluationConfig:
+    return EvaluationConfig(metrics=["bleu", "token_length"], storage_path="/tmp", metric_cache=True)
+
+
+def test_metric_cache_namespace():
+    config = EvaluationConfig(storage_path="/tmp")
+    same_results = config.model_copy(update={"max_workers": 4, "num_shards": 4, "storage_path": "s3://bucket/"})
+    other_bertscore = config.model_copy(deep=True)
+    other_bertscore.bertscore.model_type = "distilbert-base-uncased"
+    other_bertscore_batch = config.model_copy(deep=True)
+    other_bertscore_batch.bertscore.batch_size = 2
+
+    assert metric_cache_namespace("bertscore", config) == metric_cache_namespace("bertscore", same_results)
+    assert metric_cache_namespace("bertscore", config) != metric_cache_namespace("bertscore", other_bertscore)
+    assert metric_cache_namespace("bertscore", config) == metric_cache_namespace("bertscore", other_bertscore_batch)
+    assert metric_cache_namespace("rouge", config) == metric_cache_namespace("rouge", other_bertscore)
+    assert metric_cache_namespace("rouge", config) != metric_cache_namespace("bleu", config)
+
+
+def test_metric_cache_key():
+    namespace = metric_cache_namespace("bleu", EvaluationConfig(storage_path="/tmp"))
+
+    assert metric_cache_key(namespace, "e", "p", "r") == metric_cache_key(namespace, "e", "p", "r")
+    assert metric_cache_key(namespace, "e", "p", "r") != metric_cache_key(namespace, "e", "r", "p")
+    assert metric_cache_key(namespace, "e", "p", "r") != metric_cache_key("other", "e", "p", "r")
+
+
+def test_only_new_samples_are_scored(cache, config):
+    compute = SpyCompute()
+    first = run_cached_eval_metrics(compute, cache, config, EXAMPLES, PREDICTIONS, GROUND_TRUTH)
+
+    predictions = [*PREDICTIONS[:3], "one two"]
+    second = run_cached_eval_metrics(compute, cache, config, EXAMPLES, predictions, GROUND_TRUTH)
+
+    assert compute.calls == [(["bleu", "token_length"], PREDICTIONS), (["bleu", "token_length"], ["one two"])]
+    assert first == EvaluationMetrics(config.metrics).run_all(EXAMPLES, PREDICTIONS, GROUND_TRUTH)
+    assert second == EvaluationMetrics(config.metrics).run_all(EXAMPLES, predictions, GROUND_TRUTH)
+    assert len(cache) == 2 * (len(PREDICTIONS) + 1)
+
+
+def test_fully_cached_metrics_are_not_computed(cache, config):
+    compute = SpyCompute()
+    run_cached_eval_metrics(
+        compute, cache, config.model_copy(update={"metrics": ["bleu"]}), EXAMPLES, PREDICTIONS, GROUND_TRUTH
+    )
+
+    results = run_cached_eval_metrics(compute, cache, config, EXAMPLES, PREDICTIONS, GROUND_TRUTH)
+
+    assert compute.calls[1] == (["token_length"], PREDICTIONS)
+    assert results == EvaluationMetrics(config.metrics).run_all(EXAMPLES, PREDICTIONS, GROUND_TRUTH)
+
+
+def test_cache_is_shared_through_s3(tmp_path, memory_fs, config):
+    first_cache = MetricCache(tmp_path / "first" / METRIC_CACHE_FILENAME, REMOTE_URI)
+    run_cached_eval_metrics(SpyCompute(), first_cache, config, EXAMPLES, PREDICTIONS, GROUND_TRUTH)
+    first_cache.push()
+    first_cache.close()
+
+    second_cache = MetricCache(tmp_path / "second" / METRIC_CACHE_FILENAME, REMOTE_URI)
+    second_cache.pull()
+    compute = SpyCompute()
+    run_cached_eval_metrics(compute, second_cache, config, EXAMPLES, PREDICTIONS, GROUND_TRUTH)
+    second_cache.close()
+
+    assert memory_fs.exists(f"{REMOTE_URI}/{METRIC_CACHE_FILENAME}")
+    assert compute.calls == []
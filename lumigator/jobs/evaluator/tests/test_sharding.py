@@ -0,0 +1,136 @@
+import json
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from eval_metrics import DEEPEVAL_CONFIG_FILENAME, G_EVAL_PROMPTS, EvaluationMetrics
+from lumigator_schemas.jobs import DeepEvalLocalModelConfig
+from sharding import merge_metrics, run_sharded_eval_metrics, shard_ranges
+
+from schemas import EvalJobMetrics, EvaluationConfig
+
+
+@pytest.mark.parametrize("num_rows, num_shards", [(10, 3), (10, 1), (2, 4), (1000, 7)])
+def test_shard_ranges_cover_rows_in_order(num_rows, num_shards):
+    shards = shard_ranges(num_rows, num_shards)
+
+    assert len(shards) == min(num_rows, num_shards)
+    assert [row for shard in shards for row in shard] == list(range(num_rows))
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+
+
+def test_merged_shards_match_unsharded_metrics():
+    predictions = ["the cat sat on the mat", "a dog", "hello world", "one two three four", "the end", "x y"]
+    references = ["the cat is on the mat", "a big dog", "hello there world", "one two three", "the end", "y x"]
+    em = EvaluationMetrics(["bleu", "token_length"])
+
+    shard_metrics = [
+        em.run_all([], predictions[shard.start : shard.stop], references[shard.start : shard.stop])
+        for shard in shard_ranges(len(predictions), 4)
+    ]
+
+    assert merge_metrics(shard_metrics) == em.run_all([], predictions, references)
+
+
+def test_merge_metrics_recomputes_means():
+    shard_metrics = [
+        EvalJobMetrics.model_validate(
+            {
+                "comet": {"scores": scores, "mean_score": sum(scores) / len(scores)},
+                "g_eval_translation_noref": {
+                    "consistency": [{"score": s, "reason": "because"} for s in scores],
+                    "consistency_mean": sum(scores) / len(scores),
+                    "fluency": [{"score": 1 - s, "reason": "because"} for s in scores],
+                    "fluency_mean": 1 - sum(scores) / len(scores),
+                },
+            }
+        )
+        for scores in [[0.1], [0.2, 0.3, 0.6]]
+    ]
+
+    merged = merge_metrics(shard_metrics)
+
+    assert merged.comet.scores == [0.1, 0.2, 0.3, 0.6]
+    assert merged.comet.mean_score == pytest.approx(0.3)
+    assert [m.score for m in merged.g_eval_translation_noref.consistency] == [0.1, 0.2, 0.3, 0.6]
+    assert merged.g_eval_translation_noref.consistency_mean == pytest.approx(0.3)
+    assert merged.g_eval_translation_noref.fluency_mean == pytest.approx(0.7)
+    assert merged.bertscore is None
+
+
+class FakeRemoteFunction:
+    """Runs a Ray task like a worker on another node would: in its own working directory, only
+    getting the environment variables of the job's runtime environment.
+    """
+
+    def __init__(self, func, worker_dir: Path, job_env: dict):
+        self.func = func
+        self.worker_dir = worker_dir
+        self.job_env = job_env
+
+    def options(self, **kwargs):
+        return self
+
+    def remote(self, *args):
+        cwd = Path.cwd()
+        os.chdir(self.worker_dir)
+        try:
+            with patch.dict(os.environ, self.job_env, clear=True):
+                return self.func(*args)
+        finally:
+            os.chdir(cwd)
+
+
+class FakeGEval:
+    """G-Eval metric recording the judge it would use, scoring every prediction 0.5."""
+
+    def __init__(self, judges: list, name: str, **kwargs):
+        self.name = name
+        deepeval_config = Path(DEEPEVAL_CONFIG_FILENAME)
+        judges.append(
+            {
+                "openai_api_key": os.environ.get("OPENAI_API_KEY"),
+                "local_model": json.loads(deepeval_config.read_text()) if deepeval_config.exists() else None,
+            }
+        )
+
+    async def a_measure(self, test_case, _show_indicator: bool = True) -> float:
+        self.score = 0.5
+        self.reason = "because"
+        return self.score
+
+
+@pytest.mark.parametrize(
+    "llm_as_judge",
+    [None, DeepEvalLocalModelConfig(model_name="llama3.2", model_base_url="http://ollama:11434")],
+    ids=["openai", "local"],
+)
+def test_sharded_g_eval_sets_up_the_judge_in_each_task(llm_as_judge, tmp_path):
+    config = EvaluationConfig(
+        metrics=["g_eval_summarization"], llm_as_judge=llm_as_judge, num_shards=2, storage_path=str(tmp_path)
+    )
+    ray = SimpleNamespace(
+        remote=lambda func: FakeRemoteFunction(func, tmp_path, {"api_key": "sk-test"}),
+        get=lambda refs: refs,
+    )
+    judges = []
+
+    with (
+        patch.dict(sys.modules, {"ray": ray}),
+        patch("eval_metrics.G_EVAL_PROMPTS", str(Path(G_EVAL_PROMPTS).resolve())),
+        patch("eval_metrics.GEval", side_effect=lambda **kwargs: FakeGEval(judges, **kwargs)),
+    ):
+        metrics, _ = run_sharded_eval_metrics(["x"] * 4, ["a", "b", "c", "d"], ["y"] * 4, config)
+
+    assert metrics.g_eval_summarization.coherence_mean == pytest.approx(0.5)
+    # Each shard builds the 4 summarization metrics, with the judge set up in its own task.
+    assert len(judges) == 2 * 4
+    if llm_as_judge is None:
+        assert all(judge == {"openai_api_key": "sk-test", "local_model": None} for judge in judges)
+    else:
+        assert all(judge["local_model"]["LOCAL_MODEL_NAME"] == "llama3.2" for judge in judges)
+        assert all(judge["local_model"]["LOCAL_MODEL_BASE_URL"] == "http://ollama:11434" for judge in judges)
+        assert all(judge["local_model"]["LOCAL_MODEL_API_KEY"] == "sk-test" for judge in judges)
@@ -1,5 +1,8 @@
+import asyncio
 import functools
+import re
 import time
+from pathlib import Path
 
 from loguru import logger
 
@@ -20,3 +23,62 @@ def timer(func):
         return value, elapsed_time
 
     return wrapper_timer
+
+
+def available_memory() -> int | None:
+    """Returns the memory available to the job in bytes, within its cgroup limit (e.g. in a container), if known."""
+    try:
+        meminfo = Path("/proc/meminfo").read_text()
+    except OSError:
+        return None
+    if (match := re.search(r"^MemAvailable:\s+(\d+) kB", meminfo, re.MULTILINE)) is None:
+        return None
+    available = int(match.group(1)) * 1024
+
+    cgroup = Path("/sys/fs/cgroup")
+    try:
+        limit = (cgroup / "memory.max").read_text().strip()
+        if limit != "max":
+            available = min(available, int(limit) - int((cgroup / "memory.current").read_text()))
+    except (OSError, ValueError):
+        pass
+    return max(available, 0)
+
+
+class AsyncTokenBucket:
+    """Token bucket limiting how many requests (or any other resource) are made per minute.
+
+    The bucket starts full and is continuously refilled at ``rate_per_minute / 60`` per second.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        """Args:
+        rate_per_minute: Maximum amount which can be acquired per minute, also the bucket capacity
+        """
+        if rate_per_minute <= 0:
+            raise ValueError(f"rate_per_minute must be positive, got {rate_per_minute}")
+        self.capacity = float(rate_per_minute)
+        self.refill_rate = self.capacity / 60
+        self.available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until ``amount`` is available, then take it from the bucket.
+
+        Args:
+            amount: The amount to take from the bucket
+        """
+        amount = min(amount, self.capacity)
+        # Callers are served in order, so a large request cannot be starved by smaller ones.
+        async with self._lock:
+            self._refill()
+            while self.available < amount:
+                await asyncio.sleep((amount - self.available) / self.refill_rate)
+                self._refill()
+            self.available -= amount
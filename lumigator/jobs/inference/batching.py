@@ -0,0 +1,130 @@
+"""Length-aware batching for HuggingFace models.
+
+HF pipelines pad every batch to its longest example, so batching examples of very different
+lengths together wastes most of the compute on padding (or runs out of memory, when a single long
+prompt forces a huge padded batch). ``LengthBucketBatchSampler`` sorts
+examples by token length (within windows of consecutive rows, so the job keeps streaming) and
+groups examples of similar length together, optionally capping the number of (padded) tokens in
+a batch instead of only its number of rows.
+
+Batches are then produced out of dataset order: ``inference.predict`` restores the original
+order before storing the results, which only requires buffering the results of a single window.
+"""
+
+from collections.abc import Callable, Iterator
+
+from loguru import logger
+from torch.utils.data import Sampler
+from transformers import PreTrainedTokenizerBase
+
+SORT_WINDOW_BATCHES = 50
+"""Number of batches (of ``batch_size`` rows) in each window of rows sorted by length."""
+
+TOKENIZE_BATCH_SIZE = 1_000
+"""Number of examples tokenized at a time when computing their length."""
+
+
+class LengthBucketBatchSampler(Sampler[list[int]]):
+    """Yields batches of dataset indices, grouping together examples of similar token length.
+
+    The dataset is split in windows of consecutive rows. Within each window, examples are sorted
+    by decreasing length (so any out-of-memory error happens as early as possible) and split in
+    batches holding up to ``batch_size`` rows and, if set, up to ``max_tokens_per_batch`` padded
+    tokens (i.e. the length of the longest example times the number of rows). A single example
+    longer than the token budget is still yielded, in a batch of its own.
+    """
+
+    def __init__(
+        self,
+        num_examples: int,
+        example_lengths: Callable[[list[int]], list[int]],
+        batch_size: int,
+        max_tokens_per_batch: int | None = None,
+        sort_window: int | None = None,
+    ):
+        """Create the sampler.
+
+        :param num_examples: The number of examples in the dataset.
+        :param example_lengths: Returns the token length of the examples at the given indices.
+        :param batch_size: The maximum number of examples in a batch.
+        :param max_tokens_per_batch: The maximum number of padded tokens in a batch, if any.
+        :param sort_window: The number of consecutive rows sorted together, by default
+            ``SORT_WINDOW_BATCHES`` batches.
+        """
+        self.num_examples = num_examples
+        self.example_lengths = example_lengths
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.sort_window = sort_window or SORT_WINDOW_BATCHES * batch_size
+
+    def __iter__(self) -> Iterator[list[int]]:
+        """Yield the batches of indices, window by window."""
+        for window_start in range(0, self.num_examples, self.sort_window):
+            indices = list(range(window_start, min(window_start + self.sort_window, self.num_examples)))
+            lengths = dict(zip(indices, self.example_lengths(indices), strict=True))
+            indices.sort(key=lambda index: lengths[index], reverse=True)
+
+            batch: list[int] = []
+            for index in indices:
+                # The longest example of a batch comes first, as examples are sorted by decreasing length.
+                if batch and (
+                    len(batch) == self.batch_size
+                    or (
+                        self.max_tokens_per_batch is not None
+                        and lengths[batch[0]] * (len(batch) + 1) > self.max_tokens_per_batch
+                    )
+                ):
+                    yield batch
+                    batch = []
+                batch.append(index)
+            if batch:
+                yield batch
+
+    def __len__(self) -> int:
+        """The number of batches, only known when batches are not limited by a token budget."""
+        if self.max_tokens_per_batch is not None:
+            # The number of batches depends on the length of the examples: a TypeError signals that
+            # the length is unknown (e.g. for progress bars) without computing all of them up front.
+            raise TypeError("The number of batches is unknown when batching by token budget")
+
+        full_windows, last_window = divmod(self.num_examples, self.sort_window)
+        return full_windows * -(-self.sort_window // self.batch_size) + -(-last_window // self.batch_size)
+
+
+def text_lengths(examples: list[str], tokenizer: PreTrainedTokenizerBase) -> list[int]:
+    """Compute the token length of text examples, as seen by the model.
+
+    Examples are truncated by the pipelines, so lengths are capped to the model's max length.
+
+    :param examples: The examples to compute the length of.
+    :param tokenizer: The tokenizer of the model.
+    :returns: The token length of each example.
+    """
+    lengths = []
+    for start in range(0, len(examples), TOKENIZE_BATCH_SIZE):
+        input_ids = tokenizer(examples[start : start + TOKENIZE_BATCH_SIZE])["input_ids"]
+        lengths.extend(len(ids) for ids in input_ids)
+
+    max_length = getattr(tokenizer, "model_max_length", None)
+    if isinstance(max_length, int):
+        lengths = [min(length, max_length) for length in lengths]
+    logger.debug(f"Computed token length of {len(lengths)} examples, max {max(lengths, default=0)}")
+    return lengths
+
+
+def chat_lengths(examples: list[list[dict[str, str]]], tokenizer: PreTrainedTokenizerBase) -> list[int]:
+    """Compute the token length of chat-format examples, as seen by the model.
+
+    Examples are formatted with the model's chat template, including the generation prompt, like
+    the text-generation pipeline does. Models without a chat template see the concatenated messages.
+
+    :param examples: The examples (lists of messages) to compute the length of.
+    :param tokenizer: The tokenizer of the model.
+    :returns: The token length of each example.
+    """
+    if getattr(tokenizer, "chat_template", None) is None:
+        return text_lengths(["\n".join(m["content"] or "" for m in messages) for messages in examples], tokenizer)
+
+    lengths = [len(tokenizer.apply_chat_template(messages, add_generation_prompt=True)) for messages in examples]
+    logger.debug(f"Computed token length of {len(lengths)} chat examples, max {max(lengths, default=0)}")
+    return lengths
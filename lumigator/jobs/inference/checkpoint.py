@@ -0,0 +1,197 @@
+"""Batch-level checkpointing for inference jobs.
+
+Prediction results are already stored in on-disk shards as batches complete (see ``shards.py``).
+A checkpoint records which shards (and therefore which rows) have been completed, both
+locally and, when results are stored on S3, under the job's results prefix. When a job with the
+same ID and configuration is started again, it restores its shards from the checkpoint and skips
+every row that was already predicted, instead of re-running (and re-paying for) all of them.
+
+Results are always written in dataset order, so the completed rows are the first ``num_rows``
+rows of the dataset.
+"""
+
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+import s3fs
+from inference_config import InferenceJobConfig
+from loguru import logger
+from pydantic import BaseModel, ConfigDict, ValidationError
+from shards import PredictionShardWriter, ShardState
+
+CHECKPOINT_FILENAME = "checkpoint.json"
+
+
+class CheckpointState(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    config_hash: str
+    shards: list[ShardState] = []
+    uploaded_shards: list[str] = []  # names of the shards already uploaded to the remote checkpoint
+
+
+def config_fingerprint(config: InferenceJobConfig) -> str:
+    """Compute a fingerprint of everything in the job configuration that affects predictions.
+
+    Fields which only affect how the job runs (e.g. progress bars or where results are stored) are
+    left out, so they can be changed when re-submitting a job without invalidating its checkpoint.
+
+    :param config: The inference job configuration.
+    :returns: The hex digest identifying the configuration.
+    """
+    payload = config.model_dump(
+        exclude={
+            "job": {
+                "enable_tqdm",
+                "storage_path",
+                "prediction_cache",
+                "prediction_cache_uri",
+                "model_cache_max_size",
+                "model_pool",
+            }
+        }
+    )
+    # Some fields are excluded from serialization, but do change the predictions.
+    payload["system_prompt"] = config.system_prompt
+    serialized = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+class InferenceCheckpoint:
+    """Saves and restores the progress of an inference job.
+
+    The local checkpoint is updated after every batch. Remotely, shards are only uploaded once
+    they are closed (i.e. they will not change anymore), together with a checkpoint that only
+    references uploaded shards.
+    """
+
+    def __init__(
+        self,
+        local_dir: Path,
+        config_hash: str,
+        rows_per_shard: int,
+        remote_dir: str | None = None,
+    ):
+        """Create a checkpoint for an inference job.
+
+        :param local_dir: The local directory the job's shards (and checkpoint) are stored in.
+        :param config_hash: The fingerprint of the job configuration, see ``config_fingerprint``.
+        :param rows_per_shard: The (approximate) maximum number of results stored in a single shard.
+        :param remote_dir: The S3 URI of the directory the checkpoint is uploaded to, if any.
+        """
+        self.local_dir = local_dir
+        self.config_hash = config_hash
+        self.rows_per_shard = rows_per_shard
+        self.remote_dir = remote_dir.rstrip("/") if remote_dir else None
+        self._uploaded_shards: set[str] = set()
+        self._s3 = s3fs.S3FileSystem() if self.remote_dir else None
+
+    @property
+    def local_path(self) -> Path:
+        return self.local_dir / CHECKPOINT_FILENAME
+
+    def restore_writer(self) -> PredictionShardWriter:
+        """Create the shard writer for the job, restoring previously completed batches if possible.
+
+        :returns: A shard writer, holding the results of any batch completed by a previous run.
+        """
+        state = self._load_local() or self._download_remote()
+        if state is not None and state.config_hash != self.config_hash:
+            logger.warning("Found a checkpoint for this job, but with a different configuration. Ignoring it.")
+            state = None
+
+        if state is not None:
+            try:
+                writer = PredictionShardWriter.restore(self.local_dir, state.shards, self.rows_per_shard)
+                # Shards uploaded by a previous run are closed, so there is no need to upload them again.
+                self._uploaded_shards.update({shard.name for shard in state.shards} & set(state.uploaded_shards))
+                logger.info(
+                    f"Resuming from checkpoint: {writer.num_batches} batches ({writer.num_rows} rows) already completed"
+                )
+                return writer
+            except OSError as e:
+                logger.warning(f"Unable to restore the shards referenced by the checkpoint, ignoring it: {e}")
+
+        shutil.rmtree(self.local_dir, ignore_errors=True)
+        self._uploaded_shards.clear()
+        return PredictionShardWriter(self.local_dir, self.rows_per_shard)
+
+    def save(self, writer: PredictionShardWriter) -> None:
+        """Checkpoint the progress of the given writer.
+
+        :param writer: The writer whose progress should be recorded.
+        """
+        self._save_local(writer)
+        if self.remote_dir is not None and self._upload(writer):
+            # Record the newly uploaded shards, so a resumed run does not upload them again.
+            self._save_local(writer)
+
+    def remove(self) -> None:
+        """Delete the local and remote checkpoint, along with all the shards."""
+        shutil.rmtree(self.local_dir, ignore_errors=True)
+        if self.remote_dir is not None and self._s3.exists(self.remote_dir):
+            logger.info(f"Removing checkpoint from {self.remote_dir}")
+            self._s3.rm(self.remote_dir, recursive=True)
+
+    def _save_local(self, writer: PredictionShardWriter) -> None:
+        state = CheckpointState(
+            config_hash=self.config_hash, shards=writer.shards, uploaded_shards=sorted(self._uploaded_shards)
+        )
+        tmp_path = self.local_path.with_suffix(".tmp")
+        tmp_path.write_text(state.model_dump_json())
+        # Atomically replace the checkpoint, so a crash never leaves a half-written file behind.
+        tmp_path.replace(self.local_path)
+
+    def _upload(self, writer: PredictionShardWriter) -> bool:
+        """Upload the closed shards not uploaded yet, returning whether any shard was uploaded."""
+        closed_shards = writer.closed_shards
+        new_shards = [shard for shard in closed_shards if shard.name not in self._uploaded_shards]
+        if not new_shards:
+            return False
+
+        for shard in new_shards:
+            logger.info(f"Uploading shard {shard.name} to {self.remote_dir}")
+            self._s3.put_file(self.local_dir / shard.name, f"{self.remote_dir}/{shard.name}")
+            self._uploaded_shards.add(shard.name)
+
+        state = CheckpointState(
+            config_hash=self.config_hash,
+            shards=closed_shards,
+            uploaded_shards=[shard.name for shard in closed_shards],
+        )
+        self._s3.pipe_file(f"{self.remote_dir}/{CHECKPOINT_FILENAME}", state.model_dump_json().encode())
+        return True
+
+    def _load_local(self) -> CheckpointState | None:
+        if not self.local_path.exists():
+            return None
+        try:
+            return CheckpointState.model_validate_json(self.local_path.read_text())
+        except ValidationError as e:
+            logger.warning(f"Ignoring invalid local checkpoint {self.local_path}: {e}")
+            return None
+
+    def _download_remote(self) -> CheckpointState | None:
+        if self.remote_dir is None:
+            return None
+
+        remote_path = f"{self.remote_dir}/{CHECKPOINT_FILENAME}"
+        if not self._s3.exists(remote_path):
+            return None
+
+        try:
+            state = CheckpointState.model_validate_json(self._s3.cat_file(remote_path))
+        except ValidationError as e:
+            logger.warning(f"Ignoring invalid remote checkpoint {remote_path}: {e}")
+            return None
+
+        if state.config_hash != self.config_hash:
+            return state
+
+        logger.info(f"Downloading checkpoint from {self.remote_dir}")
+        self.local_dir.mkdir(parents=True, exist_ok=True)
+        for shard in state.shards:
+            self._s3.get_file(f"{self.remote_dir}/{shard.name}", self.local_dir / shard.name)
+            self._uploaded_shards.add(shard.name)
+        return state
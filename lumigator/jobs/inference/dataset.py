@@ -1,13 +1,30 @@
+from batching import LengthBucketBatchSampler, chat_lengths, text_lengths
 from datasets import Dataset
 from inference_config import InferenceJobConfig
+from loguru import logger
 from model_clients.huggingface_clients import is_encoder_decoder
-from torch.utils.data import DataLoader
+from torch.utils.data import BatchSampler, DataLoader, SequentialSampler
 from torch.utils.data import Dataset as TorchDataset
+from transformers import PreTrainedTokenizerBase
 
 from schemas import TaskType
 
 
-def create_dataloader(dataset: Dataset, config: InferenceJobConfig):
+def create_dataloader(
+    dataset: Dataset, config: InferenceJobConfig, tokenizer: PreTrainedTokenizerBase | None = None
+) -> DataLoader:
+    """Create the dataloader providing batches of examples to the model client.
+
+    Every batch is a dict holding the ``examples`` and their ``indices`` in the dataset, as
+    batches are not necessarily in dataset order (see ``JobConfig.length_batching``). Examples are
+    read from the (memory-mapped) dataset one batch at a time, so only the rows of the batches
+    being predicted are ever loaded in memory.
+
+    :param dataset: The dataset to run inference on.
+    :param config: The inference job configuration.
+    :param tokenizer: The tokenizer of the model, used to batch examples by token length.
+    :returns: The dataloader.
+    """
     batch_size = config.job.batch_size
     use_chat_format_dataset = False
 
@@ -24,35 +41,126 @@ def create_dataloader(dataset: Dataset, config: InferenceJobConfig):
 
     if use_chat_format_dataset:
         torch_dataset = ChatFormatDataset(dataset, config)
-        return DataLoader(
-            torch_dataset, batch_size=batch_size, shuffle=False, collate_fn=lambda batch: {"examples": batch}
-        )
     else:
-        torch_dataset = dataset.with_format("torch")
-        return DataLoader(torch_dataset, batch_size, shuffle=False)
+        torch_dataset = TextDataset(dataset)
 
+    batch_sampler = BatchSampler(SequentialSampler(torch_dataset), batch_size, drop_last=False)
+    if config.job.length_batching:
+        if config.hf_pipeline is None or tokenizer is None:
+            logger.warning("Batching by token length is only supported for HuggingFace models, ignoring it")
+        else:
+            # Chat-format examples are measured with the model's chat template, like the pipeline formats them.
+            lengths = chat_lengths if use_chat_format_dataset else text_lengths
+            logger.info(f"Batching examples by token length, token budget per batch: {config.job.max_tokens_per_batch}")
+            batch_sampler = LengthBucketBatchSampler(
+                len(torch_dataset),
+                lambda indices: lengths(torch_dataset.__getitems__(indices), tokenizer),
+                batch_size=batch_size,
+                max_tokens_per_batch=config.job.max_tokens_per_batch,
+            )
 
-class ChatFormatDataset(TorchDataset):
-    def __init__(self, dataset: Dataset, config: InferenceJobConfig):
-        """Convert Hugging Face dataset to PyTorch Dataset with chat format.
+    return DataLoader(IndexedDataset(torch_dataset), batch_sampler=batch_sampler, collate_fn=collate_indexed)
+
+
+def collate_indexed(items: list[tuple[int, object]]) -> dict[str, list]:
+    """Collate ``(index, example)`` pairs into a batch of examples and their dataset indices."""
+    return {"indices": [index for index, _ in items], "examples": [example for _, example in items]}
+
+
+class IndexedDataset(TorchDataset):
+    def __init__(self, dataset: TorchDataset):
+        """Wrap a PyTorch Dataset so that every item also holds its index.
+
+        Args:
+            dataset (torch.utils.data.Dataset): The dataset to wrap
+        """
+        self.dataset = dataset
+
+    def __len__(self):
+        """Return the total number of examples."""
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        """Retrieve a single example along with its index
+
+        Args:
+            idx (int): Index of the sample
+
+        Returns:
+            tuple: The index and the example
+        """
+        return idx, self.dataset[idx]
+
+    def __getitems__(self, indices: list[int]) -> list[tuple]:
+        """Retrieve a batch of examples along with their indices, reading them all at once
+
+        Args:
+            indices (list[int]): Indices of the samples
+
+        Returns:
+            list: The index and the example of each sample
+        """
+        return list(zip(indices, self.dataset.__getitems__(indices), strict=True))
+
+
+class TextDataset(TorchDataset):
+    def __init__(self, dataset: Dataset):
+        """Convert Hugging Face dataset to PyTorch Dataset of raw text examples.
 
         Args:
             dataset (datasets.Dataset): Input Hugging Face dataset
         """
-        self.examples = dataset["examples"]
-        self.system_prompt = config.system_prompt
+        self.dataset = dataset.select_columns(["examples"])
 
     def __len__(self):
         """Return the total number of examples."""
-        return len(self.examples)
+        return len(self.dataset)
 
     def __getitem__(self, idx):
-        """Retrieve a single sample and its ground truth
+        """Retrieve a single example
 
         Args:
             idx (int): Index of the sample
 
         Returns:
-            list: OpenAI compatible request
+            str: The example
+        """
+        return self.__getitems__([idx])[0]
+
+    def __getitems__(self, indices: list[int]) -> list:
+        """Retrieve a batch of examples, reading them from the dataset at once
+
+        Used by the DataLoader to fetch whole batches, instead of one row at a time.
+
+        Args:
+            indices (list[int]): Indices of the samples
+
+        Returns:
+            list: The examples
+        """
+        return self.dataset[indices]["examples"]
+
+
+class ChatFormatDataset(TextDataset):
+    def __init__(self, dataset: Dataset, config: InferenceJobConfig):
+        """Convert Hugging Face dataset to PyTorch Dataset with chat format.
+
+        Args:
+            dataset (datasets.Dataset): Input Hugging Face dataset
+        """
+        super().__init__(dataset)
+        self.system_prompt = config.system_prompt
+
+    def __getitems__(self, indices: list[int]) -> list:
+        """Retrieve a batch of samples, reading them from the dataset at once
+
+        Args:
+            indices (list[int]): Indices of the samples
+
+        Returns:
+            list: OpenAI compatible requests
         """
-        return [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": self.examples[idx]}]
+        return [
+            [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": example}]
+            for example in super().__getitems__(indices)
+        ]
@@ -7,10 +7,12 @@ from inference.schemas import (
     InferenceJobConfig,
     InferenceServerConfig,
     JobConfig,
+    ModelPoolConfig,
 )
 from lumigator_schemas.jobs import JobCreate, JobType
 
 from backend.services.job_interface import JobDefinition
+from backend.settings import settings
 
 # Served models
 OAI_API_URL: str = "https://api.openai.com/v1"
@@ -29,6 +31,14 @@ class JobDefinitionInference(JobDefinition):
                 storage_path=storage_path,
                 # TODO Should be unnecessary, check
                 output_field=request.job_config.output_field or "predictions",
+                allow_failed_predictions=request.job_config.allow_failed_predictions,
+                prediction_cache=request.job_config.prediction_cache,
+                prediction_cache_uri=f"s3://{settings.S3_BUCKET}/{settings.S3_PREDICTION_CACHE_PREFIX}"
+                if request.job_config.prediction_cache
+                else None,
+                length_bucketing=request.job_config.length_bucketing,
+                max_tokens_per_batch=request.job_config.max_tokens_per_batch,
+                model_cache_max_size=settings.MODEL_CACHE_MAX_SIZE,
             ),
             task_definition=request.job_config.task_definition,
             system_prompt=request.job_config.system_prompt,
@@ -44,6 +54,11 @@ class JobDefinitionInference(JobDefinition):
                 trust_remote_code=request.job_config.trust_remote_code,
                 torch_dtype=request.job_config.torch_dtype,
             )
+            if request.job_config.model_pool:
+                # The model server reserves the GPUs, instead of the job itself
+                job_config.job.model_pool = ModelPoolConfig(
+                    idle_timeout=settings.MODEL_POOL_IDLE_TIMEOUT, num_gpus=settings.RAY_WORKER_GPUS
+                )
         else:
             # It will be a pass through to LiteLLM
             job_config.inference_server = InferenceServerConfig(
@@ -51,6 +66,9 @@ class JobDefinitionInference(JobDefinition):
                 model=request.job_config.model,
                 provider=request.job_config.provider,
                 max_retries=3,
+                max_concurrent_requests=request.job_config.max_concurrent_requests,
+                requests_per_minute=request.job_config.requests_per_minute,
+                tokens_per_minute=request.job_config.tokens_per_minute,
             )
         job_config.generation_config = request.job_config.generation_config
         return job_config
@@ -3,17 +3,29 @@
 import argparse
 import os
 import re
+from collections import deque
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 from uuid import UUID
 
 import s3fs
+from checkpoint import InferenceCheckpoint, config_fingerprint
 from dataset import create_dataloader
 from datasets import load_from_disk
 from inference_config import InferenceJobConfig
 from loguru import logger
+from model_cache import update_model_cache
 from model_clients.base_client import BaseModelClient
-from model_clients.external_api_clients import LiteLLMModelClient
+from model_clients.external_api_clients import AsyncLiteLLMModelClient
 from model_clients.huggingface_clients import HuggingFaceModelClientFactory
+from model_pool import PooledModelClient
+from prediction_cache import (
+    PREDICTION_CACHE_FILENAME,
+    CachingModelClient,
+    PredictionCache,
+    prediction_cache_namespace,
+)
+from shards import PredictionShardWriter, StreamingJobOutput
 from torch.utils.data import DataLoader
 from tqdm import tqdm
 from utils import timer
@@ -24,23 +36,71 @@ SAFE_JOB_NAME_REGEX = re.compile(r"[^\w\-_.]")
 
 JOB_NAME_REPLACEMENT_CHAR = "-"
 
+AVERAGE_METRICS_FIELDS = ("prompt_tokens", "total_tokens", "completion_tokens", "reasoning_tokens", "answer_tokens")
+"""The ``InferenceMetrics`` fields averaged into ``AverageInferenceMetrics``."""
 
-@timer
-def predict(dataloader: DataLoader, model_client: BaseModelClient) -> list[PredictionResult]:
-    predictions = []
-
-    for batch in dataloader:
-        examples = batch["examples"]
-        predictions.extend(model_client.predict(examples))
-
-    return predictions
 
-
-def save_to_disk(local_path: Path, data: JobOutput):
+@timer
+def predict(
+    dataloader: DataLoader,
+    model_client: BaseModelClient,
+    shards: PredictionShardWriter,
+    checkpoint: InferenceCheckpoint | None = None,
+) -> int:
+    """Run the model on every batch, appending results to the shards (in dataset order) as soon as possible.
+
+    Batches may not be in dataset order (e.g. when batching by token length): results are then
+    buffered until all the rows preceding them are predicted. Rows already stored in the shards
+    (i.e. restored from a checkpoint) are skipped.
+
+    :param dataloader: The dataloader providing the batches of examples, along with their indices.
+    :param model_client: The model client used to generate predictions.
+    :param shards: The shard writer the prediction results are appended to.
+    :param checkpoint: The checkpoint recording completed rows, if checkpointing is enabled.
+    :returns: The total number of predictions generated.
+    """
+    completed_rows = shards.num_rows
+    pending_indices: deque[list[int]] = deque()
+
+    def remaining_examples() -> Iterator[list]:
+        for batch in dataloader:
+            remaining = [i for i, index in enumerate(batch["indices"]) if index >= completed_rows]
+            if not remaining:
+                continue
+            pending_indices.append([batch["indices"][i] for i in remaining])
+            yield [batch["examples"][i] for i in remaining]
+
+    buffered_results: dict[int, PredictionResult] = {}
+    next_row = completed_rows
+    # Clients may predict several batches concurrently, but always return their results in order.
+    for prediction_results in model_client.predict_batches(remaining_examples()):
+        buffered_results.update(zip(pending_indices.popleft(), prediction_results, strict=True))
+
+        ready_results = []
+        while next_row in buffered_results:
+            ready_results.append(buffered_results.pop(next_row))
+            next_row += 1
+        if not ready_results:
+            continue
+
+        shards.write_batch(ready_results)
+        if checkpoint is not None:
+            checkpoint.save(shards)
+
+    if buffered_results:
+        raise RuntimeError(f"Missing predictions for row {next_row}, {len(buffered_results)} results left unsaved")
+
+    shards.close()
+    if checkpoint is not None:
+        checkpoint.save(shards)
+    return shards.num_rows
+
+
+def save_to_disk(local_path: Path, data: StreamingJobOutput):
     logger.info(f"Storing inference results to {local_path}...")
     local_path.parent.mkdir(exist_ok=True, parents=True)
     with local_path.open("w") as f:
-        f.write(data.model_dump_json())
+        data.write_json(f)
 
 
 def save_to_s3(job_id: UUID, job_name: str, local_path: Path, storage_path: str):
@@ -54,7 +114,32 @@ def save_to_s3(job_id: UUID, job_name: str, local_path: Path, storage_path: str)
     s3.put_file(local_path, storage_path)
 
 
-def save_outputs(storage_path: str, job_id: UUID, job_name: str, results: JobOutput) -> str | None:
+def local_shards_dir(job_id: UUID, job_name: str) -> Path:
+    """Returns the local directory where prediction results are sharded while the job runs."""
+    return Path(Path.home() / ".lumigator" / "shards" / sanitize_job_name(job_name) / str(job_id))
+
+
+def local_prediction_cache_path() -> Path:
+    """Returns the path of the prediction cache, shared by all the jobs running on the node."""
+    return Path(Path.home() / ".lumigator" / "cache" / PREDICTION_CACHE_FILENAME)
+
+
+def checkpoint_storage_path(storage_path: str | None, job_id: UUID, job_name: str) -> str | None:
+    """Returns the S3 URI of the directory holding the job's checkpoint, next to its results.
+
+    :returns: The checkpoint URI, or None if the job results are not stored on S3.
+    """
+    if not storage_path or not storage_path.startswith("s3://"):
+        return None
+
+    if storage_path.endswith("/"):
+        safe_name = sanitize_job_name(job_name)
+        return f"{storage_path.rstrip('/')}/{safe_name}/{job_id}/checkpoint"
+
+    return f"{storage_path.rsplit('/', 1)[0]}/checkpoint"
+
+
+def save_outputs(storage_path: str, job_id: UUID, job_name: str, results: StreamingJobOutput) -> str | None:
     # Sanitize name to be S3-safe.
     safe_name = sanitize_job_name(job_name)
 
@@ -80,10 +165,10 @@ def save_outputs(storage_path: str, job_id: UUID, job_name: str, results: JobOut
 
 
 def run_inference(config: InferenceJobConfig, job_id: UUID, api_key: str | None = None) -> str | None:
-    # Load dataset given its URI
+    # Load dataset given its URI (memory-mapped: rows are only read when batches and results need them)
     dataset = load_from_disk(config.dataset.path)
 
-    # Limit dataset length if max_samples is specified
+    # Limit dataset length if max_samples is specified (selecting contiguous rows just slices the Arrow table)
     max_samples = config.job.max_samples
     if max_samples is not None and max_samples > 0:
         if max_samples > len(dataset):
@@ -91,87 +176,130 @@ def run_inference(config: InferenceJobConfig, job_id: UUID, api_key: str | None
             max_samples = len(dataset)
         dataset = dataset.select(range(max_samples))
 
-    # Create a torch DataLoader to manage the data in batches
-    torch_dataloader = create_dataloader(dataset, config)
-
-    # Enable / disable tqdm
-    dataloader_iterable = tqdm(torch_dataloader, unit="batch") if config.job.enable_tqdm else torch_dataloader
-
     # Choose which model client to use
     if config.inference_server is not None:
         # a model *inference service* is passed
         output_model_name = config.inference_server.model
-        model_client = LiteLLMModelClient(config, api_key)
+        model_client = AsyncLiteLLMModelClient(config, api_key)
+    elif config.hf_pipeline and config.job.model_pool:
+        # The model is loaded (once, for all the jobs using it) by a long-lived model server.
+        logger.info(f"Using pooled HuggingFace model server with model {config.hf_pipeline.model_name_or_path}.")
+        model_client = PooledModelClient(config, api_key)
+        output_model_name = config.hf_pipeline.model_name_or_path
     elif config.hf_pipeline:
         logger.info(f"Using HuggingFace client with model {config.hf_pipeline.model_name_or_path}.")
         model_client = HuggingFaceModelClientFactory.create(config, api_key)
         output_model_name = config.hf_pipeline.model_name_or_path
+        # The model is now in the worker's model cache: make room for the next ones, evicting other models.
+        update_model_cache(config)
     else:
         raise NotImplementedError("Inference pipeline not supported.")
 
-    prediction_results: list[PredictionResult]
-    inference_time: float
-    prediction_results, inference_time = predict(dataloader_iterable, model_client)
-
-    # We keep any columns that were already there (not just the original input
-    # samples, but also past predictions under another column name)
-    output = dataset.to_dict()
+    # Create a torch DataLoader to manage the data in batches
+    tokenizer = None
+    if config.hf_pipeline and config.job.length_batching:
+        pooled = isinstance(model_client, PooledModelClient)
+        tokenizer = model_client.tokenizer if pooled else model_client.pipeline.tokenizer
+    torch_dataloader = create_dataloader(dataset, config, tokenizer)
 
-    # We are trusting the user: if the dataset already had a column with the output_field
-    # they selected, we overwrite it with the values from our inference.
-    if config.job.output_field in dataset.column_names:
-        logger.warning(f"Overwriting {config.job.output_field}")
+    # Enable / disable tqdm
+    dataloader_iterable = tqdm(torch_dataloader, unit="batch") if config.job.enable_tqdm else torch_dataloader
 
-    # NOTE: Are we certain that a dataset wouldn't have fields other than the output_field?
-    # If it can then we are potentially overwriting other fields too.
-    output[config.job.output_field] = [p.prediction for p in prediction_results]
-    output["reasoning"] = [p.reasoning for p in prediction_results]
-    output["inference_metrics"] = [p.metrics for p in prediction_results]
-    output["model"] = output_model_name
-    output["inference_time"] = inference_time
+    # Rows already predicted by a previous job with the same model, prompt and generation parameters are
+    # served from the prediction cache (if enabled), only cache misses are sent to the model client.
+    prediction_cache = None
+    if config.job.prediction_cache:
+        prediction_cache = PredictionCache(local_prediction_cache_path(), config.job.prediction_cache_uri)
+        prediction_cache.pull()
+        model_client = CachingModelClient(model_client, prediction_cache, prediction_cache_namespace(config))
+
+    # Prediction results are appended to on-disk shards batch by batch, so memory usage does not
+    # grow with the dataset size. When checkpointing, batches completed by a previous run of the
+    # same job are restored from the checkpoint instead of being predicted again.
+    shards_dir = local_shards_dir(job_id, config.name)
+    checkpoint = None
+    if config.job.checkpoint:
+        checkpoint = InferenceCheckpoint(
+            local_dir=shards_dir,
+            config_hash=config_fingerprint(config),
+            rows_per_shard=config.job.rows_per_shard,
+            remote_dir=checkpoint_storage_path(config.job.storage_path, job_id, config.name),
+        )
+        shards = checkpoint.restore_writer()
+    else:
+        shards = PredictionShardWriter(shards_dir, config.job.rows_per_shard)
 
-    artifacts = InferenceJobOutput.model_validate(output)
-    metrics = _calculate_average_metrics(prediction_results)
-    results = JobOutput(artifacts=artifacts, parameters=config, metrics=metrics)
+    inference_time: float
+    try:
+        _, inference_time = predict(dataloader_iterable, model_client, shards, checkpoint)
+    finally:
+        model_client.close()
+        # Share whatever was predicted, even if the job failed.
+        if prediction_cache is not None:
+            prediction_cache.push()
+            prediction_cache.close()
+    if shards.num_errors:
+        logger.warning(f"{shards.num_errors}/{shards.num_rows} predictions failed, storing them as null predictions")
+
+    # The (potentially large) artifact columns are streamed from the shards and the dataset
+    # when the results are written, everything else is stored in the job output as usual.
+    artifacts = InferenceJobOutput(examples=[], model=output_model_name, inference_time=inference_time)
+    metrics = _calculate_average_metrics(shards.iter_results())
+    if prediction_cache is not None:
+        cache_metrics = model_client.metrics
+        logger.info(f"Prediction cache hit rate: {cache_metrics.hit_rate:.2%} ({cache_metrics.hits} hits)")
+        if metrics is None:
+            metrics = {"prediction_cache": cache_metrics.model_dump()}
+        else:
+            metrics.prediction_cache = cache_metrics
+    results = StreamingJobOutput(
+        job_output=JobOutput(artifacts=artifacts, parameters=config, metrics=metrics),
+        shards=shards,
+        dataset=dataset,
+        output_field=config.job.output_field,
+    )
 
     output_path = save_outputs(config.job.storage_path, job_id, config.name, results)
+    if output_path is not None:
+        if checkpoint is not None:
+            checkpoint.remove()
+        shards.cleanup()
     return output_path
 
 
-def _calculate_average_metrics(prediction_results: list[PredictionResult]) -> AverageInferenceMetrics | None:
-    """Calculate the average metrics from a list of prediction results.
+def _calculate_average_metrics(prediction_results: Iterable[PredictionResult]) -> AverageInferenceMetrics | None:
+    """Calculate the average metrics from prediction results.
+
+    The prediction results are consumed in a single pass, so they can be streamed (e.g. from disk).
+    Failed predictions (see ``JobConfig.allow_failed_predictions``) are left out of the averages.
 
-    :param prediction_results: List of prediction results to calculate the average metrics from.
+    :param prediction_results: Prediction results to calculate the average metrics from.
     :returns: ``AverageInferenceMetrics`` object containing the average metrics,
                 or None if the prediction results don't contain any metrics.
     :raises ValueError: If some prediction results have metrics and some don't.
     """
-    if not prediction_results:
-        return None
-
-    all_metrics_present = all(p.metrics for p in prediction_results)
-
-    if any(p.metrics for p in prediction_results) != all_metrics_present:
+    total_results = 0
+    results_with_metrics = 0
+    totals = dict.fromkeys(AVERAGE_METRICS_FIELDS, 0)
+
+    for p in prediction_results:
+        if p.error is not None:
+            continue
+        total_results += 1
+        if not p.metrics:
+            continue
+        results_with_metrics += 1
+        for field in AVERAGE_METRICS_FIELDS:
+            totals[field] += getattr(p.metrics, field)
+
+    if results_with_metrics and results_with_metrics != total_results:
         raise ValueError("Prediction result 'metrics' must be present in ALL results or NONE, but not in SOME.")
 
-    # Only attempt to metric calculate averages if we have a metric for EVERY prediction result.
-    if all_metrics_present:
-        total_results = len(prediction_results)
-        avg_prompt_tokens = sum(p.metrics.prompt_tokens for p in prediction_results) / total_results
-        avg_total_tokens = sum(p.metrics.total_tokens for p in prediction_results) / total_results
-        avg_completion_tokens = sum(p.metrics.completion_tokens for p in prediction_results) / total_results
-        avg_reasoning_tokens = sum(p.metrics.reasoning_tokens for p in prediction_results) / total_results
-        avg_answer_tokens = sum(p.metrics.answer_tokens for p in prediction_results) / total_results
-
-        return AverageInferenceMetrics(
-            avg_prompt_tokens=avg_prompt_tokens,
-            avg_total_tokens=avg_total_tokens,
-            avg_completion_tokens=avg_completion_tokens,
-            avg_reasoning_tokens=avg_reasoning_tokens,
-            avg_answer_tokens=avg_answer_tokens,
-        )
+    # Only attempt to calculate averages if we have a metric for EVERY prediction result.
+    if not results_with_metrics:
+        return None
 
-    return None
+    return AverageInferenceMetrics(**{f"avg_{field}": total / total_results for field, total in totals.items()})
 
 
 def sanitize_job_name(job_name: str) -> str:
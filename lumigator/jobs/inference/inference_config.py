@@ -71,6 +71,11 @@ class JobConfig(BaseJobConfig):
     max_samples: int = -1  # set to all samples by default
     output_field: str = "predictions"
 
+    @property
+    def length_batching(self) -> bool:
+        """Whether examples are batched by token length (and therefore not in dataset order)."""
+        return self.length_bucketing or self.max_tokens_per_batch is not None
+
 
 class InferenceServerConfig(BaseInferenceServerConfig):
     max_retries: int = 3
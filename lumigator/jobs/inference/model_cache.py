@@ -0,0 +1,116 @@
+"""Memoized model configuration lookups and size-based eviction of the local model cache.
+
+Ray workers keep the models they download in the HuggingFace cache (``HF_HOME``, mounted on a
+persistent volume shared by the jobs running on the node), so a repeat job on the same model
+loads it from disk instead of downloading it again. As models are large, the cache can be capped:
+once a model is loaded, the least recently used models are evicted until the cache fits again.
+"""
+
+import os
+import time
+from collections.abc import Collection
+from functools import lru_cache
+from pathlib import Path
+
+from huggingface_hub import CacheNotFound, scan_cache_dir
+from huggingface_hub.constants import HF_HUB_CACHE
+from inference_config import InferenceJobConfig
+from loguru import logger
+from transformers import AutoConfig, PretrainedConfig
+
+MIN_EVICTION_AGE = 3600
+"""Models used in the last hour (in seconds) are never evicted, as other jobs may still be loading them."""
+
+
+@lru_cache(maxsize=32)
+def load_model_config(model_name_or_path: str) -> PretrainedConfig:
+    """Load the configuration of a model, only looking it up once per process.
+
+    :param model_name_or_path: The name of the model on the HuggingFace Hub, or its local path.
+    :returns: The model configuration.
+    """
+    return AutoConfig.from_pretrained(model_name_or_path)
+
+
+def _model_repo_dir(model_name_or_path: str, cache_dir: Path) -> Path:
+    return cache_dir / f"models--{model_name_or_path.replace('/', '--')}"
+
+
+def mark_model_used(model_name_or_path: str, cache_dir: Path | None = None) -> None:
+    """Record that a model was just used, so it is the last one to be evicted from the cache.
+
+    The cache tracks when models were last used through the access time of their files, which
+    file systems mounted with ``noatime``/``relatime`` don't reliably update on reads.
+
+    :param model_name_or_path: The name of the model on the HuggingFace Hub (local paths are ignored).
+    :param cache_dir: The HuggingFace cache directory, ``HF_HUB_CACHE`` by default.
+    """
+    blobs_dir = _model_repo_dir(model_name_or_path, Path(cache_dir or HF_HUB_CACHE)) / "blobs"
+    if not blobs_dir.is_dir():
+        return
+
+    now = time.time()
+    for blob in blobs_dir.iterdir():
+        try:
+            os.utime(blob, times=(now, blob.stat().st_mtime))
+        except OSError as e:
+            logger.debug(f"Unable to update the access time of {blob}: {e}")
+
+
+def update_model_cache(config: InferenceJobConfig) -> None:
+    """Mark the job's model as used once loaded, evicting other models if the cache is capped.
+
+    :param config: The inference job configuration, using a HuggingFace model.
+    """
+    model_name = config.hf_pipeline.model_name_or_path
+    mark_model_used(model_name)
+    if config.job.model_cache_max_size is not None:
+        evict_model_cache(config.job.model_cache_max_size, keep={model_name})
+
+
+def evict_model_cache(max_size: int, keep: Collection[str] = (), cache_dir: Path | None = None) -> int:
+    """Evict the least recently used models from the cache until it holds at most ``max_size`` bytes.
+
+    Failing to scan or clean the cache is not an error: the cache will just be bigger than expected.
+
+    :param max_size: The max size of the cache, in bytes.
+    :param keep: The names of models which must not be evicted (e.g. the model used by the job).
+    :param cache_dir: The HuggingFace cache directory, ``HF_HUB_CACHE`` by default.
+    :returns: The number of bytes freed.
+    """
+    try:
+        cache_info = scan_cache_dir(cache_dir)
+    except (CacheNotFound, OSError) as e:
+        logger.warning(f"Unable to scan the model cache: {e}")
+        return 0
+
+    size = cache_info.size_on_disk
+    if size <= max_size:
+        logger.info(f"Model cache holds {size} bytes, below its max size of {max_size} bytes")
+        return 0
+
+    min_last_accessed = time.time() - MIN_EVICTION_AGE
+    evictable = sorted(
+        (repo for repo in cache_info.repos if repo.repo_id not in keep and repo.last_accessed < min_last_accessed),
+        key=lambda repo: repo.last_accessed,
+    )
+    evicted = []
+    for repo in evictable:
+        if size <= max_size:
+            break
+        evicted.append(repo)
+        size -= repo.size_on_disk
+    if not evicted:
+        logger.warning(f"Model cache holds {size} bytes, above its max size of {max_size} bytes, but nothing to evict")
+        return 0
+
+    strategy = cache_info.delete_revisions(*(revision.commit_hash for repo in evicted for revision in repo.revisions))
+    logger.info(
+        f"Evicting {[repo.repo_id for repo in evicted]} from the model cache ({strategy.expected_freed_size} bytes)"
+    )
+    try:
+        strategy.execute()
+    except OSError as e:
+        logger.warning(f"Unable to evict models from the cache: {e}")
+        return 0
+    return strategy.expected_freed_size
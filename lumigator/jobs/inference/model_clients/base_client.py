@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
 
 from inference_config import InferenceJobConfig
 
@@ -21,3 +22,16 @@ class BaseModelClient(ABC):
     def predict(self, examples: str | list[list[dict[str, str]]]) -> list[PredictionResult]:
         """Given a set of examples, return a set of predictions."""
         pass
+
+    def predict_batches(self, batches: Iterable[str | list[list[dict[str, str]]]]) -> Iterator[list[PredictionResult]]:
+        """Given an iterable of batches of examples, yield the predictions for each batch, in order.
+
+        By default batches are predicted one after the other; clients able to process several
+        batches concurrently (e.g. remote APIs) can override this to keep more requests in flight.
+        """
+        for examples in batches:
+            yield self.predict(examples) if len(examples) else []
+
+    def close(self) -> None:  # noqa: B027
+        """Release the resources (e.g. background event loops or connections) held by the client."""
+        pass
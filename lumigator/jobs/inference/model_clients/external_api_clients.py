@@ -1,12 +1,55 @@
+import asyncio
+import threading
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
 from inference_config import InferenceJobConfig
-from litellm import batch_completion
+from litellm import acompletion, batch_completion
+from litellm.exceptions import (
+    APIConnectionError,
+    APIError,
+    InternalServerError,
+    RateLimitError,
+    ServiceUnavailableError,
+    Timeout,
+)
 from litellm.types.utils import ModelResponse
 from loguru import logger
 from model_clients.base_client import BaseModelClient
-from utils import retry_with_backoff
+from utils import AsyncRateLimiter, get_retry_after, retry_with_backoff
 
 from schemas import InferenceMetrics, PredictionResult
 
+RETRYABLE_ERRORS = (APIError, APIConnectionError, InternalServerError, RateLimitError, ServiceUnavailableError, Timeout)
+"""Errors for which a single failed request is retried, other errors are permanent."""
+
+RETRY_BASE_DELAY = 1.0
+RETRY_BACKOFF_FACTOR = 2.0
+
+CHARS_PER_TOKEN = 4
+"""Rough number of characters per token, used to estimate the tokens used by a request before sending it."""
+
+BUFFERED_REQUESTS_FACTOR = 4
+"""Max number of requests (in flight or completed, but not yielded yet) per allowed concurrent request."""
+
+
+def split_completion_tokens(completion_tokens: int, reasoning: str, answer: str) -> int:
+    """Estimate how many of the completion tokens reported by the provider were spent on reasoning.
+
+    The completion is split between reasoning and answer in proportion to their length in
+    characters, so the estimate never exceeds the actual number of completion tokens.
+
+    :param completion_tokens: The number of completion tokens reported by the provider.
+    :param reasoning: The reasoning part of the completion.
+    :param answer: The answer part of the completion.
+    :returns: The estimated number of reasoning tokens.
+    """
+    total_chars = len(reasoning) + len(answer)
+    if total_chars == 0:
+        return 0
+    return round(completion_tokens * len(reasoning) / total_chars)
+
 
 class LiteLLMModelClient(BaseModelClient):
     """Model client for models served via openai-compatible API.
@@ -46,7 +89,10 @@ class LiteLLMModelClient(BaseModelClient):
         logger.info(response)
         # Check if the response is an exception (e.g. litellm.exceptions.AuthenticationError).
         if isinstance(response, Exception):
-            raise response
+            if not self.config.job.allow_failed_predictions:
+                raise response
+            logger.error(f"Response {index} failed, storing a null prediction: {response}")
+            return PredictionResult(prediction=None, error=f"{type(response).__name__}: {response}")
 
         # Extract and log cost. In the case of self-hosted models,
         # there is not a _hidden_params attribute in the response.
@@ -88,8 +134,7 @@ class LiteLLMModelClient(BaseModelClient):
             reasoning_parts = prediction.split("</think>")
             reasoning = reasoning_parts[0].strip()
             prediction = reasoning_parts[1].strip()
-            # Rough estimate of reasoning tokens
-            reasoning_tokens = int(len(reasoning.split()) / 0.75)
+            reasoning_tokens = split_completion_tokens(usage.completion_tokens, reasoning, prediction)
 
         # Create and return prediction result
         return PredictionResult(
@@ -113,3 +158,134 @@ class LiteLLMModelClient(BaseModelClient):
         prediction_results = list(map(self._create_prediction_result, enumerate(responses)))
 
         return prediction_results
+
+
+class AsyncLiteLLMModelClient(LiteLLMModelClient):
+    """Model client sending every example as a separate, asynchronous request via litellm.
+
+    While ``LiteLLMModelClient`` waits for a whole batch to complete before sending the next one,
+    this client keeps up to ``max_concurrent_requests`` requests in flight at any time, across
+    batch boundaries, while staying within the provider rate limits (if configured). Failed
+    requests are retried individually, with exponential backoff.
+
+    Requests are run on an event loop in a background thread, so the client can be used from
+    synchronous code like any other model client.
+    """
+
+    def __init__(self, config: InferenceJobConfig, api_key: str | None = None) -> None:
+        super().__init__(config, api_key)
+        server_config = config.inference_server
+        self.max_concurrent_requests = server_config.max_concurrent_requests
+        self.max_retries = server_config.max_retries
+        self.rate_limiter = AsyncRateLimiter(server_config.requests_per_minute, server_config.tokens_per_minute)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="litellm-requests", daemon=True).start()
+        return self._loop
+
+    def close(self) -> None:
+        """Stop the event loop used to send requests (if any)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+    def _estimate_tokens(self, messages: list[dict[str, str]]) -> int:
+        prompt_chars = sum(len(message.get("content") or "") for message in messages)
+        return prompt_chars // CHARS_PER_TOKEN + self.config.generation_config.max_new_tokens
+
+    async def _make_async_completion_request(self, litellm_model: str, messages: list[dict[str, str]]) -> ModelResponse:
+        """Make a single request to the LLM, within the concurrency and rate limits, retrying on API errors"""
+        estimated_tokens = self._estimate_tokens(messages)
+        delay = RETRY_BASE_DELAY
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self._semaphore:
+                    await self.rate_limiter.acquire(estimated_tokens)
+                    response = await acompletion(
+                        model=litellm_model,
+                        messages=messages,
+                        max_tokens=self.config.generation_config.max_new_tokens,
+                        frequency_penalty=self.config.generation_config.frequency_penalty,
+                        temperature=self.config.generation_config.temperature,
+                        top_p=self.config.generation_config.top_p,
+                        drop_params=True,
+                        api_base=self.config.inference_server.base_url,
+                        api_key=self.api_key,
+                    )
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"Maximum retries ({self.max_retries}) exceeded")
+                    raise
+                wait_time = get_retry_after(e) or delay
+                logger.warning(f"API error (attempt {attempt}/{self.max_retries}): {e}")
+                logger.info(f"Retrying in {wait_time:.2f} seconds...")
+                # The request does not hold a concurrency slot while waiting to be retried.
+                await asyncio.sleep(wait_time)
+                delay *= RETRY_BACKOFF_FACTOR
+                continue
+
+            self.rate_limiter.record_usage(estimated_tokens, response["usage"].total_tokens)
+            return response
+
+    async def _predict_example(
+        self, litellm_model: str, index: int, messages: list[dict[str, str]]
+    ) -> PredictionResult:
+        try:
+            response = await self._make_async_completion_request(litellm_model, messages)
+        except Exception as e:
+            # Handled like a failed request in a batch completion: the whole job fails, unless failed
+            # predictions are allowed.
+            response = e
+        return self._create_prediction_result((index, response))
+
+    def predict(self, examples: list[list[dict[str, str]]]) -> list[PredictionResult]:
+        [prediction_results] = list(self.predict_batches([examples]))
+        return prediction_results
+
+    def predict_batches(self, batches: Iterable[list[list[dict[str, str]]]]) -> Iterator[list[PredictionResult]]:
+        """Send requests for the examples of every batch, yielding each batch's predictions in order.
+
+        The next batch is fetched as soon as a concurrency slot frees up, so requests keep flowing
+        while earlier batches complete. The number of buffered requests is bounded, so a single slow
+        request cannot cause the whole dataset to be read in memory.
+        """
+        litellm_model = f"{self.config.inference_server.provider}/{self.config.inference_server.model}"
+        logger.info(f"Sending requests to {litellm_model}, up to {self.max_concurrent_requests} at a time")
+        loop = self._event_loop()
+        max_buffered_requests = BUFFERED_REQUESTS_FACTOR * self.max_concurrent_requests
+        pending: deque[list[Future]] = deque()
+
+        try:
+            for examples in batches:
+                pending.append(
+                    [
+                        asyncio.run_coroutine_threadsafe(self._predict_example(litellm_model, index, messages), loop)
+                        for index, messages in enumerate(examples)
+                    ]
+                )
+
+                while True:
+                    # Yield completed batches as soon as possible, in order.
+                    while pending and all(future.done() for future in pending[0]):
+                        yield [future.result() for future in pending.popleft()]
+
+                    unfinished = [future for futures in pending for future in futures if not future.done()]
+                    buffered = sum(len(futures) for futures in pending)
+                    if len(unfinished) < self.max_concurrent_requests and buffered < max_buffered_requests:
+                        break
+                    if buffered >= max_buffered_requests:
+                        unfinished = [future for future in pending[0] if not future.done()]
+                    wait(unfinished, return_when=FIRST_COMPLETED)
+
+            while pending:
+                yield [future.result() for future in pending.popleft()]
+        finally:
+            for futures in pending:
+                for future in futures:
+                    future.cancel()
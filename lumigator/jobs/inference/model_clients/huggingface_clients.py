@@ -1,20 +1,22 @@
 from inference_config import InferenceJobConfig
 from loguru import logger
 from lumigator_schemas.tasks import TaskType
+from model_cache import load_model_config
 from model_clients.base_client import BaseModelClient
 from model_clients.mixins.generation_config_mixin import GenerationConfigMixin
 from model_clients.mixins.huggingface_model_mixin import HuggingFaceModelMixin
 from model_clients.mixins.huggingface_seq2seq_pipeline_mixin import HuggingFaceSeq2SeqPipelineMixin
 from model_clients.mixins.language_code_mixin import LanguageCodesSetupMixin
+from model_clients.mixins.pipeline_batching_mixin import PipelineBatchingMixin
 from model_clients.translation_utils import load_translation_config
-from transformers import AutoConfig, pipeline
+from transformers import pipeline
 
 from schemas import PredictionResult
 
 
 def is_encoder_decoder(model_name: str) -> bool:
     """Check if the model is an encoder-decoder model."""
-    return model_name.startswith("Helsinki-NLP/opus-mt") or AutoConfig.from_pretrained(model_name).is_encoder_decoder
+    return model_name.startswith("Helsinki-NLP/opus-mt") or load_model_config(model_name).is_encoder_decoder
 
 
 class HuggingFaceModelClientFactory:
@@ -62,6 +64,7 @@ class HuggingFaceSeq2SeqSummarizationClient(
     HuggingFaceModelMixin,
     HuggingFaceSeq2SeqPipelineMixin,
     GenerationConfigMixin,
+    PipelineBatchingMixin,
 ):
     """Client for seq2seq summarization models.
 
@@ -79,7 +82,10 @@ class HuggingFaceSeq2SeqSummarizationClient(
 
     def predict(self, examples: list) -> list[PredictionResult]:
         generations = self.pipeline(
-            examples, max_new_tokens=self.config.generation_config.max_new_tokens, truncation=True
+            examples,
+            max_new_tokens=self.config.generation_config.max_new_tokens,
+            truncation=True,
+            **self.pipeline_batch_kwargs(self.config.job, examples),
         )
 
         prediction_results = []
@@ -90,7 +96,7 @@ class HuggingFaceSeq2SeqSummarizationClient(
         return prediction_results
 
 
-class HuggingFaceCausalLMClient(BaseModelClient):
+class HuggingFaceCausalLMClient(BaseModelClient, PipelineBatchingMixin):
     """Client for causal language models
     CausalLM models can be used for text-generation or summarization
     or translation tasks with right system_prompt.
@@ -116,9 +122,15 @@ class HuggingFaceCausalLMClient(BaseModelClient):
         pipeline_config["token"] = self.api_key
 
         self.pipeline = pipeline(**pipeline_config)
+        if self.config.job.length_batching:
+            self.prepare_tokenizer_for_batching(self.pipeline.tokenizer)
 
     def predict(self, examples: list[list[dict[str, str]]]) -> list[PredictionResult]:
-        generations = self.pipeline(examples, max_new_tokens=self.config.generation_config.max_new_tokens)
+        generations = self.pipeline(
+            examples,
+            max_new_tokens=self.config.generation_config.max_new_tokens,
+            **self.pipeline_batch_kwargs(self.config.job, examples),
+        )
 
         prediction_results = []
         for generation in generations:
@@ -134,6 +146,7 @@ class HuggingFacePrefixTranslationClient(
     HuggingFaceSeq2SeqPipelineMixin,
     GenerationConfigMixin,
     LanguageCodesSetupMixin,
+    PipelineBatchingMixin,
 ):
     """Client for T5-style models that use prefixes for translation"""
 
@@ -162,7 +175,10 @@ class HuggingFacePrefixTranslationClient(
         prefixed_examples = [self.prefix + example for example in examples]
 
         generations = self.pipeline(
-            prefixed_examples, max_new_tokens=self.config.generation_config.max_new_tokens, truncation=True
+            prefixed_examples,
+            max_new_tokens=self.config.generation_config.max_new_tokens,
+            truncation=True,
+            **self.pipeline_batch_kwargs(self.config.job, examples),
         )
 
         prediction_results = []
@@ -179,6 +195,7 @@ class HuggingFaceLanguageCodeTranslationClient(
     HuggingFaceSeq2SeqPipelineMixin,
     GenerationConfigMixin,
     LanguageCodesSetupMixin,
+    PipelineBatchingMixin,
 ):
     """Client for translation models that require language codes (mBART, NLLB, M2M)"""
 
@@ -199,6 +216,7 @@ class HuggingFaceLanguageCodeTranslationClient(
             truncation=True,
             src_lang=self.source_language_iso_code,
             tgt_lang=self.target_language_iso_code,
+            **self.pipeline_batch_kwargs(self.config.job, examples),
         )
 
         prediction_results = []
@@ -215,6 +233,7 @@ class HuggingFaceOpusMTTranslationClient(
     HuggingFaceSeq2SeqPipelineMixin,
     GenerationConfigMixin,
     LanguageCodesSetupMixin,
+    PipelineBatchingMixin,
 ):
     """Client for OpusMT/MarianMT models"""
 
@@ -236,8 +255,7 @@ class HuggingFaceOpusMTTranslationClient(
         """Check if the model is a MarianMT model."""
         if model_name_or_path.startswith("Helsinki-NLP/opus-mt"):
             return True
-        config = AutoConfig.from_pretrained(model_name_or_path)
-        return config.model_type == "marian"
+        return load_model_config(model_name_or_path).model_type == "marian"
 
     def configure_model_name(self):
         """Configure the model name based on the source and target language codes
@@ -249,7 +267,7 @@ class HuggingFaceOpusMTTranslationClient(
                 f"Helsinki-NLP/opus-mt-{self.source_language_iso_code}-{self.target_language_iso_code}"
             )
             try:
-                AutoConfig.from_pretrained(self.config.hf_pipeline.model_name_or_path)
+                load_model_config(self.config.hf_pipeline.model_name_or_path)
                 logger.info(
                     f"Using default Opus MT model for language pair: {self.config.hf_pipeline.model_name_or_path}"
                 )
@@ -276,7 +294,10 @@ class HuggingFaceOpusMTTranslationClient(
         logger.info(f"Prefixed examples: {prefixed_examples}")
 
         generations = self.pipeline(
-            prefixed_examples, max_new_tokens=self.config.generation_config.max_new_tokens, truncation=True
+            prefixed_examples,
+            max_new_tokens=self.config.generation_config.max_new_tokens,
+            truncation=True,
+            **self.pipeline_batch_kwargs(self.config.job, examples),
         )
 
         prediction_results = []
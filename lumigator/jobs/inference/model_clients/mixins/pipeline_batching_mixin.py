@@ -0,0 +1,37 @@
+from inference_config import JobConfig
+from loguru import logger
+from transformers import PreTrainedTokenizerBase
+
+
+class PipelineBatchingMixin:
+    """Mixin to run HuggingFace pipelines on whole batches of examples when batching by token length."""
+
+    def pipeline_batch_kwargs(self, job_config: JobConfig, examples: list) -> dict[str, int]:
+        """Get the pipeline arguments used to predict a batch of examples.
+
+        Pipelines process examples one at a time unless told otherwise. When examples are batched by
+        token length (see ``JobConfig.length_batching``), padding is minimal, so every batch is run
+        as a single forward pass instead.
+
+        :param job_config: The job configuration.
+        :param examples: The batch of examples to predict.
+        :returns: The keyword arguments to pass to the pipeline.
+        """
+        if not job_config.length_batching:
+            return {}
+        return {"batch_size": len(examples)}
+
+    def prepare_tokenizer_for_batching(self, tokenizer: PreTrainedTokenizerBase) -> None:
+        """Set up the tokenizer of a decoder-only model so that batches of prompts can be padded.
+
+        Prompts must be padded on the left, so that generation continues right after each prompt.
+        Tokenizers without a padding token (common for causal LMs) pad with the EOS token instead.
+
+        This method mutates the ``tokenizer`` parameter.
+
+        :param tokenizer: The tokenizer of the model.
+        """
+        if tokenizer.pad_token is None:
+            logger.info(f"The tokenizer has no padding token, padding with the EOS token ({tokenizer.eos_token})")
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
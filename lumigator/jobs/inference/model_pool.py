@@ -0,0 +1,201 @@
+"""Pool of long-lived Ray actors keeping HuggingFace models loaded across inference jobs.
+
+Every inference job normally loads its model from scratch, which dominates the runtime of small
+jobs. With ``JobConfig.model_pool`` set, the job instead sends its batches to a detached Ray actor
+holding the model, shared by every job using the same model, revision and dtype: the first job
+creates it (and loads the model), the following ones reuse it until it stays idle for
+``ModelPoolConfig.idle_timeout`` seconds and exits, freeing its memory and GPUs.
+
+``ray`` is provided by the Ray runtime the job runs in, so it is only imported when using the pool.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Iterator
+from functools import cached_property
+
+from inference_config import InferenceJobConfig
+from loguru import logger
+from model_cache import update_model_cache
+from model_clients.base_client import BaseModelClient
+from model_clients.huggingface_clients import HuggingFaceModelClientFactory
+from transformers import AutoTokenizer, PreTrainedTokenizerBase
+
+from schemas import PredictionResult
+
+MODEL_POOL_NAMESPACE = "lumigator-model-pool"
+
+MAX_CLIENTS_PER_SERVER = 4
+"""Max number of model clients (i.e. tasks or generation configs for the same model) kept by a model server."""
+
+IN_FLIGHT_BATCHES = 2
+"""Number of batches sent to the model server ahead of time, so it never waits for the job between batches."""
+
+
+def model_server_name(config: InferenceJobConfig) -> str:
+    """Compute the name of the model server for the job's model, revision and dtype.
+
+    :param config: The inference job configuration.
+    :returns: The name of the (named, detached) Ray actor.
+    """
+    key = config.hf_pipeline.model_dump(include={"model", "revision", "torch_dtype", "trust_remote_code"})
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+    return f"model-server-{digest[:16]}"
+
+
+def _client_key(config: InferenceJobConfig) -> str:
+    """Everything the model clients depend on, other than the model itself."""
+    payload = {
+        "hf_pipeline": config.hf_pipeline.model_dump(exclude={"device"}),
+        "task_definition": config.task_definition.model_dump(mode="json"),
+        "generation_config": config.generation_config.model_dump() if config.generation_config else None,
+        "length_batching": config.job.length_batching,
+    }
+    return json.dumps(payload, sort_keys=True, default=str)
+
+
+class ModelServer:
+    """Keeps model clients loaded and predicts batches for any job, until left idle for too long.
+
+    Runs as a Ray actor processing one batch at a time, so jobs sharing the model take turns.
+    """
+
+    def __init__(self, idle_timeout: float):
+        """Start the model server.
+
+        :param idle_timeout: The number of seconds without batches after which the server exits.
+        """
+        self.idle_timeout = idle_timeout
+        self.clients: OrderedDict[str, BaseModelClient] = OrderedDict()
+        self.last_used = time.monotonic()
+        self._busy = threading.Lock()
+
+    def get_client(self, config: InferenceJobConfig, api_key: str | None = None) -> BaseModelClient:
+        """Get the model client for the job configuration, creating it if needed.
+
+        :param config: The inference job configuration.
+        :param api_key: The HuggingFace API key, if any.
+        :returns: The model client.
+        """
+        key = _client_key(config)
+        if key in self.clients:
+            self.clients.move_to_end(key)
+            return self.clients[key]
+
+        if len(self.clients) >= MAX_CLIENTS_PER_SERVER:
+            self.clients.popitem(last=False)
+        logger.info(f"Loading {config.hf_pipeline.model_name_or_path} in the model server")
+        self.clients[key] = HuggingFaceModelClientFactory.create(config, api_key)
+        update_model_cache(config)
+        return self.clients[key]
+
+    def predict(
+        self, config: InferenceJobConfig, api_key: str | None, examples: list[str] | list[list[dict[str, str]]]
+    ) -> list[PredictionResult]:
+        """Predict a batch of examples with the model client for the job configuration."""
+        with self._busy:
+            try:
+                return self.get_client(config, api_key).predict(examples)
+            finally:
+                self.last_used = time.monotonic()
+
+    def is_idle(self) -> bool:
+        """Whether the server did not predict any batch for ``idle_timeout`` seconds."""
+        return not self._busy.locked() and time.monotonic() - self.last_used > self.idle_timeout
+
+    def watch_idle(self) -> None:
+        """Exit the actor once idle, freeing the models it holds. Runs in a background thread."""
+        import ray
+
+        while not self.is_idle():
+            time.sleep(min(self.idle_timeout, 30))
+        logger.info(f"Model server idle for {self.idle_timeout}s, exiting")
+        ray.kill(ray.get_runtime_context().current_actor, no_restart=True)
+
+
+class RemoteModelServer(ModelServer):
+    """The Ray actor entrypoint: starts watching for idleness as soon as the actor is created."""
+
+    def __init__(self, idle_timeout: float):
+        """Start the model server, see ``ModelServer``."""
+        super().__init__(idle_timeout)
+        threading.Thread(target=self.watch_idle, daemon=True).start()
+
+
+def get_model_server(config: InferenceJobConfig):
+    """Get the model server for the job's model, starting it if there is none.
+
+    :param config: The inference job configuration, with ``job.model_pool`` set.
+    :returns: The handle of the model server actor.
+    """
+    import ray
+
+    name = model_server_name(config)
+    logger.info(f"Using model server {name} for {config.hf_pipeline.model_name_or_path}")
+    return (
+        ray.remote(RemoteModelServer)
+        .options(
+            name=name,
+            namespace=MODEL_POOL_NAMESPACE,
+            lifetime="detached",
+            get_if_exists=True,
+            num_gpus=config.job.model_pool.num_gpus,
+        )
+        .remote(config.job.model_pool.idle_timeout)
+    )
+
+
+class PooledModelClient(BaseModelClient):
+    """Model client sending batches to the pooled model server holding the job's model."""
+
+    def __init__(self, config: InferenceJobConfig, api_key: str | None = None):
+        """Connect to the model server for the job's model, starting it if needed.
+
+        :param config: The inference job configuration, with ``job.model_pool`` set.
+        :param api_key: The HuggingFace API key, if any.
+        """
+        self.config = config
+        self.api_key = api_key
+        self.server = get_model_server(config)
+
+    @cached_property
+    def tokenizer(self) -> PreTrainedTokenizerBase:
+        """The tokenizer of the model, loaded in the job to batch examples by token length."""
+        return AutoTokenizer.from_pretrained(
+            self.config.hf_pipeline.model_name_or_path,
+            revision=self.config.hf_pipeline.revision,
+            use_fast=self.config.hf_pipeline.use_fast,
+            trust_remote_code=self.config.hf_pipeline.trust_remote_code,
+        )
+
+    def predict(self, examples: list[str] | list[list[dict[str, str]]]) -> list[PredictionResult]:
+        [prediction_results] = list(self.predict_batches([examples]))
+        return prediction_results
+
+    def predict_batches(self, batches: Iterable[list]) -> Iterator[list[PredictionResult]]:
+        """Yield the predictions for each batch, in order, keeping the next batches queued on the model server."""
+        import ray
+        from ray.exceptions import RayActorError
+
+        pending = deque()
+        batches = iter(batches)
+        while True:
+            while len(pending) < IN_FLIGHT_BATCHES and (examples := next(batches, None)) is not None:
+                pending.append((examples, self.server.predict.remote(self.config, self.api_key, examples)))
+            if not pending:
+                return
+
+            examples, prediction_ref = pending.popleft()
+            try:
+                yield ray.get(prediction_ref)
+            except RayActorError:
+                # The server exited (e.g. left idle right as the job started): start a new one.
+                logger.warning("The model server exited, starting a new one")
+                self.server = get_model_server(self.config)
+                retried = [examples, *(queued for queued, _ in pending)]
+                pending = deque((e, self.server.predict.remote(self.config, self.api_key, e)) for e in retried)
+                examples, prediction_ref = pending.popleft()
+                yield ray.get(prediction_ref)
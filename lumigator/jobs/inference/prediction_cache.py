@@ -0,0 +1,218 @@
+"""Content-addressed cache of prediction results, shared across inference jobs.
+
+Workflows frequently re-run the same model, with the same prompt and generation parameters, over
+the same dataset rows. Predictions are cached under a hash of everything that determines them, so
+repeated rows are served from the cache instead of calling the model again.
+
+The cache is a local SQLite database which can optionally be shared with other jobs through S3:
+the remote copy is merged into the local one when the job starts, and the local one (including
+the new predictions) is merged back and uploaded when the job ends. Entries are never modified
+once written, so merging copies written concurrently by several jobs never loses a prediction
+that ends up in the uploaded copy; at worst, a job overwriting the remote copy at the same time
+as another one drops some of the other job's new entries, which will simply be predicted again.
+"""
+
+import hashlib
+import json
+import sqlite3
+import tempfile
+from collections import deque
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import s3fs
+from inference_config import InferenceJobConfig
+from loguru import logger
+from model_clients.base_client import BaseModelClient
+
+from schemas import PredictionCacheMetrics, PredictionResult
+
+PREDICTION_CACHE_FILENAME = "predictions.sqlite"
+
+SQLITE_MAX_VARIABLES = 500
+"""Max number of keys looked up in a single query, below SQLite's limit on query parameters."""
+
+
+def prediction_cache_namespace(config: InferenceJobConfig) -> str:
+    """Compute a hash of everything in the job configuration that determines the predictions for an example.
+
+    :param config: The inference job configuration.
+    :returns: The hex digest identifying the model, prompt and generation parameters.
+    """
+    payload = {
+        "inference_server": config.inference_server.model_dump(include={"provider", "model", "base_url"})
+        if config.inference_server
+        else None,
+        "hf_pipeline": config.hf_pipeline.model_dump(include={"model", "task", "revision", "torch_dtype", "truncation"})
+        if config.hf_pipeline
+        else None,
+        "system_prompt": config.system_prompt,
+        "generation_config": config.generation_config.model_dump() if config.generation_config else None,
+        "task_definition": config.task_definition.model_dump(mode="json"),
+    }
+    serialized = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def prediction_cache_key(namespace: str, example: str | list[dict[str, str]]) -> str:
+    """Compute the cache key of a single example.
+
+    :param namespace: The namespace of the job, see ``prediction_cache_namespace``.
+    :param example: The example, as passed to the model client.
+    :returns: The hex digest identifying the prediction for the example.
+    """
+    serialized = json.dumps([namespace, example], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+class PredictionCache:
+    """Stores prediction results in a local SQLite database, optionally shared through S3."""
+
+    def __init__(self, path: Path, remote_uri: str | None = None):
+        """Open (or create) the prediction cache.
+
+        :param path: The path of the local SQLite database.
+        :param remote_uri: The S3 URI of the prefix the cache is shared under, if any.
+        """
+        self.path = path
+        self.remote_path = f"{remote_uri.rstrip('/')}/{PREDICTION_CACHE_FILENAME}" if remote_uri else None
+        self._s3 = s3fs.S3FileSystem() if self.remote_path else None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Several jobs running on the same node may share the local cache.
+        self._db = sqlite3.connect(self.path, timeout=60)
+        self._db.execute("CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, result TEXT NOT NULL)")
+        self._db.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, PredictionResult]:
+        """Look up the cached prediction results for the given keys.
+
+        :param keys: The keys to look up.
+        :returns: The cached results, by key. Keys not in the cache are left out.
+        """
+        results = {}
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            chunk = keys[start : start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._db.execute(f"SELECT key, result FROM predictions WHERE key IN ({placeholders})", chunk)
+            results.update((key, PredictionResult.model_validate_json(result)) for key, result in rows)
+        return results
+
+    def put_many(self, results: dict[str, PredictionResult]) -> None:
+        """Store the given prediction results.
+
+        :param results: The results to store, by key.
+        """
+        self._db.executemany(
+            "INSERT OR REPLACE INTO predictions (key, result) VALUES (?, ?)",
+            ((key, result.model_dump_json()) for key, result in results.items()),
+        )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        """The number of predictions stored in the (local) cache."""
+        return self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def pull(self) -> None:
+        """Merge the remote copy of the cache (if any) into the local one.
+
+        Failing to download the remote copy is not an error: predictions will just not be served
+        from it.
+        """
+        if self.remote_path is None:
+            return
+
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                remote_copy = Path(tmp_dir) / PREDICTION_CACHE_FILENAME
+                if not self._s3.exists(self.remote_path):
+                    return
+                logger.info(f"Downloading prediction cache from {self.remote_path}")
+                self._s3.get_file(self.remote_path, remote_copy)
+                self._merge(remote_copy)
+        except (OSError, sqlite3.DatabaseError) as e:
+            logger.warning(f"Unable to download the prediction cache from {self.remote_path}: {e}")
+
+    def push(self) -> None:
+        """Merge the latest remote copy of the cache into the local one, then upload it.
+
+        Failing to upload the cache is not an error: new predictions will just not be shared.
+        """
+        if self.remote_path is None:
+            return
+
+        self.pull()
+        logger.info(f"Uploading prediction cache to {self.remote_path}")
+        try:
+            self._s3.put_file(self.path, self.remote_path)
+        except OSError as e:
+            logger.warning(f"Unable to upload the prediction cache to {self.remote_path}: {e}")
+
+    def _merge(self, other_path: Path) -> None:
+        self._db.execute("ATTACH DATABASE ? AS other", (str(other_path),))
+        try:
+            self._db.execute(
+                "INSERT OR IGNORE INTO predictions (key, result) SELECT key, result FROM other.predictions"
+            )
+            self._db.commit()
+        finally:
+            self._db.execute("DETACH DATABASE other")
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class CachingModelClient(BaseModelClient):
+    """Model client serving cached predictions, only sending cache misses to the wrapped client."""
+
+    def __init__(self, client: BaseModelClient, cache: PredictionCache, namespace: str):
+        """Wrap a model client with a prediction cache.
+
+        :param client: The client used to predict examples which are not in the cache.
+        :param cache: The prediction cache.
+        :param namespace: The namespace of the job, see ``prediction_cache_namespace``.
+        """
+        self.client = client
+        self.cache = cache
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def metrics(self) -> PredictionCacheMetrics:
+        """The cache hits and misses for the predictions made so far."""
+        total = self.hits + self.misses
+        return PredictionCacheMetrics(hits=self.hits, misses=self.misses, hit_rate=self.hits / total if total else 0.0)
+
+    def predict(self, examples: str | list[list[dict[str, str]]]) -> list[PredictionResult]:
+        [prediction_results] = list(self.predict_batches([examples]))
+        return prediction_results
+
+    def close(self) -> None:
+        self.client.close()
+
+    def predict_batches(self, batches: Iterable[str | list[list[dict[str, str]]]]) -> Iterator[list[PredictionResult]]:
+        """Yield the predictions for each batch, in order, only predicting the examples not in the cache.
+
+        Cache misses are streamed to the wrapped client (one, possibly empty, batch of misses for
+        each batch), so clients predicting several batches concurrently can still do so.
+        """
+        pending = deque()
+
+        def misses() -> Iterator[list]:
+            for examples in batches:
+                keys = [prediction_cache_key(self.namespace, example) for example in examples]
+                cached = self.cache.get_many(keys)
+                missing = [i for i, key in enumerate(keys) if key not in cached]
+                pending.append((keys, cached, missing))
+                yield [examples[i] for i in missing]
+
+        for predicted in self.client.predict_batches(misses()):
+            keys, cached, missing = pending.popleft()
+            new_results = dict(zip((keys[i] for i in missing), predicted, strict=True))
+            # Failed predictions are not cached, so they are attempted again by the next job.
+            self.cache.put_many({key: result for key, result in new_results.items() if result.error is None})
+
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+            yield [cached[key] if key in cached else new_results[key] for key in keys]
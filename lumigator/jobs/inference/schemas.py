@@ -4,7 +4,7 @@ This is because the backend and this job will be running in different environmen
 """
 
 from lumigator_schemas.tasks import SummarizationTaskDefinition, TaskDefinition, TaskType
-from pydantic import BaseModel, ConfigDict, Field, PositiveInt, model_validator
+from pydantic import BaseModel, ByteSize, ConfigDict, Field, NonNegativeFloat, PositiveInt, model_validator
 
 
 class DatasetConfig(BaseModel):
@@ -12,12 +12,39 @@ class DatasetConfig(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
 
+class ModelPoolConfig(BaseModel):
+    # Seconds a pooled model server stays up (with its model loaded) without receiving batches
+    idle_timeout: PositiveInt = 600
+    # GPUs reserved by each model server (the job itself then reserves none)
+    num_gpus: NonNegativeFloat = 0
+    model_config = ConfigDict(extra="forbid")
+
+
 class JobConfig(BaseModel):
     max_samples: int
     batch_size: PositiveInt = 1
     storage_path: str
     output_field: str | None = "predictions"
     enable_tqdm: bool = True
+    # Checkpoint completed batches, so a re-submitted job with the same ID and config can resume
+    checkpoint: bool = True
+    # Max number of predictions per result shard: shards are uploaded to the checkpoint once full
+    rows_per_shard: PositiveInt = 1000
+    # Store rows whose prediction permanently failed with a null prediction and an error, instead of failing the job
+    allow_failed_predictions: bool = False
+    # Serve predictions from a cache shared across jobs (keyed by model, prompt, generation params and example)
+    prediction_cache: bool = False
+    # S3 URI of the prefix the prediction cache is shared under, if any (otherwise the cache is local to the node)
+    prediction_cache_uri: str | None = None
+    # HF models only: run batches of examples with similar token length, to reduce padding
+    length_bucketing: bool = False
+    # HF models only: cap the padded prompt tokens of a batch (chat-format prompts are measured with the model's
+    # chat template) instead of only its rows (batches hold up to batch_size rows), implies length bucketing
+    max_tokens_per_batch: PositiveInt | None = None
+    # HF models only: evict the least recently used models from the worker's model cache beyond this size
+    model_cache_max_size: ByteSize | None = None
+    # HF models only: send batches to a long-lived model server shared by the jobs using the same model
+    model_pool: ModelPoolConfig | None = None
     model_config = ConfigDict(extra="forbid")
 
 
@@ -26,6 +53,11 @@ class InferenceServerConfig(BaseModel):
     model: str
     provider: str
     max_retries: int
+    # Max number of requests in flight at any time, across batch boundaries
+    max_concurrent_requests: PositiveInt = 16
+    # Provider rate limits (if any): requests are throttled to stay within them
+    requests_per_minute: PositiveInt | None = None
+    tokens_per_minute: PositiveInt | None = None
     model_config = ConfigDict(extra="forbid")
 
 
@@ -75,6 +107,13 @@ class InferenceMetrics(BaseModel):
     answer_tokens: int
 
 
+class PredictionCacheMetrics(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    hits: int
+    misses: int
+    hit_rate: float
+
+
 class AverageInferenceMetrics(BaseModel):
     model_config = ConfigDict(extra="forbid")
     avg_prompt_tokens: float
@@ -82,6 +121,7 @@ class AverageInferenceMetrics(BaseModel):
     avg_completion_tokens: float
     avg_reasoning_tokens: float | None = None
     avg_answer_tokens: float = None
+    prediction_cache: PredictionCacheMetrics | None = None
 
 
 class InferenceJobOutput(BaseModel):
@@ -92,13 +132,16 @@ class InferenceJobOutput(BaseModel):
     model: str
     inference_time: float
     inference_metrics: list[InferenceMetrics | None] = []
+    # Only set if some predictions failed (see JobConfig.allow_failed_predictions)
+    errors: list[str | None] | None = None
 
 
 class PredictionResult(BaseModel):
     model_config = ConfigDict(extra="forbid")
-    prediction: str
+    prediction: str | None
     reasoning: str | None = None
     metrics: InferenceMetrics | None = None
+    error: str | None = None
 
 
 class JobOutput(BaseModel):
@@ -0,0 +1,256 @@
+"""Incremental, on-disk storage for inference results.
+
+Prediction results are appended to JSONL shards as soon as each batch completes, so the memory
+used by an inference job does not grow with the size of the dataset. The final ``results.json``
+is only assembled once inference is over, streaming values from the shards (and from the
+memory-mapped dataset) straight into the output file.
+"""
+
+import json
+import shutil
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import IO, Any
+
+from datasets import Dataset
+from loguru import logger
+from pydantic import BaseModel, ConfigDict
+
+from schemas import InferenceJobOutput, JobOutput, PredictionResult
+
+SHARD_FILENAME_TEMPLATE = "shard-{:05d}.jsonl"
+"""Filename template for the shards, formatted with the (zero-based) shard number."""
+
+DATASET_READ_BATCH_SIZE = 1_000
+"""Number of dataset rows read at a time when copying dataset columns into the output."""
+
+JSON_SEPARATORS = (",", ":")
+"""Compact separators, matching the output of pydantic's ``model_dump_json``."""
+
+
+class ShardState(BaseModel):
+    """Bookkeeping information for a single shard, used to checkpoint and restore a writer."""
+
+    model_config = ConfigDict(extra="forbid")
+    name: str
+    rows: int = 0
+    batches: int = 0
+    errors: int = 0  # rows whose prediction failed
+    size: int = 0  # in bytes, as of the last completed batch
+
+
+class PredictionShardWriter:
+    """Appends prediction results to JSONL shards stored in a local directory.
+
+    Each line of a shard holds a single JSON-serialized ``PredictionResult``, in the same
+    order as the dataset rows they were generated for. Shards are only rotated between
+    batches, so every batch is stored entirely within a single shard.
+    """
+
+    def __init__(self, shard_dir: Path, rows_per_shard: int):
+        if rows_per_shard < 1:
+            raise ValueError(f"rows_per_shard must be a positive integer, got {rows_per_shard}")
+
+        self.shard_dir = shard_dir
+        self.rows_per_shard = rows_per_shard
+        self.num_rows = 0
+        self.num_batches = 0
+        self._shards: list[ShardState] = []
+        self._current_shard: IO[bytes] | None = None
+
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def restore(cls, shard_dir: Path, shards: list[ShardState], rows_per_shard: int) -> "PredictionShardWriter":
+        """Restore a writer from the state of its shards, e.g. as stored in a checkpoint.
+
+        Any data written to a shard after its state was recorded (e.g. a batch that was being
+        written when the job crashed) is discarded. New results are written to a new shard.
+
+        :param shard_dir: The directory containing the shards.
+        :param shards: The state of the shards to restore, in order.
+        :param rows_per_shard: The (approximate) maximum number of results stored in a single shard.
+        :returns: The restored writer.
+        :raises OSError: If any of the shards cannot be found or truncated.
+        """
+        writer = cls(shard_dir, rows_per_shard)
+        for state in shards:
+            with (shard_dir / state.name).open("r+b") as f:
+                f.truncate(state.size)
+
+        writer._shards = [state.model_copy() for state in shards]
+        writer.num_rows = sum(state.rows for state in shards)
+        writer.num_batches = sum(state.batches for state in shards)
+        return writer
+
+    @property
+    def num_errors(self) -> int:
+        """The number of rows written so far whose prediction failed."""
+        return sum(state.errors for state in self._shards)
+
+    @property
+    def shard_paths(self) -> list[Path]:
+        """The paths of all the shards written so far, in order."""
+        return [self.shard_dir / state.name for state in self._shards]
+
+    @property
+    def shards(self) -> list[ShardState]:
+        """The state of all the shards written so far, in order."""
+        return [state.model_copy() for state in self._shards]
+
+    @property
+    def closed_shards(self) -> list[ShardState]:
+        """The state of the shards that will not be written to anymore, in order."""
+        if self._current_shard is None:
+            return self.shards
+        return self.shards[:-1]
+
+    def write_batch(self, results: list[PredictionResult]) -> None:
+        """Append the results for a single batch to the current shard, rotating shards when full.
+
+        The shard is flushed once the whole batch has been written, so a crash can never leave
+        a partially written batch behind in the OS buffers.
+
+        :param results: The prediction results for the batch, in dataset order.
+        """
+        if self._current_shard is None or self._shards[-1].rows >= self.rows_per_shard:
+            self._open_next_shard()
+
+        state = self._shards[-1]
+        for result in results:
+            self._current_shard.write(result.model_dump_json().encode() + b"\n")
+        self._current_shard.flush()
+
+        state.rows += len(results)
+        state.batches += 1
+        state.errors += sum(result.error is not None for result in results)
+        state.size = self._current_shard.tell()
+        self.num_rows += len(results)
+        self.num_batches += 1
+
+    def close(self) -> None:
+        """Close the shard currently open for writing (if any)."""
+        if self._current_shard is not None:
+            self._current_shard.close()
+            self._current_shard = None
+
+    def iter_results(self) -> Iterator[PredictionResult]:
+        """Read back all the prediction results stored in the shards, in order.
+
+        :returns: An iterator over the stored prediction results.
+        """
+        for shard_path in self.shard_paths:
+            with shard_path.open() as f:
+                for line in f:
+                    yield PredictionResult.model_validate_json(line)
+
+    def cleanup(self) -> None:
+        """Close any open shard and remove the shard directory and its contents."""
+        self.close()
+        shutil.rmtree(self.shard_dir, ignore_errors=True)
+
+    def _open_next_shard(self) -> None:
+        self.close()
+        state = ShardState(name=SHARD_FILENAME_TEMPLATE.format(len(self._shards)))
+        logger.debug(f"Opening new prediction shard {self.shard_dir / state.name}")
+        self._current_shard = (self.shard_dir / state.name).open("wb")
+        self._shards.append(state)
+
+
+class StreamingJobOutput:
+    """A ``JobOutput`` whose (potentially very large) artifact columns are streamed to disk.
+
+    Scalar fields, parameters and metrics are serialized by pydantic exactly as they would be
+    for a regular ``JobOutput``; list-valued artifacts are instead written element by element,
+    reading prediction results from the shards and any other column from the dataset.
+    """
+
+    def __init__(
+        self,
+        job_output: JobOutput,
+        shards: PredictionShardWriter,
+        dataset: Dataset,
+        output_field: str,
+    ):
+        """Prepare a streamed job output.
+
+        :param job_output: The job output holding everything except the list-valued artifacts.
+        :param shards: The shards where the prediction results were stored.
+        :param dataset: The dataset the predictions were generated for.
+        :param output_field: The name of the artifact holding the predictions.
+        """
+        self.job_output = job_output
+        self.shards = shards
+        self.dataset = dataset
+        self.output_field = output_field
+
+    def _column_sources(self) -> dict[str, Any]:
+        """Map every list-valued artifact to a callable returning an iterator over its values.
+
+        We keep any column that was already in the dataset, then (potentially) overwrite the ones
+        generated by the inference job, mimicking what happens when building the output from
+        ``dataset.to_dict()``.
+        """
+        sources = {column: (lambda c=column: self._iter_dataset_column(c)) for column in self.dataset.column_names}
+
+        if self.output_field in sources:
+            logger.warning(f"Overwriting {self.output_field}")
+
+        sources[self.output_field] = lambda: (p.prediction for p in self.shards.iter_results())
+        sources["reasoning"] = lambda: (p.reasoning for p in self.shards.iter_results())
+        sources["inference_metrics"] = lambda: (
+            p.metrics.model_dump(mode="json") if p.metrics else None for p in self.shards.iter_results()
+        )
+        if self.shards.num_errors:
+            sources["errors"] = lambda: (p.error for p in self.shards.iter_results())
+
+        # Only the fields defined in the output schema end up in the results.
+        return {name: source for name, source in sources.items() if name in InferenceJobOutput.model_fields}
+
+    def _iter_dataset_column(self, column: str) -> Iterator[Any]:
+        for batch in self.dataset.select_columns([column]).iter(batch_size=DATASET_READ_BATCH_SIZE):
+            yield from batch[column]
+
+    def write_json(self, f: IO[str]) -> None:
+        """Write the JSON representation of the job output to the given text stream.
+
+        :param f: The (text) file object to write to.
+        """
+        sources = self._column_sources()
+        if "examples" not in sources:
+            raise ValueError("The dataset used for inference must contain an 'examples' column")
+
+        output = self.job_output.model_dump(mode="json")
+        f.write("{")
+        for i, (key, value) in enumerate(output.items()):
+            if i:
+                f.write(",")
+            f.write(_to_json(key) + ":")
+            if key != "artifacts":
+                f.write(_to_json(value))
+                continue
+
+            f.write("{")
+            for j, (artifact_key, artifact_value) in enumerate(value.items()):
+                if j:
+                    f.write(",")
+                f.write(_to_json(artifact_key) + ":")
+                if artifact_key in sources:
+                    _write_json_array(f, sources[artifact_key]())
+                else:
+                    f.write(_to_json(artifact_value))
+            f.write("}")
+        f.write("}")
+
+
+def _to_json(value: Any) -> str:
+    return json.dumps(value, separators=JSON_SEPARATORS, ensure_ascii=False)
+
+
+def _write_json_array(f: IO[str], values: Iterable[Any]) -> None:
+    f.write("[")
+    for i, value in enumerate(values):
+        if i:
+            f.write(",")
+        f.write(_to_json(value))
+    f.write("]")
@@ -5,6 +5,7 @@ from pathlib import Path
 
 import pytest
 from loguru import logger
+from model_cache import load_model_config
 from model_clients.external_api_clients import LiteLLMModelClient
 
 
@@ -62,3 +63,11 @@ def caplog_with_loguru(caplog, configure_loguru):
 @pytest.fixture(scope="function")
 def api_key() -> str:
     return "12345"
+
+
+@pytest.fixture(autouse=True)
+def clear_model_config_cache():
+    """Model configurations are memoized per process, don't leak mocked ones across tests."""
+    load_model_config.cache_clear()
+    yield
+    load_model_config.cache_clear()
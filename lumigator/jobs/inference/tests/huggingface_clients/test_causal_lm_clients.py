@@ -1,7 +1,7 @@
 from unittest.mock import MagicMock, patch
 
 import pytest
-from inference_config import HfPipelineConfig, InferenceJobConfig
+from inference_config import HfPipelineConfig, InferenceJobConfig, JobConfig
 from lumigator_schemas.tasks import TaskType
 from model_clients.huggingface_clients import HuggingFaceCausalLMClient
 from transformers import Pipeline
@@ -20,6 +20,7 @@ class TestHuggingFaceCausalLMClient(MockBaseSetup):
         config.hf_pipeline.model_name_or_path = "mock-causal-model"
         config.hf_pipeline.task = TaskType.TEXT_GENERATION
         config.generation_config = mock_generation_config
+        config.job = JobConfig(storage_path="s3://bucket/results/")
 
         return config
 
@@ -82,3 +83,23 @@ class TestHuggingFaceCausalLMClient(MockBaseSetup):
         mock_pipeline.assert_called_once()
         pipeline_args = mock_pipeline.call_args[1]
         assert pipeline_args["task"] == TaskType.TEXT_GENERATION
+
+    @patch("model_clients.huggingface_clients.pipeline")
+    def test_predict_batches_under_token_budget(self, mock_pipeline, mock_config, mock_pipeline_instance):
+        """Test that batches packed under a token budget are run as a single, left-padded batch."""
+        mock_config.job.max_tokens_per_batch = 1024
+        mock_pipeline_instance.tokenizer.pad_token = None
+        mock_pipeline_instance.tokenizer.eos_token = "</s>"
+        mock_pipeline_instance.return_value = [
+            [{"generated_text": [{"role": "assistant", "content": f"answer {i}"}]}] for i in range(3)
+        ]
+        mock_pipeline.return_value = mock_pipeline_instance
+        examples = [[{"role": "user", "content": f"question {i}"}] for i in range(3)]
+
+        client = HuggingFaceCausalLMClient(mock_config)
+        results = client.predict(examples)
+
+        assert [r.prediction for r in results] == ["answer 0", "answer 1", "answer 2"]
+        assert mock_pipeline_instance.call_args[1]["batch_size"] == 3
+        assert client.pipeline.tokenizer.pad_token == "</s>"
+        assert client.pipeline.tokenizer.padding_side == "left"
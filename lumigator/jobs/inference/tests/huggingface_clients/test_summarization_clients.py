@@ -1,7 +1,7 @@
 from unittest.mock import MagicMock
 
 import pytest
-from inference_config import HfPipelineConfig, InferenceJobConfig
+from inference_config import HfPipelineConfig, InferenceJobConfig, JobConfig
 from lumigator_schemas.tasks import TaskType
 from model_clients.huggingface_clients import HuggingFaceSeq2SeqSummarizationClient
 
@@ -26,6 +26,7 @@ class TestHuggingFaceSeq2SeqSummarizationClient(MockBaseSetup):
         config.hf_pipeline.device = "cpu"
 
         config.generation_config = mock_generation_config
+        config.job = JobConfig(storage_path="s3://bucket/results/")
 
         return config
 
@@ -75,6 +76,21 @@ class TestHuggingFaceSeq2SeqSummarizationClient(MockBaseSetup):
         assert result[0].prediction == "This is a summary."
         mock_pipeline_instance.assert_called_once_with(["This is a test prompt."], max_new_tokens=100, truncation=True)
 
+    def test_predict_whole_batch_when_batching_by_length(
+        self, setup_mocks_for_seq2seq, mock_config, mock_pipeline_instance
+    ):
+        """Examples batched by token length are run as a single batch by the pipeline."""
+        mock_pipeline_instance.return_value = [{"summary_text": "Summary 1."}, {"summary_text": "Summary 2."}]
+        mock_config.job.length_bucketing = True
+
+        client = HuggingFaceSeq2SeqSummarizationClient(mock_config)
+        result = client.predict(["First prompt.", "Second prompt."])
+
+        assert [r.prediction for r in result] == ["Summary 1.", "Summary 2."]
+        mock_pipeline_instance.assert_called_once_with(
+            ["First prompt.", "Second prompt."], max_new_tokens=100, truncation=True, batch_size=2
+        )
+
     def test_max_token_adjustment(self, setup_mocks_for_seq2seq, mock_config, mock_model_instance):
         """Test that the client adjusts max tokens if over model limits."""
         # Set model to have limited max position embeddings
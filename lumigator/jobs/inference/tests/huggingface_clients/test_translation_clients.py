@@ -1,7 +1,7 @@
 from unittest.mock import MagicMock, patch
 
 import pytest
-from inference_config import HfPipelineConfig, InferenceJobConfig
+from inference_config import HfPipelineConfig, InferenceJobConfig, JobConfig
 from lumigator_schemas.tasks import TaskDefinition, TaskType
 from model_clients.huggingface_clients import (
     HuggingFaceLanguageCodeTranslationClient,
@@ -34,6 +34,7 @@ class TranslationClientTestBase(MockBaseSetup):
         config.hf_pipeline.device = "cpu"
 
         config.generation_config = mock_generation_config
+        config.job = JobConfig(storage_path="s3://bucket/results/")
         return config
 
     @pytest.fixture
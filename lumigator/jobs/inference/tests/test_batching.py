@@ -0,0 +1,171 @@
+from unittest.mock import patch
+
+import pytest
+from batching import LengthBucketBatchSampler, chat_lengths, text_lengths
+from dataset import create_dataloader
+from datasets import Dataset
+from inference import predict
+from inference_config import InferenceJobConfig
+from model_clients.base_client import BaseModelClient
+from shards import PredictionShardWriter
+
+from schemas import PredictionResult
+
+
+class FakeTokenizer:
+    """Splits examples on whitespace, one token per word."""
+
+    model_max_length = 6
+
+    def __call__(self, examples: list[str]) -> dict:
+        return {"input_ids": [example.split() for example in examples]}
+
+
+class FakeChatTokenizer(FakeTokenizer):
+    """Formats messages as "<role> content" and adds an "<assistant>" generation prompt."""
+
+    chat_template = "fake"
+
+    def apply_chat_template(self, messages: list[dict], add_generation_prompt: bool = False) -> list[str]:
+        tokens = [token for m in messages for token in [f"<{m['role']}>", *m["content"].split()]]
+        return tokens + ["<assistant>"] if add_generation_prompt else tokens
+
+
+class EchoModelClient(BaseModelClient):
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, examples: list) -> list[PredictionResult]:
+        self.calls.append(examples)
+        return [PredictionResult(prediction=f"prediction for {e}") for e in examples]
+
+
+def _example(length: int, i: int) -> str:
+    return " ".join([f"{i}"] * length)
+
+
+def _lengths_of(lengths: list[int]):
+    return lambda indices: [lengths[i] for i in indices]
+
+
+@pytest.fixture
+def hf_config(json_config_full_hf) -> InferenceJobConfig:
+    config = InferenceJobConfig.model_validate(json_config_full_hf)
+    # Avoids looking up the model configuration on the Hub, these are known encoder-decoder models.
+    config.hf_pipeline.model_name_or_path = "Helsinki-NLP/opus-mt-en-fr"
+    return config
+
+
+class TestLengthBucketBatchSampler:
+    def test_sorts_examples_by_length_within_windows(self):
+        lengths = [1, 5, 3, 2, 4, 6, 1]
+        sampler = LengthBucketBatchSampler(len(lengths), _lengths_of(lengths), batch_size=2, sort_window=4)
+
+        batches = list(sampler)
+
+        assert batches == [[1, 2], [3, 0], [5, 4], [6]]
+        assert len(sampler) == len(batches)
+
+    def test_token_budget(self):
+        lengths = [2, 10, 3, 3, 3, 2]
+        sampler = LengthBucketBatchSampler(
+            len(lengths), _lengths_of(lengths), batch_size=3, max_tokens_per_batch=8, sort_window=10
+        )
+
+        batches = list(sampler)
+
+        # A single example over the budget gets its own batch, batches never exceed batch_size rows.
+        assert batches == [[1], [2, 3], [4, 0], [5]]
+        for batch in batches[1:]:
+            assert max(lengths[i] for i in batch) * len(batch) <= 8
+        with pytest.raises(TypeError):
+            len(sampler)
+
+    def test_yields_every_index_once(self):
+        lengths = [(i * 7) % 11 for i in range(100)]
+        sampler = LengthBucketBatchSampler(len(lengths), _lengths_of(lengths), batch_size=8, max_tokens_per_batch=40)
+
+        assert sorted(index for batch in sampler for index in batch) == list(range(100))
+
+
+def test_text_lengths_are_capped_to_model_max_length():
+    assert text_lengths(["a b", "a b c d e f g h", ""], FakeTokenizer()) == [2, 6, 0]
+
+
+def test_create_dataloader_batches_by_length(hf_config):
+    hf_config.job.batch_size = 2
+    hf_config.job.length_bucketing = True
+    lengths = [1, 4, 2, 3, 1]
+    dataset = Dataset.from_dict({"examples": [_example(length, i) for i, length in enumerate(lengths)]})
+
+    batches = list(create_dataloader(dataset, hf_config, FakeTokenizer()))
+
+    assert [batch["indices"] for batch in batches] == [[1, 3], [2, 0], [4]]
+    assert batches[0]["examples"] == [dataset[1]["examples"], dataset[3]["examples"]]
+
+
+def test_chat_lengths_use_chat_template():
+    examples = [[{"role": "system", "content": "Be brief"}, {"role": "user", "content": "a b c d e f g h"}]]
+
+    # Prompts are not truncated by the text-generation pipeline.
+    assert chat_lengths(examples, FakeChatTokenizer()) == [13]
+    assert chat_lengths(examples, FakeTokenizer()) == [6]
+
+
+def test_create_dataloader_packs_chat_examples_under_token_budget(hf_config):
+    hf_config.hf_pipeline.task = "text-generation"
+    hf_config.system_prompt = "Be brief"
+    hf_config.job.batch_size = 3
+    hf_config.job.max_tokens_per_batch = 20
+    lengths = [1, 6, 2, 2, 1]
+    dataset = Dataset.from_dict({"examples": [_example(length, i) for i, length in enumerate(lengths)]})
+
+    batches = list(create_dataloader(dataset, hf_config, FakeChatTokenizer()))
+
+    # Prompts hold 5 tokens on top of the example: the system prompt, the user role and the generation prompt.
+    assert [batch["indices"] for batch in batches] == [[1], [2, 3], [0, 4]]
+    assert batches[0]["examples"] == [
+        [{"role": "system", "content": "Be brief"}, {"role": "user", "content": dataset[1]["examples"]}]
+    ]
+
+
+def test_create_dataloader_without_tokenizer_keeps_fixed_batches(hf_config):
+    hf_config.job.batch_size = 2
+    hf_config.job.max_tokens_per_batch = 100
+    dataset = Dataset.from_dict({"examples": ["a", "b b", "c"]})
+
+    batches = list(create_dataloader(dataset, hf_config))
+
+    assert batches == [{"indices": [0, 1], "examples": ["a", "b b"]}, {"indices": [2], "examples": ["c"]}]
+
+
+def test_predict_restores_dataset_order(tmp_path, hf_config):
+    hf_config.job.batch_size = 3
+    hf_config.job.max_tokens_per_batch = 8
+    lengths = [1, 5, 2, 6, 3, 1, 2, 4]
+    dataset = Dataset.from_dict({"examples": [_example(length, i) for i, length in enumerate(lengths)]})
+    shards = PredictionShardWriter(tmp_path / "shards", rows_per_shard=100)
+    client = EchoModelClient()
+
+    num_rows, _ = predict(create_dataloader(dataset, hf_config, FakeTokenizer()), client, shards)
+
+    assert num_rows == len(lengths)
+    assert len(client.calls) > len(lengths) / hf_config.job.batch_size
+    assert [r.prediction for r in shards.iter_results()] == [f"prediction for {e}" for e in dataset["examples"]]
+
+
+def test_dataloader_reads_whole_batches(hf_config):
+    hf_config.hf_pipeline.task = "text-generation"
+    hf_config.system_prompt = "Be brief"
+    hf_config.job.batch_size = 2
+    dataset = Dataset.from_dict({"examples": ["a", "b", "c"], "ground_truth": ["A", "B", "C"]})
+    dataloader = create_dataloader(dataset, hf_config)
+
+    with patch.object(Dataset, "__getitem__", autospec=True, side_effect=Dataset.__getitem__) as getitem:
+        batches = list(dataloader)
+
+    assert [call.args[1] for call in getitem.call_args_list] == [[0, 1], [2]]
+    assert batches[1] == {
+        "indices": [2],
+        "examples": [[{"role": "system", "content": "Be brief"}, {"role": "user", "content": "c"}]],
+    }
@@ -0,0 +1,173 @@
+from unittest.mock import patch
+from uuid import UUID
+
+import fsspec
+import pytest
+from checkpoint import CHECKPOINT_FILENAME, InferenceCheckpoint, config_fingerprint
+from inference import checkpoint_storage_path, predict
+from inference_config import InferenceJobConfig
+from model_clients.base_client import BaseModelClient
+
+from schemas import PredictionResult
+
+JOB_ID = UUID("d34dbeef-4bea-4d19-ad06-214202165812")
+REMOTE_DIR = "s3://bucket/jobs/results/job/checkpoint"
+
+
+class FakeModelClient(BaseModelClient):
+    def __init__(self, fail_on: str | None = None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    def predict(self, examples: list) -> list[PredictionResult]:
+        if self.fail_on in examples:
+            raise RuntimeError("boom")
+        self.calls.append(examples)
+        return [PredictionResult(prediction=f"prediction for {e}") for e in examples]
+
+
+def _batches(count: int, batch_size: int = 2) -> list[dict]:
+    return [
+        {
+            "indices": [i * batch_size + j for j in range(batch_size)],
+            "examples": [f"{i}-{j}" for j in range(batch_size)],
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def memory_fs():
+    fs = fsspec.filesystem("memory")
+    fs.store.clear()
+    with patch("checkpoint.s3fs.S3FileSystem", return_value=fs):
+        yield fs
+    fs.store.clear()
+
+
+def test_config_fingerprint(json_config_full_api):
+    config = InferenceJobConfig.model_validate(json_config_full_api)
+    same_config = config.model_copy(deep=True)
+    same_config.job.enable_tqdm = not config.job.enable_tqdm
+    same_config.job.storage_path = "s3://another/path/"
+    other_prompt = config.model_copy(deep=True)
+    other_prompt.system_prompt = "Something else"
+    other_batch_size = config.model_copy(deep=True)
+    other_batch_size.job.batch_size = config.job.batch_size + 1
+
+    assert config_fingerprint(config) == config_fingerprint(same_config)
+    assert config_fingerprint(config) != config_fingerprint(other_prompt)
+    assert config_fingerprint(config) != config_fingerprint(other_batch_size)
+
+
+@pytest.mark.parametrize(
+    "storage_path, expected",
+    [
+        (None, None),
+        ("/tmp/results/", None),
+        ("s3://bucket/jobs/results/", f"s3://bucket/jobs/results/my-job/{JOB_ID}/checkpoint"),
+        (
+            f"s3://bucket/jobs/results/my-job/{JOB_ID}/results.json",
+            f"s3://bucket/jobs/results/my-job/{JOB_ID}/checkpoint",
+        ),
+    ],
+)
+def test_checkpoint_storage_path(storage_path, expected):
+    assert checkpoint_storage_path(storage_path, JOB_ID, "my job") == expected
+
+
+def test_resume_skips_completed_batches(tmp_path):
+    checkpoint = InferenceCheckpoint(tmp_path / "job", config_hash="hash", rows_per_shard=3)
+    shards = checkpoint.restore_writer()
+    batches = _batches(5)
+
+    # Simulate a crash while predicting the third batch.
+    client = FakeModelClient(fail_on="2-0")
+    with pytest.raises(RuntimeError, match="boom"):
+        predict(batches, client, shards, checkpoint)
+    assert client.calls == [batches[0]["examples"], batches[1]["examples"]]
+
+    # A new run of the same job only predicts the remaining batches.
+    resumed_checkpoint = InferenceCheckpoint(tmp_path / "job", config_hash="hash", rows_per_shard=3)
+    resumed_shards = resumed_checkpoint.restore_writer()
+    assert resumed_shards.num_batches == 2
+
+    resumed_client = FakeModelClient()
+    num_rows, _ = predict(batches, resumed_client, resumed_shards, resumed_checkpoint)
+
+    assert resumed_client.calls == [b["examples"] for b in batches[2:]]
+    assert num_rows == 10
+    assert [p.prediction for p in resumed_shards.iter_results()] == [
+        f"prediction for {e}" for b in batches for e in b["examples"]
+    ]
+
+
+def test_checkpoint_with_different_config_is_ignored(tmp_path):
+    checkpoint = InferenceCheckpoint(tmp_path / "job", config_hash="hash", rows_per_shard=3)
+    shards = checkpoint.restore_writer()
+    predict(_batches(2), FakeModelClient(), shards, checkpoint)
+
+    other_checkpoint = InferenceCheckpoint(tmp_path / "job", config_hash="other-hash", rows_per_shard=3)
+    other_shards = other_checkpoint.restore_writer()
+
+    assert other_shards.num_batches == 0
+    assert list(other_shards.iter_results()) == []
+
+
+def test_resume_from_remote_checkpoint(tmp_path, memory_fs):
+    checkpoint = InferenceCheckpoint(tmp_path / "worker-1", config_hash="hash", rows_per_shard=2, remote_dir=REMOTE_DIR)
+    shards = checkpoint.restore_writer()
+    batches = _batches(3)
+    predict(batches, FakeModelClient(), shards, checkpoint)
+    assert memory_fs.exists(f"{REMOTE_DIR}/{CHECKPOINT_FILENAME}")
+
+    # The job is resubmitted on another worker, without any local state.
+    remote_checkpoint = InferenceCheckpoint(
+        tmp_path / "worker-2", config_hash="hash", rows_per_shard=2, remote_dir=REMOTE_DIR
+    )
+    remote_shards = remote_checkpoint.restore_writer()
+    client = FakeModelClient()
+    predict(batches, client, remote_shards, remote_checkpoint)
+
+    assert client.calls == []
+    assert list(remote_shards.iter_results()) == list(shards.iter_results())
+
+    remote_checkpoint.remove()
+    assert not memory_fs.exists(REMOTE_DIR)
+    assert not (tmp_path / "worker-2").exists()
+
+
+def test_only_closed_shards_are_uploaded(tmp_path, memory_fs):
+    checkpoint = InferenceCheckpoint(tmp_path / "job", config_hash="hash", rows_per_shard=2, remote_dir=REMOTE_DIR)
+    shards = checkpoint.restore_writer()
+
+    shards.write_batch([PredictionResult(prediction="a"), PredictionResult(prediction="b")])
+    checkpoint.save(shards)
+    assert not memory_fs.exists(REMOTE_DIR)
+
+    shards.write_batch([PredictionResult(prediction="c")])
+    checkpoint.save(shards)
+    assert memory_fs.exists(f"{REMOTE_DIR}/shard-00000.jsonl")
+    assert not memory_fs.exists(f"{REMOTE_DIR}/shard-00001.jsonl")
+
+
+def test_resume_does_not_upload_shards_again(tmp_path, memory_fs):
+    checkpoint = InferenceCheckpoint(tmp_path / "job", config_hash="hash", rows_per_shard=2, remote_dir=REMOTE_DIR)
+    shards = checkpoint.restore_writer()
+    batches = _batches(4)
+
+    # Simulate a crash while predicting the last batch, once the first two shards were uploaded.
+    with pytest.raises(RuntimeError, match="boom"):
+        predict(batches, FakeModelClient(fail_on="3-0"), shards, checkpoint)
+    assert memory_fs.exists(f"{REMOTE_DIR}/shard-00001.jsonl")
+
+    resumed_checkpoint = InferenceCheckpoint(
+        tmp_path / "job", config_hash="hash", rows_per_shard=2, remote_dir=REMOTE_DIR
+    )
+    resumed_shards = resumed_checkpoint.restore_writer()
+    with patch.object(memory_fs, "put_file", wraps=memory_fs.put_file) as put_file:
+        predict(batches, FakeModelClient(), resumed_shards, resumed_checkpoint)
+
+    # Only the shard still open when the job crashed, and the new one, are uploaded.
+    uploaded = [call.args[1] for call in put_file.call_args_list]
+    assert uploaded == [f"{REMOTE_DIR}/shard-00002.jsonl", f"{REMOTE_DIR}/shard-00003.jsonl"]
@@ -1,9 +1,12 @@
-from unittest.mock import MagicMock, patch
+import asyncio
+import random
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
 from inference_config import InferenceJobConfig
-from litellm import APIError
-from model_clients.external_api_clients import LiteLLMModelClient, PredictionResult
+from litellm import APIError, AuthenticationError, RateLimitError
+from model_clients.external_api_clients import AsyncLiteLLMModelClient, LiteLLMModelClient, PredictionResult
 
 # Constants
 SYSTEM_PROMPT = "You are a helpful assistant."
@@ -39,8 +42,13 @@ class TestLiteLLMModelClient:
         inference_server.provider = PROVIDER
         inference_server.model = MODEL
         inference_server.base_url = BASE_URL
+        inference_server.max_retries = 3
         config.inference_server = inference_server
 
+        job = MagicMock()
+        job.allow_failed_predictions = False
+        config.job = job
+
         return config
 
     @pytest.fixture(scope="function")
@@ -155,8 +163,9 @@ class TestLiteLLMModelClient:
         # Verify results
         assert result[0].prediction == "Final answer"
         assert result[0].reasoning == "Let me think about this.\nThis is my reasoning."
-        # Verify reasoning tokens are estimated based on word count
-        assert result[0].metrics.reasoning_tokens > 0
+        # Verify completion tokens are split between reasoning (47 chars) and answer (12 chars) by length
+        assert result[0].metrics.reasoning_tokens == 12
+        assert result[0].metrics.answer_tokens == 3
 
     @patch("model_clients.external_api_clients.batch_completion")
     def test_retry_mechanism(self, mock_completion, client):
@@ -184,6 +193,23 @@ class TestLiteLLMModelClient:
         assert mock_completion.call_count == 3
         assert result[0].prediction == "Success after retry"
 
+    @patch("model_clients.external_api_clients.batch_completion")
+    def test_failed_items_are_stored_when_allowed(self, mock_completion, client, mock_config):
+        """Items failing with a non-retryable error become null predictions when failures are allowed."""
+        mock_config.job.allow_failed_predictions = True
+        examples = _user_prompts("0", 2)
+        auth_error = AuthenticationError(message="Invalid key", llm_provider=PROVIDER, model=MODEL)
+        mock_completion.return_value = [auth_error, _echo_response(examples[1])]
+
+        result = client.predict(examples)
+
+        assert mock_completion.call_count == 1
+        assert result[0].prediction is None
+        assert result[0].metrics is None
+        assert result[0].error.startswith("AuthenticationError")
+        assert result[1].prediction == "Answer to 0-1"
+        assert result[1].error is None
+
     @patch("model_clients.external_api_clients.batch_completion")
     def test_missing_inference_server(self, mock_completion, mock_config):
         """Test behavior when inference_server.base_url is None."""
@@ -213,3 +239,165 @@ class TestLiteLLMModelClient:
 
         # Verify result
         assert result[0].prediction == "Response"
+
+
+def _user_prompts(prefix: str, count: int) -> list[list[dict[str, str]]]:
+    return [
+        [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": f"{prefix}-{i}"}]
+        for i in range(count)
+    ]
+
+
+def _rate_limit_error(retry_after: str | None = None) -> RateLimitError:
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", BASE_URL))
+    return RateLimitError(message="Too many requests", llm_provider=PROVIDER, model=MODEL, response=response)
+
+
+def _echo_response(messages: list[dict[str, str]]) -> MagicMock:
+    response = MagicMock()
+    response._hidden_params = HIDDEN_PARAMS
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = f"Answer to {messages[-1]['content']}"
+    response.choices[0].message.provider_specific_fields = {}
+    response["usage"].prompt_tokens = 10
+    response["usage"].completion_tokens = 5
+    response["usage"].total_tokens = 15
+    return response
+
+
+class TestAsyncLiteLLMModelClient:
+    @pytest.fixture
+    def config(self, json_config_full_api) -> InferenceJobConfig:
+        config = InferenceJobConfig.model_validate(json_config_full_api)
+        config.inference_server.max_concurrent_requests = 3
+        return config
+
+    @pytest.fixture
+    def client(self, config):
+        client = AsyncLiteLLMModelClient(config, "api-key")
+        yield client
+        client.close()
+
+    @patch("model_clients.external_api_clients.acompletion")
+    def test_predict_batches_limits_concurrency_and_keeps_order(self, mock_acompletion, client):
+        """Requests run concurrently (across batches) up to the limit, results are returned in order."""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def fake_acompletion(messages, **kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(random.uniform(0, 0.02))
+            in_flight -= 1
+            return _echo_response(messages)
+
+        mock_acompletion.side_effect = fake_acompletion
+        batches = [_user_prompts(str(i), 2) for i in range(6)]
+
+        results = list(client.predict_batches(iter(batches)))
+
+        assert [[r.prediction for r in batch] for batch in results] == [
+            [f"Answer to {messages[-1]['content']}" for messages in batch] for batch in batches
+        ]
+        assert mock_acompletion.call_count == 12
+        # Batches hold 2 examples, so reaching the limit requires requests from different batches.
+        assert max_in_flight == client.max_concurrent_requests
+        assert mock_acompletion.call_args.kwargs["model"] == "openai/mistral/Mistral-7B-Instruct-v0.2"
+        assert mock_acompletion.call_args.kwargs["api_key"] == "api-key"
+
+    @patch("model_clients.external_api_clients.RETRY_BASE_DELAY", 0)
+    @patch("model_clients.external_api_clients.acompletion")
+    def test_retries_failed_requests_only(self, mock_acompletion, client):
+        """Only the failed request is retried, the other requests of the batch are sent once."""
+        failures = {"0-1": 2}
+
+        async def fake_acompletion(messages, **kwargs):
+            content = messages[-1]["content"]
+            if failures.get(content):
+                failures[content] -= 1
+                raise APIError(message="API Error", llm_provider=PROVIDER, model=MODEL, status_code=500)
+            return _echo_response(messages)
+
+        mock_acompletion.side_effect = fake_acompletion
+
+        results = client.predict(_user_prompts("0", 3))
+
+        assert [r.prediction for r in results] == ["Answer to 0-0", "Answer to 0-1", "Answer to 0-2"]
+        assert mock_acompletion.call_count == 5
+
+    @patch("model_clients.external_api_clients.asyncio.sleep", new_callable=AsyncMock)
+    @patch("model_clients.external_api_clients.acompletion")
+    def test_retry_waits_for_delay_requested_by_provider(self, mock_acompletion, mock_sleep, client):
+        failures = {"0-0": 1}
+
+        async def fake_acompletion(messages, **kwargs):
+            if failures.get(messages[-1]["content"]):
+                failures[messages[-1]["content"]] -= 1
+                raise _rate_limit_error(retry_after="5")
+            return _echo_response(messages)
+
+        mock_acompletion.side_effect = fake_acompletion
+
+        results = client.predict(_user_prompts("0", 1))
+
+        assert results[0].prediction == "Answer to 0-0"
+        mock_sleep.assert_awaited_once_with(5.0)
+
+    @patch("model_clients.external_api_clients.RETRY_BASE_DELAY", 0)
+    @patch("model_clients.external_api_clients.acompletion")
+    def test_raises_after_max_retries(self, mock_acompletion, client):
+        mock_acompletion.side_effect = APIError(
+            message="API Error", llm_provider=PROVIDER, model=MODEL, status_code=500
+        )
+
+        with pytest.raises(APIError):
+            client.predict(_user_prompts("0", 1))
+        assert mock_acompletion.call_count == client.max_retries
+
+    @patch("model_clients.external_api_clients.acompletion")
+    def test_non_retryable_errors_are_raised(self, mock_acompletion, client):
+        mock_acompletion.side_effect = AuthenticationError(message="Invalid key", llm_provider=PROVIDER, model=MODEL)
+
+        with pytest.raises(AuthenticationError):
+            client.predict(_user_prompts("0", 1))
+        assert mock_acompletion.call_count == 1
+
+    @patch("model_clients.external_api_clients.acompletion")
+    def test_token_usage_is_recorded(self, mock_acompletion, config):
+        """The estimated token usage is corrected with the actual usage reported by the provider."""
+        config.inference_server.tokens_per_minute = 10_000
+        client = AsyncLiteLLMModelClient(config)
+
+        async def fake_acompletion(messages, **kwargs):
+            return _echo_response(messages)
+
+        mock_acompletion.side_effect = fake_acompletion
+        client.predict(_user_prompts("0", 2))
+        client.close()
+
+        # Each response reports 15 tokens used, refilling the bucket can only add to that.
+        assert client.rate_limiter.tokens.available >= 10_000 - 2 * 15
+        assert client.rate_limiter.tokens.available < 10_000
+
+    @patch("model_clients.external_api_clients.RETRY_BASE_DELAY", 0)
+    @patch("model_clients.external_api_clients.acompletion")
+    def test_failed_requests_are_stored_when_allowed(self, mock_acompletion, config):
+        config.job.allow_failed_predictions = True
+        client = AsyncLiteLLMModelClient(config)
+
+        async def fake_acompletion(messages, **kwargs):
+            if messages[-1]["content"] == "0-0":
+                raise _rate_limit_error()
+            return _echo_response(messages)
+
+        mock_acompletion.side_effect = fake_acompletion
+        results = client.predict(_user_prompts("0", 2))
+        client.close()
+
+        assert results[0].prediction is None
+        assert results[0].error.startswith("RateLimitError")
+        assert results[1].prediction == "Answer to 0-1"
+        # The failed request was retried, up to the configured number of attempts.
+        assert mock_acompletion.call_count == config.inference_server.max_retries + 1
@@ -69,3 +69,14 @@ class TestCalculateAverageMetrics:
 
     def test_handles_empty_list(self):
         assert _calculate_average_metrics([]) is None
+
+    def test_ignores_failed_predictions(self):
+        results = [
+            _make_result_with_metrics(prompt=10),
+            PredictionResult(prediction=None, error="RateLimitError: Too many requests"),
+            _make_result_with_metrics(prompt=30),
+        ]
+
+        avg = _calculate_average_metrics(results)
+
+        assert avg.avg_prompt_tokens == 20.0
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+from model_cache import MIN_EVICTION_AGE, evict_model_cache, load_model_config, mark_model_used
+from model_clients.huggingface_clients import HuggingFaceOpusMTTranslationClient, is_encoder_decoder
+
+
+def _cache_model(cache_dir, model_name: str, size: int, last_used: float):
+    """Create a model in a HuggingFace cache directory, with a single file of ``size`` bytes."""
+    repo_dir = cache_dir / f"models--{model_name.replace('/', '--')}"
+    commit_hash = hashlib.sha1(model_name.encode()).hexdigest()
+    blob = repo_dir / "blobs" / model_name.replace("/", "-")
+    blob.parent.mkdir(parents=True)
+    blob.write_bytes(b"0" * size)
+    os.utime(blob, times=(last_used, last_used))
+    (repo_dir / "refs").mkdir()
+    (repo_dir / "refs" / "main").write_text(commit_hash)
+    snapshot_dir = repo_dir / "snapshots" / commit_hash
+    snapshot_dir.mkdir(parents=True)
+    (snapshot_dir / "model.safetensors").symlink_to(blob)
+
+
+def _cached_models(cache_dir) -> set[str]:
+    return {path.name.removeprefix("models--").replace("--", "/") for path in cache_dir.iterdir()}
+
+
+def test_model_config_is_looked_up_once():
+    with patch("model_cache.AutoConfig.from_pretrained") as from_pretrained:
+        from_pretrained.return_value.is_encoder_decoder = True
+        from_pretrained.return_value.model_type = "marian"
+
+        assert is_encoder_decoder("org/model")
+        assert is_encoder_decoder("org/model")
+        assert HuggingFaceOpusMTTranslationClient.is_model_type_marianmt("org/model")
+
+    from_pretrained.assert_called_once_with("org/model")
+    assert load_model_config.cache_info().hits == 2
+
+
+def test_evicts_least_recently_used_models(tmp_path):
+    long_ago = time.time() - 10 * MIN_EVICTION_AGE
+    _cache_model(tmp_path, "org/oldest", size=400, last_used=long_ago)
+    _cache_model(tmp_path, "org/old", size=300, last_used=long_ago + 1)
+    _cache_model(tmp_path, "org/recent", size=200, last_used=long_ago + 2)
+    _cache_model(tmp_path, "org/current", size=500, last_used=long_ago - 1)
+
+    freed = evict_model_cache(900, keep={"org/current"}, cache_dir=tmp_path)
+
+    assert freed == 700
+    assert _cached_models(tmp_path) == {"org/recent", "org/current"}
+
+
+def test_recently_used_models_are_not_evicted(tmp_path):
+    _cache_model(tmp_path, "org/old", size=300, last_used=time.time() - 10 * MIN_EVICTION_AGE)
+    _cache_model(tmp_path, "org/other", size=300, last_used=time.time() - 10 * MIN_EVICTION_AGE)
+    mark_model_used("org/other", cache_dir=tmp_path)
+
+    assert evict_model_cache(100, cache_dir=tmp_path) == 300
+    assert _cached_models(tmp_path) == {"org/other"}
+
+
+@pytest.mark.parametrize("max_size", [1_000, 100])
+def test_nothing_to_evict(tmp_path, max_size):
+    _cache_model(tmp_path, "org/current", size=500, last_used=time.time() - 10 * MIN_EVICTION_AGE)
+
+    assert evict_model_cache(max_size, keep={"org/current"}, cache_dir=tmp_path) == 0
+    assert _cached_models(tmp_path) == {"org/current"}
+
+
+def test_missing_cache_is_ignored(tmp_path):
+    assert evict_model_cache(100, cache_dir=tmp_path / "missing") == 0
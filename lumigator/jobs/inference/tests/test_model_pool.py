@@ -0,0 +1,93 @@
+from unittest.mock import patch
+
+import pytest
+from inference_config import GenerationConfig, InferenceJobConfig
+from model_clients.base_client import BaseModelClient
+from model_pool import MAX_CLIENTS_PER_SERVER, ModelServer, model_server_name
+
+from schemas import ModelPoolConfig, PredictionResult
+
+
+class FakeModelClient(BaseModelClient):
+    def __init__(self, config: InferenceJobConfig):
+        self.max_new_tokens = config.generation_config.max_new_tokens
+
+    def predict(self, examples: list) -> list[PredictionResult]:
+        return [PredictionResult(prediction=f"{e} ({self.max_new_tokens} tokens)") for e in examples]
+
+
+@pytest.fixture
+def pool_config(json_config_full_hf) -> InferenceJobConfig:
+    config = InferenceJobConfig.model_validate(json_config_full_hf)
+    config.generation_config = GenerationConfig()
+    config.job.model_pool = ModelPoolConfig()
+    return config
+
+
+@pytest.fixture
+def create_client():
+    with (
+        patch(
+            "model_pool.HuggingFaceModelClientFactory.create", side_effect=lambda config, _: FakeModelClient(config)
+        ) as create,
+        patch("model_pool.update_model_cache"),
+    ):
+        yield create
+
+
+def test_model_server_name(pool_config):
+    other_task = pool_config.model_copy(deep=True)
+    other_task.generation_config.max_new_tokens += 1
+    other_task.job.batch_size += 1
+    other_revision = pool_config.model_copy(deep=True)
+    other_revision.hf_pipeline.revision = "v2"
+    other_dtype = pool_config.model_copy(deep=True)
+    other_dtype.hf_pipeline.torch_dtype = "float16"
+
+    name = model_server_name(pool_config)
+    assert model_server_name(other_task) == name
+    assert model_server_name(other_revision) != name
+    assert model_server_name(other_dtype) != name
+
+
+def test_model_server_keeps_clients_loaded(pool_config, create_client):
+    server = ModelServer(idle_timeout=60)
+    other_generation_config = pool_config.model_copy(deep=True)
+    other_generation_config.generation_config.max_new_tokens = 7
+
+    first = server.predict(pool_config, None, ["a", "b"])
+    other = server.predict(other_generation_config, None, ["c"])
+    again = server.predict(pool_config.model_copy(deep=True), None, ["d"])
+
+    tokens = pool_config.generation_config.max_new_tokens
+    assert [r.prediction for r in first + other + again] == [
+        f"a ({tokens} tokens)",
+        f"b ({tokens} tokens)",
+        "c (7 tokens)",
+        f"d ({tokens} tokens)",
+    ]
+    assert create_client.call_count == 2
+
+
+def test_model_server_evicts_least_recently_used_clients(pool_config, create_client):
+    server = ModelServer(idle_timeout=60)
+    configs = []
+    for max_new_tokens in range(1, MAX_CLIENTS_PER_SERVER + 2):
+        config = pool_config.model_copy(deep=True)
+        config.generation_config.max_new_tokens = max_new_tokens
+        configs.append(config)
+        server.predict(config, None, ["a"])
+
+    assert len(server.clients) == MAX_CLIENTS_PER_SERVER
+    server.predict(configs[0], None, ["a"])
+    assert create_client.call_count == MAX_CLIENTS_PER_SERVER + 2
+
+
+def test_model_server_idle_timeout(pool_config, create_client):
+    server = ModelServer(idle_timeout=60)
+    server.predict(pool_config, None, ["a"])
+
+    with patch("model_pool.time.monotonic", return_value=server.last_used + 30):
+        assert not server.is_idle()
+    with patch("model_pool.time.monotonic", return_value=server.last_used + 61):
+        assert server.is_idle()
@@ -0,0 +1,159 @@
+from unittest.mock import patch
+
+import fsspec
+import pytest
+from inference_config import InferenceJobConfig
+from model_clients.base_client import BaseModelClient
+from prediction_cache import (
+    PREDICTION_CACHE_FILENAME,
+    CachingModelClient,
+    PredictionCache,
+    prediction_cache_key,
+    prediction_cache_namespace,
+)
+
+from schemas import PredictionResult
+
+REMOTE_URI = "s3://bucket/cache/predictions"
+
+
+class FakeModelClient(BaseModelClient):
+    def __init__(self, fail_on: str | None = None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    def predict(self, examples: list) -> list[PredictionResult]:
+        self.calls.append(examples)
+        return [
+            PredictionResult(prediction=None, error="Timeout")
+            if e == self.fail_on
+            else PredictionResult(prediction=f"prediction for {e}")
+            for e in examples
+        ]
+
+
+@pytest.fixture
+def memory_fs():
+    fs = fsspec.filesystem("memory")
+    fs.store.clear()
+    with patch("prediction_cache.s3fs.S3FileSystem", return_value=fs):
+        yield fs
+    fs.store.clear()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PredictionCache(tmp_path / "cache" / PREDICTION_CACHE_FILENAME)
+    yield cache
+    cache.close()
+
+
+def test_prediction_cache_namespace(json_config_full_api):
+    config = InferenceJobConfig.model_validate(json_config_full_api)
+    same_predictions = config.model_copy(deep=True)
+    same_predictions.name = "another job"
+    same_predictions.job.storage_path = "s3://another/path/"
+    same_predictions.job.batch_size = 7
+    other_prompt = config.model_copy(deep=True)
+    other_prompt.system_prompt = "Something else"
+    other_model = config.model_copy(deep=True)
+    other_model.inference_server.model = "gpt-4o"
+    other_temperature = config.model_copy(deep=True)
+    other_temperature.generation_config.temperature = 0.5
+
+    namespace = prediction_cache_namespace(config)
+    assert prediction_cache_namespace(same_predictions) == namespace
+    for other_config in (other_prompt, other_model, other_temperature):
+        assert prediction_cache_namespace(other_config) != namespace
+
+
+def test_prediction_cache_key():
+    example = [{"role": "user", "content": "example"}]
+
+    assert prediction_cache_key("namespace", example) == prediction_cache_key("namespace", list(example))
+    assert prediction_cache_key("namespace", example) != prediction_cache_key("other", example)
+    assert prediction_cache_key("namespace", "a") != prediction_cache_key("namespace", "b")
+
+
+def test_get_many_and_put_many(cache):
+    results = {f"key-{i}": PredictionResult(prediction=f"prediction {i}") for i in range(1_200)}
+
+    cache.put_many(results)
+
+    assert len(cache) == 1_200
+    assert cache.get_many([*results, "missing"]) == results
+
+
+def test_caching_client_only_predicts_misses(cache):
+    client = FakeModelClient()
+    caching_client = CachingModelClient(client, cache, "namespace")
+    list(caching_client.predict_batches([["a", "b"], ["c"]]))
+
+    other_client = FakeModelClient()
+    other_caching_client = CachingModelClient(other_client, cache, "namespace")
+    results = list(other_caching_client.predict_batches([["a", "d"], ["c", "b"], ["e"]]))
+
+    assert [[r.prediction for r in batch] for batch in results] == [
+        ["prediction for a", "prediction for d"],
+        ["prediction for c", "prediction for b"],
+        ["prediction for e"],
+    ]
+    # Fully cached batches are not sent to the model.
+    assert other_client.calls == [["d"], ["e"]]
+    assert other_caching_client.metrics.model_dump() == {"hits": 3, "misses": 2, "hit_rate": 0.6}
+
+
+def test_caching_client_uses_namespace(cache):
+    CachingModelClient(FakeModelClient(), cache, "namespace").predict(["a"])
+
+    client = FakeModelClient()
+    CachingModelClient(client, cache, "other namespace").predict(["a"])
+
+    assert client.calls == [["a"]]
+
+
+def test_failed_predictions_are_not_cached(cache):
+    CachingModelClient(FakeModelClient(fail_on="a"), cache, "namespace").predict(["a", "b"])
+
+    client = FakeModelClient()
+    results = CachingModelClient(client, cache, "namespace").predict(["a", "b"])
+
+    assert client.calls == [["a"]]
+    assert [r.prediction for r in results] == ["prediction for a", "prediction for b"]
+
+
+def test_caching_client_closes_wrapped_client(cache):
+    client = FakeModelClient()
+    with patch.object(client, "close") as close:
+        CachingModelClient(client, cache, "namespace").close()
+
+    close.assert_called_once()
+
+
+def test_cache_is_shared_through_remote_copy(tmp_path, memory_fs):
+    first = PredictionCache(tmp_path / "node-1" / PREDICTION_CACHE_FILENAME, REMOTE_URI)
+    first.put_many({"a": PredictionResult(prediction="a")})
+    first.push()
+    first.close()
+    assert memory_fs.exists(f"{REMOTE_URI}/{PREDICTION_CACHE_FILENAME}")
+
+    second = PredictionCache(tmp_path / "node-2" / PREDICTION_CACHE_FILENAME, REMOTE_URI)
+    second.pull()
+    second.put_many({"b": PredictionResult(prediction="b")})
+    second.push()
+    second.close()
+
+    # Entries stored by both nodes end up in the remote copy.
+    third = PredictionCache(tmp_path / "node-3" / PREDICTION_CACHE_FILENAME, REMOTE_URI)
+    third.pull()
+    assert set(third.get_many(["a", "b"])) == {"a", "b"}
+    third.close()
+
+
+def test_missing_remote_copy(tmp_path, memory_fs):
+    cache = PredictionCache(tmp_path / PREDICTION_CACHE_FILENAME, REMOTE_URI)
+
+    cache.pull()
+
+    assert len(cache) == 0
+    cache.close()
@@ -0,0 +1,196 @@
+import json
+
+import pytest
+from datasets import Dataset
+from inference_config import InferenceJobConfig
+from shards import PredictionShardWriter, StreamingJobOutput
+
+from schemas import InferenceJobOutput, InferenceMetrics, JobOutput, PredictionResult
+
+
+def _make_results(count: int, with_metrics: bool = True) -> list[PredictionResult]:
+    return [
+        PredictionResult(
+            prediction=f"prediction {i}",
+            reasoning=f"reasoning {i}" if i % 2 else None,
+            metrics=InferenceMetrics(
+                prompt_tokens=i, total_tokens=2 * i, completion_tokens=i, reasoning_tokens=0, answer_tokens=i
+            )
+            if with_metrics
+            else None,
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def dataset() -> Dataset:
+    return Dataset.from_dict(
+        {
+            "examples": [f"example {i}" for i in range(5)],
+            "ground_truth": [f"ground truth {i}" for i in range(5)],
+            "extra": list(range(5)),
+        }
+    )
+
+
+class TestPredictionShardWriter:
+    def test_rotates_shards_between_batches_and_preserves_order(self, tmp_path):
+        writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=2)
+        results = _make_results(6)
+
+        writer.write_batch(results[:1])
+        writer.write_batch(results[1:4])
+        writer.write_batch(results[4:])
+        writer.close()
+
+        assert writer.num_rows == 6
+        assert writer.num_batches == 3
+        assert [p.name for p in writer.shard_paths] == ["shard-00000.jsonl", "shard-00001.jsonl"]
+        assert [(s.rows, s.batches) for s in writer.shards] == [(4, 2), (2, 1)]
+        assert list(writer.iter_results()) == results
+
+    def test_closed_shards(self, tmp_path):
+        writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=1)
+
+        writer.write_batch(_make_results(1))
+        writer.write_batch(_make_results(1))
+        assert [s.name for s in writer.closed_shards] == ["shard-00000.jsonl"]
+
+        writer.close()
+        assert [s.name for s in writer.closed_shards] == ["shard-00000.jsonl", "shard-00001.jsonl"]
+
+    def test_empty_batch_is_counted(self, tmp_path):
+        writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=10)
+
+        writer.write_batch([])
+
+        assert writer.num_batches == 1
+        assert list(writer.iter_results()) == []
+
+    def test_restore_discards_results_written_after_the_recorded_state(self, tmp_path):
+        writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=10)
+        results = _make_results(4)
+        writer.write_batch(results[:2])
+        state = writer.shards
+        # This batch is not part of the recorded state, e.g. the job crashed before checkpointing it.
+        writer.write_batch(results[2:])
+        writer.close()
+
+        restored = PredictionShardWriter.restore(tmp_path / "shards", state, rows_per_shard=10)
+        assert restored.num_rows == 2
+        assert restored.num_batches == 1
+        assert list(restored.iter_results()) == results[:2]
+
+        restored.write_batch(results[2:])
+        restored.close()
+        assert list(restored.iter_results()) == results
+
+    def test_restore_missing_shard(self, tmp_path):
+        writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=10)
+        writer.write_batch(_make_results(1))
+        writer.close()
+        state = writer.shards
+        writer.shard_paths[0].unlink()
+
+        with pytest.raises(OSError):
+            PredictionShardWriter.restore(tmp_path / "shards", state, rows_per_shard=10)
+
+    def test_cleanup_removes_shard_dir(self, tmp_path):
+        writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=10)
+        writer.write_batch(_make_results(2))
+
+        writer.cleanup()
+
+        assert not (tmp_path / "shards").exists()
+
+    def test_counts_failed_predictions(self, tmp_path):
+        writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=2)
+        writer.write_batch([*_make_results(1), PredictionResult(prediction=None, error="Timeout")])
+        writer.write_batch([PredictionResult(prediction=None, error="Timeout")])
+
+        assert writer.num_errors == 2
+        restored = PredictionShardWriter.restore(tmp_path / "shards", writer.shards[:1], rows_per_shard=2)
+        assert restored.num_errors == 1
+
+    def test_invalid_rows_per_shard(self, tmp_path):
+        with pytest.raises(ValueError, match="rows_per_shard"):
+            PredictionShardWriter(tmp_path / "shards", rows_per_shard=0)
+
+
+class TestStreamingJobOutput:
+    @pytest.mark.parametrize("output_field", ["predictions", "ground_truth"])
+    @pytest.mark.parametrize("with_metrics", [True, False])
+    def test_matches_in_memory_job_output(self, tmp_path, dataset, json_config_full_api, output_field, with_metrics):
+        """The streamed output must contain exactly what the in-memory ``JobOutput`` would."""
+        config = InferenceJobConfig.model_validate(json_config_full_api)
+        results = _make_results(len(dataset), with_metrics=with_metrics)
+        writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=2)
+        writer.write_batch(results)
+        writer.close()
+
+        # Build the expected output the way the job used to, fully in memory.
+        output = dataset.to_dict()
+        output[output_field] = [p.prediction for p in results]
+        output["reasoning"] = [p.reasoning for p in results]
+        output["inference_metrics"] = [p.metrics for p in results]
+        output["model"] = "model"
+        output["inference_time"] = 1.5
+        expected = JobOutput(artifacts=InferenceJobOutput.model_validate(output), parameters=config)
+
+        streamed = StreamingJobOutput(
+            job_output=JobOutput(
+                artifacts=InferenceJobOutput(examples=[], model="model", inference_time=1.5), parameters=config
+            ),
+            shards=writer,
+            dataset=dataset,
+            output_field=output_field,
+        )
+        results_path = tmp_path / "results.json"
+        with results_path.open("w") as f:
+            streamed.write_json(f)
+
+        assert json.loads(results_path.read_text()) == json.loads(expected.model_dump_json())
+
+    def test_requires_examples_column(self, tmp_path, json_config_full_api):
+        config = InferenceJobConfig.model_validate(json_config_full_api)
+        writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=10)
+        streamed = StreamingJobOutput(
+            job_output=JobOutput(
+                artifacts=InferenceJobOutput(examples=[], model="model", inference_time=0), parameters=config
+            ),
+            shards=writer,
+            dataset=Dataset.from_dict({"text": ["a"]}),
+            output_field="predictions",
+        )
+
+        with pytest.raises(ValueError, match="examples"), (tmp_path / "results.json").open("w") as f:
+            streamed.write_json(f)
+
+    def test_errors_are_only_stored_if_predictions_failed(self, tmp_path, dataset, json_config_full_api):
+        config = InferenceJobConfig.model_validate(json_config_full_api)
+        results = _make_results(len(dataset))
+        results[3] = PredictionResult(prediction=None, error="Timeout: Request timed out")
+
+        def write_results(results: list[PredictionResult]) -> dict:
+            writer = PredictionShardWriter(tmp_path / "shards", rows_per_shard=10)
+            writer.write_batch(results)
+            writer.close()
+            streamed = StreamingJobOutput(
+                job_output=JobOutput(
+                    artifacts=InferenceJobOutput(examples=[], model="model", inference_time=0), parameters=config
+                ),
+                shards=writer,
+                dataset=dataset,
+                output_field="predictions",
+            )
+            with (tmp_path / "results.json").open("w") as f:
+                streamed.write_json(f)
+            writer.cleanup()
+            return json.loads((tmp_path / "results.json").read_text())["artifacts"]
+
+        assert write_results(_make_results(len(dataset)))["errors"] is None
+
+        artifacts = write_results(results)
+        assert artifacts["errors"] == [None, None, None, "Timeout: Request timed out", None]
+        assert artifacts["predictions"][3] is None
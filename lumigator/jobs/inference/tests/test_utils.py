@@ -0,0 +1,95 @@
+import asyncio
+import time
+from datetime import UTC, datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+from litellm.exceptions import RateLimitError
+from utils import MAX_RETRY_AFTER, AsyncRateLimiter, AsyncTokenBucket, get_retry_after
+
+
+def _rate_limit_error(headers: dict[str, str]) -> RateLimitError:
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://api.openai.com/v1"))
+    return RateLimitError(message="Too many requests", llm_provider="openai", model="gpt-4o", response=response)
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, None),
+        ({"Retry-After": "7"}, 7),
+        ({"retry-after-ms": "1500", "retry-after": "2"}, 1.5),
+        ({"Retry-After": "not a delay"}, None),
+        ({"Retry-After": "100000"}, MAX_RETRY_AFTER),
+    ],
+)
+def test_get_retry_after(headers, expected):
+    assert get_retry_after(_rate_limit_error(headers)) == expected
+
+
+def test_get_retry_after_http_date():
+    retry_at = datetime.now(UTC) + timedelta(seconds=30)
+    error = _rate_limit_error({"Retry-After": format_datetime(retry_at, usegmt=True)})
+
+    assert get_retry_after(error) == pytest.approx(30, abs=2)
+
+
+def test_get_retry_after_without_response():
+    assert get_retry_after(ValueError("not an API error")) is None
+
+
+def test_token_bucket_waits_for_refill():
+    # 600 per minute is 10 per second: the bucket starts full, then refills at that rate.
+    bucket = AsyncTokenBucket(rate_per_minute=600)
+
+    async def acquire_all():
+        start = time.monotonic()
+        await bucket.acquire(600)
+        await bucket.acquire(2)
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire_all()) == pytest.approx(0.2, abs=0.1)
+
+
+def test_token_bucket_caps_requests_to_its_capacity():
+    bucket = AsyncTokenBucket(rate_per_minute=60)
+
+    asyncio.run(bucket.acquire(1_000))
+
+    assert bucket.available < 1
+
+
+def test_token_bucket_adjust():
+    bucket = AsyncTokenBucket(rate_per_minute=60)
+
+    bucket.adjust(100)
+    assert bucket.available < -39
+
+    bucket.adjust(-1_000)
+    assert bucket.available == bucket.capacity
+
+
+def test_invalid_rate():
+    with pytest.raises(ValueError, match="rate_per_minute"):
+        AsyncTokenBucket(rate_per_minute=0)
+
+
+def test_rate_limiter_without_limits():
+    limiter = AsyncRateLimiter()
+
+    asyncio.run(limiter.acquire(1_000_000))
+    limiter.record_usage(1_000_000, 10)
+
+    assert limiter.requests is None
+    assert limiter.tokens is None
+
+
+def test_rate_limiter_records_actual_usage():
+    limiter = AsyncRateLimiter(requests_per_minute=10, tokens_per_minute=1_000)
+
+    asyncio.run(limiter.acquire(500))
+    limiter.record_usage(500, 100)
+
+    assert limiter.requests.available == pytest.approx(9, abs=0.1)
+    assert limiter.tokens.available == pytest.approx(900, abs=1)
@@ -1,6 +1,9 @@
+import asyncio
 import functools
 import time
 from collections.abc import Callable
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
 from typing import Any, TypeVar
 
 from litellm.exceptions import APIError
@@ -63,3 +66,126 @@ def retry_with_backoff(
         return wrapper
 
     return decorator
+
+
+MAX_RETRY_AFTER = 300.0
+"""Upper bound (in seconds) on the delay requested by a provider through a Retry-After header."""
+
+
+def get_retry_after(error: Exception) -> float | None:
+    """Extract the delay requested by the provider (via Retry-After headers) from an API error.
+
+    Args:
+        error: The exception raised (or returned) by litellm for a failed request
+
+    Returns:
+        The number of seconds to wait before retrying, or None if the provider did not specify it
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(error, "litellm_response_headers", None) or getattr(response, "headers", None)
+    if not headers:
+        return None
+    headers = {str(key).lower(): value for key, value in headers.items()}
+
+    try:
+        if "retry-after-ms" in headers:
+            delay = float(headers["retry-after-ms"]) / 1000
+        elif "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                delay = float(value)
+            except ValueError:
+                # Retry-After can also be an HTTP date.
+                delay = (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds()
+        else:
+            return None
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid Retry-After header: {headers}")
+        return None
+
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+
+class AsyncTokenBucket:
+    """Token bucket limiting how much of a resource (e.g. requests or tokens) is used per minute.
+
+    The bucket starts full and is continuously refilled at ``rate_per_minute / 60`` per second.
+    Usage can be adjusted after the fact (e.g. once the actual number of tokens used by a request
+    is known), which may leave the bucket in debt: later callers then wait until it is repaid.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        """Args:
+        rate_per_minute: Maximum amount which can be acquired per minute, also the bucket capacity
+        """
+        if rate_per_minute <= 0:
+            raise ValueError(f"rate_per_minute must be positive, got {rate_per_minute}")
+        self.capacity = float(rate_per_minute)
+        self.refill_rate = self.capacity / 60
+        self.available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until ``amount`` is available, then take it from the bucket.
+
+        Requests larger than the bucket capacity are capped to it, so they can eventually proceed.
+
+        Args:
+            amount: The amount to take from the bucket
+        """
+        amount = min(amount, self.capacity)
+        # Callers are served in order, so a large request cannot be starved by smaller ones.
+        async with self._lock:
+            self._refill()
+            while self.available < amount:
+                await asyncio.sleep((amount - self.available) / self.refill_rate)
+                self._refill()
+            self.available -= amount
+
+    def adjust(self, amount: float) -> None:
+        """Take an extra (or, if negative, give back some) amount from the bucket without waiting.
+
+        Args:
+            amount: The amount to take from the bucket
+        """
+        self._refill()
+        self.available = min(self.capacity, self.available - amount)
+
+
+class AsyncRateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for calls to a remote model API."""
+
+    def __init__(self, requests_per_minute: int | None = None, tokens_per_minute: int | None = None):
+        """Args:
+        requests_per_minute: Maximum number of requests sent per minute, or None for no limit
+        tokens_per_minute: Maximum number of tokens used per minute, or None for no limit
+        """
+        self.requests = AsyncTokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = AsyncTokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """Wait until a request using (an estimated) ``estimated_tokens`` tokens can be sent.
+
+        Args:
+            estimated_tokens: The estimated number of tokens used by the request
+        """
+        if self.requests is not None:
+            await self.requests.acquire()
+        if self.tokens is not None:
+            await self.tokens.acquire(estimated_tokens)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token budget once the actual number of tokens used by a request is known.
+
+        Args:
+            estimated_tokens: The number of tokens acquired for the request
+            actual_tokens: The number of tokens the request actually used
+        """
+        if self.tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
@@ -4,7 +4,7 @@ from enum import Enum
 from typing import Any, Literal, TypeVar
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict, Field, PositiveInt, model_validator
+from pydantic import BaseModel, ConfigDict, Field, NonNegativeFloat, PositiveFloat, PositiveInt, model_validator
 from pydantic.json_schema import SkipJsonSchema
 
 from lumigator_schemas.redactable_base_model import RedactableBaseModel
@@ -56,6 +56,8 @@ class JobEvent(BaseModel):
 
 class JobLogsResponse(BaseModel):
     logs: str | None = None
+    # Offset (in characters) of the end of the logs, to only get the logs written after them next time
+    next_offset: int | None = None
 
 
 # Check Ray items actually used and copy
@@ -111,6 +113,28 @@ class DeepEvalLocalModelConfig(BaseModel):
     model_base_url: str
 
 
+class ModelMetricConfig(BaseModel):
+    """Runtime settings of metrics computed with a model (BERTScore, COMET)."""
+
+    model_config = ConfigDict(extra="forbid")
+    # Number of examples scored at a time, by default tuned to the available memory on CPU
+    batch_size: PositiveInt | None = None
+    # Device the model runs on (e.g. "cpu", "cuda", "cuda:1"), by default a GPU if available
+    device: str | None = None
+    # Number of threads used by torch on CPU, by default all the cores
+    num_threads: PositiveInt | None = None
+
+
+class BertScoreConfig(ModelMetricConfig):
+    # Model computing the embeddings, by default bert_score's recommended model for `lang`
+    model_type: str | None = None
+    lang: str = "en"
+
+
+class CometConfig(ModelMetricConfig):
+    model: str = "eamt22-cometinho-da"
+
+
 class JobEvalConfig(BaseJobConfig):
     job_type: Literal[JobType.EVALUATION] = JobType.EVALUATION
     # NOTE: If changing the default task definition (currently summarization),
@@ -118,6 +142,22 @@ class JobEvalConfig(BaseJobConfig):
     task_definition: TaskDefinition = Field(default_factory=lambda: SummarizationTaskDefinition())
     metrics: set[str] = Field(default_factory=lambda info: get_metrics_for_task(info["task_definition"].task))
     llm_as_judge: DeepEvalLocalModelConfig | None = None
+    # Max number of metrics computed concurrently (1 computes them one after the other)
+    max_workers: PositiveInt = 1
+    # Only used by G-Eval metrics: max number of judge requests in flight, and sent per minute if limited
+    g_eval_max_concurrency: PositiveInt = 8
+    g_eval_requests_per_minute: PositiveInt | None = None
+    bertscore: BertScoreConfig = Field(default_factory=BertScoreConfig)
+    comet: CometConfig = Field(default_factory=CometConfig)
+    # Tokenizer counting tokens for token_length: a HuggingFace tokenizer name, or "tiktoken:" followed by
+    # a tiktoken encoding or OpenAI model name (e.g. "tiktoken:gpt-4o"). If unset, tokens are estimated from words
+    token_length_tokenizer: str | None = None
+    # Number of shards of the dataset scored in parallel Ray tasks, and resources reserved by each of them
+    num_shards: PositiveInt = 1
+    shard_num_cpus: PositiveFloat = 1
+    shard_num_gpus: NonNegativeFloat = 0
+    # Serve samples already scored by previous jobs with the same metric settings from a shared cache
+    metric_cache: bool = False
 
 
 class GenerationConfig(BaseModel):
@@ -144,6 +184,20 @@ class JobInferenceConfig(BaseJobConfig):
     trust_remote_code: bool = False
     torch_dtype: str = "auto"
     base_url: str | None = None
+    # Only used by models served via an API: max number of requests in flight and provider rate limits
+    max_concurrent_requests: PositiveInt = 16
+    requests_per_minute: PositiveInt | None = None
+    tokens_per_minute: PositiveInt | None = None
+    # Store rows whose prediction permanently failed with a null prediction and an error, instead of failing the job
+    allow_failed_predictions: bool = False
+    # Serve predictions already made by previous jobs (same model, prompt, generation config and example)
+    prediction_cache: bool = False
+    # Only used by HF models: batch examples of similar token length, optionally under a token budget per batch
+    length_bucketing: bool = False
+    max_tokens_per_batch: PositiveInt | None = None
+    # Only used by HF models: run on a long-lived model server shared by the jobs using the same model, revision and
+    # dtype, so only the first of them pays for loading the model
+    model_pool: bool = False
     output_field: str | None = "predictions"
     generation_config: GenerationConfig = Field(default_factory=GenerationConfig)
     store_to_dataset: bool = False